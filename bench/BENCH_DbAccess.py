@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import asyncio
+from BENCH_Utils import *
+from RIP_DbAccess import *
+from RIP_DbAsyncAccess import *
+from RIP_DbFakeDriver import *
+from RIP_DbSharding import *
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'BENCH_DbAccess.json')
+
+# latencies of the fake driver in seconds, roughly a server
+# on the local network
+CONNECTLATENCY = 0.002
+ROUNDTRIPLATENCY = 0.0002
+ROWLATENCY = 0.000002
+
+class BenchConfig(object):
+    host = 'localhost'
+    name = 'bench'
+    user = 'bench'
+    password = ''
+
+# function: createFactory [DbFactory]
+#   creates a factory on driver, pooled if poolsize is given
+def createFactory(driver, poolsize = None):
+    factory = DbFactory(BenchConfig(), driver)
+    if poolsize is not None:
+        factory.enablePool(1, poolsize)
+    return factory
+
+# function: createTable [void]
+#   creates BenchTable holding rows rows
+def createTable(factory, rows):
+    factory.createCommand('DROP TABLE IF EXISTS BenchTable').commit()
+    factory.createCommand('CREATE TABLE BenchTable (Id INT PRIMARY KEY AUTO_INCREMENT, Name VARCHAR(25), Value INT)').commit()
+    factory.createInsertCommand('BenchTable').executeBulk([{'Name': 'name' + str(i), 'Value': i} for i in range(rows)])
+
+# function: createShards [DbShardedFactory]
+#   creates BenchTable on shards pooled shards, hashed by Value
+def createShards(driver, shards, rows):
+    configs = []
+    for index in range(shards):
+        config = BenchConfig()
+        config.name = 'bench_shard%d' % index
+        configs.append(config)
+    factory = DbShardedFactory(configs, 'Value', None, driver)
+    factory.enablePool(1, 8)
+    factory.fanout(lambda shard: createTable(shard, 0))
+    factory.createInsertCommand('BenchTable').executeBulk([{'Name': 'name' + str(i), 'Value': i} for i in range(rows)])
+    return factory
+
+def fetchOne(factory):
+    cmd = factory.createSelectCommand('BenchTable')
+    cmd.registerField('Name')
+    cmd.registerCondition('Id', 1)
+    cmd.fetchone()
+
+def fetchAll(factory):
+    cmd = factory.createSelectCommand('BenchTable')
+    cmd.registerField('Id')
+    cmd.registerField('Name')
+    cmd.registerField('Value')
+    cmd.sql.limit_duration = 100
+    cmd.fetchall()
+
+def iterateAll(factory):
+    cmd = factory.createSelectCommand('BenchTable')
+    cmd.registerField('Id')
+    cmd.registerField('Name')
+    for row in cmd.iterate(250):
+        pass
+
+def insertOne(factory):
+    cmd = factory.createInsertCommand('BenchTable')
+    cmd.registerField('Name', 'insert')
+    cmd.registerField('Value', 0)
+    cmd.execute()
+
+def insertBulk(factory):
+    factory.createInsertCommand('BenchTable').executeBulk([{'Name': 'bulk', 'Value': i} for i in range(100)])
+
+# function: createRunner [BenchRunner]
+#   registers the command paths unpooled, pooled, cached and
+#   asynchronous at several thread counts
+def createRunner():
+    driver = DbFakeDriver(connectlatency=CONNECTLATENCY, roundtriplatency=ROUNDTRIPLATENCY, rowlatency=ROWLATENCY)
+    direct = createFactory(driver)
+    pooled = createFactory(driver, 8)
+    cached = createFactory(driver, 8)
+    cached.enableResultCache()
+    createTable(pooled, 1000)
+
+    runner = BenchRunner()
+    for threads in (1, 8):
+        runner.register('direct fetchone t%d' % threads, lambda: fetchOne(direct), threads)
+    for threads in (1, 8, 32):
+        runner.register('pooled fetchone t%d' % threads, lambda: fetchOne(pooled), threads)
+    for threads in (1, 8):
+        runner.register('pooled fetchall100 t%d' % threads, lambda: fetchAll(pooled), threads)
+        runner.register('cached fetchall100 t%d' % threads, lambda: fetchAll(cached), threads)
+        runner.register('pooled insert t%d' % threads, lambda: insertOne(pooled), threads)
+    runner.register('pooled iterate1000 t1', lambda: iterateAll(pooled))
+    runner.register('pooled executebulk100 t1', lambda: insertBulk(pooled))
+
+    sharded = createShards(driver, 4, 1000)
+    adapter = DbShardedTableAdapter(sharded, 'BenchTable')
+    runner.register('pooled count t1', DbTableAdapter(pooled, 'BenchTable').count)
+    runner.register('sharded count s4 t1', adapter.count)
+
+    def fetchKeyed():
+        cmd = sharded.createSelectCommand('BenchTable')
+        cmd.registerField('Name')
+        cmd.registerCondition('Value', 1)
+        cmd.fetchone()
+
+    runner.register('sharded keyed fetchone s4 t1', fetchKeyed)
+
+    loop = asyncio.new_event_loop()
+    asyncconnection = AsyncDbConnection(BenchConfig(), 1, 8, driver=driver)
+
+    async def gather():
+        commands = []
+        for i in range(8):
+            cmd = asyncconnection.createSelectCommand('BenchTable')
+            cmd.registerField('Name')
+            cmd.registerCondition('Id', i + 1)
+            commands.append(cmd.fetchone())
+        await asyncio.gather(*commands)
+
+    runner.register('async gather8 fetchone', lambda: loop.run_until_complete(gather()))
+    return runner
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:], createRunner(), BASELINE))
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import asyncio
+import datetime
+import decimal
+from BENCH_Utils import *
+from RIP_DbAccess import *
+from RIP_DbAsyncAccess import *
+from RIP_DbFakeDriver import *
+
+# the test database of RIP_Common, the benchmark falls back to
+# the fake driver if it is missing or unreachable
+try:
+    import RIP_Common
+except ImportError:
+    RIP_Common = None
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'BENCH_DbDrivers.json')
+
+# rows of BenchDrivers, fetched as a whole and in batches
+ROWS = 10000
+
+# latencies of the fallback fake driver in seconds, as in
+# BENCH_DbAccess
+CONNECTLATENCY = 0.002
+ROUNDTRIPLATENCY = 0.0002
+ROWLATENCY = 0.000002
+
+class BenchConfig(object):
+    host = 'localhost'
+    name = 'bench'
+    user = 'bench'
+    password = ''
+
+# function: createTable [void]
+#   creates BenchDrivers with columns of the common types
+def createTable(factory):
+    factory.createCommand('DROP TABLE IF EXISTS BenchDrivers').commit()
+    factory.createCommand('CREATE TABLE BenchDrivers (Id INT PRIMARY KEY AUTO_INCREMENT, Name VARCHAR(32), '
+                          'Amount DECIMAL(10,2), Ratio DOUBLE, Flag TINYINT, Created DATETIME)').commit()
+    created = datetime.datetime(2020, 1, 1)
+    rows = []
+    for i in range(ROWS):
+        rows.append({'Name': 'name' + str(i), 'Amount': decimal.Decimal(i) / 100, 'Ratio': i / 7.0,
+                     'Flag': i % 2, 'Created': created + datetime.timedelta(seconds=i)})
+    factory.createInsertCommand('BenchDrivers').executeBulk(rows)
+
+def createSelect(connection, rowmode, limit):
+    cmd = connection.createSelectCommand('BenchDrivers')
+    for field in ('Id', 'Name', 'Amount', 'Ratio', 'Flag', 'Created'):
+        cmd.registerField(field)
+    cmd.sql.limit_duration = limit
+    cmd.rowmode = rowmode
+    return cmd
+
+# function: registerBenchmarks [void]
+#   registers the benchmarks of a driver, given by name or
+#   instance. commands run on an open connection to exclude
+#   the connect. the async benchmark runs the driver on the
+#   worker threads of AsyncDbConnection, there is no native
+#   asyncio driver
+def registerBenchmarks(runner, config, driver):
+    name = driver if isinstance(driver, str) else driver.name
+    connection = DbConnection(config, None, driver)
+    connection.connect()
+    roundtrip = connection.createCommand('SELECT 1')
+    dictrows = createSelect(connection, EN_ROWMODE.Dict, 1000)
+    compactrows = createSelect(connection, EN_ROWMODE.Compact, 1000)
+    streamed = createSelect(connection, EN_ROWMODE.Compact, ROWS)
+
+    def connect():
+        conn = DbConnection(config, None, driver)
+        conn.connect()
+        conn.close()
+
+    def iterate():
+        for row in streamed.iterate(1000):
+            pass
+
+    runner.register(name + ' connect', connect)
+    runner.register(name + ' roundtrip', roundtrip.fetchall)
+    runner.register(name + ' fetchall dict 1000', dictrows.fetchall)
+    runner.register(name + ' fetchall compact 1000', compactrows.fetchall)
+    runner.register(name + ' iterate compact %d' % ROWS, iterate)
+
+    if connection.driver.supports_prepared:
+        prepared = DbConnection(config, None, driver)
+        prepared.prepared = 64
+        prepared.connect()
+        for label, conn in (('text', connection), ('prepared', prepared)):
+            cmd = createSelect(conn, EN_ROWMODE.Compact, 1000)
+            cmd.registerConditionWithOperand('Id', '>', 0)
+            runner.register('%s %s fetchall compact 1000' % (name, label), cmd.fetchall)
+
+    loop = asyncio.new_event_loop()
+    asyncconnection = AsyncDbConnection(config, 1, 8, driver=driver)
+
+    async def gather():
+        commands = []
+        for i in range(8):
+            cmd = asyncconnection.createSelectCommand('BenchDrivers')
+            cmd.registerField('Name')
+            cmd.registerCondition('Id', i + 1)
+            commands.append(cmd.fetchone())
+        await asyncio.gather(*commands)
+
+    runner.register(name + ' async gather8 fetchone', lambda: loop.run_until_complete(gather()))
+
+# function: connectDatabase [object]
+#   returns the config of the test database, None if it is
+#   not configured or no installed driver reaches it
+def connectDatabase():
+    if RIP_Common is None or len(availableDrivers()) == 0:
+        return None
+    config = RIP_Common.get_database_config()
+    try:
+        createTable(DbFactory(config))
+    except Exception as e:
+        print('test database unreachable, %s' % e)
+        return None
+    return config
+
+# function: createRunner [BenchRunner]
+#   registers the benchmarks of all installed drivers, aliases
+#   of the same driver are measured once. without a test
+#   database the fake driver is measured instead
+def createRunner():
+    runner = BenchRunner()
+    config = connectDatabase()
+    if config is None:
+        print('running on the fake driver')
+        driver = DbFakeDriver(None, CONNECTLATENCY, ROUNDTRIPLATENCY, ROWLATENCY)
+        config = BenchConfig()
+        createTable(DbFactory(config, driver))
+        registerBenchmarks(runner, config, driver)
+        return runner
+    measured = set()
+    for name in availableDrivers():
+        driver = type(getDriver(name))
+        if driver in measured:
+            continue
+        measured.add(driver)
+        registerBenchmarks(runner, config, name)
+    return runner
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:], createRunner(), BASELINE))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+from BENCH_Utils import *
+from RIP_DbSqlCompiler import *
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'BENCH_DbSqlCompiler.json')
+
+def buildSelect(fields, conditions, joins):
+    statement = DbSqlSelectStatement('BenchTable')
+    for i in range(fields):
+        statement.registerField('Field' + str(i))
+    for i in range(conditions):
+        statement.registerCondition('Condition' + str(i))
+    for i in range(joins):
+        statement.registerRelation('Ref' + str(i), 'BenchTable' + str(i), 'Id')
+    return statement
+
+def buildInsert(fields, conditions, joins):
+    statement = DbSqlInsertStatement('BenchTable')
+    for i in range(fields):
+        statement.registerField('Field' + str(i))
+    return statement
+
+def buildUpdate(fields, conditions, joins):
+    statement = DbSqlUpdateStatement('BenchTable')
+    for i in range(fields):
+        statement.registerField('Field' + str(i))
+    for i in range(conditions):
+        statement.registerCondition('Condition' + str(i))
+    return statement
+
+def buildDelete(fields, conditions, joins):
+    statement = DbSqlDeleteStatement('BenchTable')
+    for i in range(conditions):
+        statement.registerCondition('Condition' + str(i))
+    return statement
+
+# (name, builder, fields, conditions, joins)
+CASES = [
+    ('select', buildSelect, 1, 0, 0),
+    ('select', buildSelect, 10, 5, 0),
+    ('select', buildSelect, 10, 5, 2),
+    ('select', buildSelect, 50, 20, 5),
+    ('insert', buildInsert, 1, 0, 0),
+    ('insert', buildInsert, 10, 0, 0),
+    ('insert', buildInsert, 50, 0, 0),
+    ('update', buildUpdate, 1, 1, 0),
+    ('update', buildUpdate, 10, 5, 0),
+    ('update', buildUpdate, 50, 20, 0),
+    ('delete', buildDelete, 0, 1, 0),
+    ('delete', buildDelete, 0, 5, 0),
+    ('delete', buildDelete, 0, 20, 0),
+]
+
+# function: createRunner [BenchRunner]
+#   registers per case the uncached render, the cached compile
+#   and building plus compiling a new statement
+def createRunner():
+    runner = BenchRunner()
+    for name, builder, fields, conditions, joins in CASES:
+        label = '%s f%d c%d j%d' % (name, fields, conditions, joins)
+        statement = builder(fields, conditions, joins)
+
+        def render(statement=statement):
+            statement.invalidate()
+            statement.render()
+
+        def compile(statement=statement):
+            statement.invalidate()
+            statement.compile()
+
+        def build(builder=builder, fields=fields, conditions=conditions, joins=joins):
+            builder(fields, conditions, joins).compile()
+
+        runner.register(label + ' render', render)
+        runner.register(label + ' compile', compile)
+        runner.register(label + ' build', build)
+
+    statement = buildInsert(10, 0, 0)
+    def renderRows(statement=statement):
+        sqlcache.clear()
+        statement.renderRows(100)
+    runner.register('insert f10 rows100 render', renderRows)
+    return runner
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:], createRunner(), BASELINE))
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import subprocess
+from BENCH_Utils import *
+from RIP_DbAccess import *
+from RIP_DbFakeDriver import *
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'BENCH_Startup.json')
+
+# first query of a fresh interpreter on the fake driver at
+# argv[1], loading the templates at argv[2] if given
+FIRSTQUERY = '''
+import sys
+from RIP_DbAccess import *
+from RIP_DbFakeDriver import *
+
+class BenchConfig(object):
+    host = 'localhost'
+    name = 'bench'
+    user = 'bench'
+    password = ''
+
+if len(sys.argv) > 2:
+    sqlcache.load(sys.argv[2])
+cmd = DbFactory(BenchConfig(), DbFakeDriver(sys.argv[1])).createSelectCommand('BenchTable')
+cmd.registerField('Name')
+cmd.registerCondition('Id', 1)
+cmd.fetchone()
+'''
+
+class BenchConfig(object):
+    host = 'localhost'
+    name = 'bench'
+    user = 'bench'
+    password = ''
+
+# function: createSelect [DbSelectCommand]
+#   the command of FIRSTQUERY
+def createSelect(factory):
+    cmd = factory.createSelectCommand('BenchTable')
+    cmd.registerField('Name')
+    cmd.registerCondition('Id', 1)
+    return cmd
+
+# function: python [function]
+#   returns a function running a fresh interpreter with
+#   arguments
+def python(*arguments):
+    command = [sys.executable] + list(arguments)
+    return lambda: subprocess.run(command, check=True)
+
+# function: createRunner [BenchRunner]
+#   registers the startup of an interpreter, the import of
+#   the layer and the first query with and without templates.
+#   allocations are measured in this process only and thus
+#   traced once
+def createRunner():
+    driver = DbFakeDriver()
+    factory = DbFactory(BenchConfig(), driver)
+    factory.createCommand('CREATE TABLE BenchTable (Id INT PRIMARY KEY AUTO_INCREMENT, Name VARCHAR(25))').commit()
+    cmd = factory.createInsertCommand('BenchTable')
+    cmd.registerField('Name', 'startup')
+    cmd.execute()
+
+    templates = os.path.join(driver.path, 'templates.json')
+    cache = DbSqlRenderCache()
+    cache.precompile([createSelect(factory).sql])
+    cache.save(templates)
+
+    runner = BenchRunner(allocruns=1)
+    runner.register('interpreter', python('-c', 'pass'))
+    runner.register('import DbAccess', python('-c', 'import RIP_DbAccess'))
+    runner.register('import first query', python('-c', FIRSTQUERY, driver.path))
+    runner.register('import first query templates', python('-c', FIRSTQUERY, driver.path, templates))
+    return runner
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:], createRunner(), BASELINE))
@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+import getopt
+import platform
+import threading
+import tracemalloc
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class BenchResult
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class BenchResult(object):
+
+    # constructor
+    #   parameters:
+    #       name            name of the benchmark
+    #       opspersec       best operations per second
+    #       bytesperop      peak bytes allocated per operation
+    def __init__(self, name, opspersec, bytesperop):
+        self.name = name
+        self.opspersec = opspersec
+        self.bytesperop = bytesperop
+
+    # method: asdict [dictionary]
+    #   returns the result as json-serializable dictionary
+    def asdict(self):
+        return {'opspersec': self.opspersec, 'bytesperop': self.bytesperop}
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class BenchRunner
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class BenchRunner(object):
+
+    # constructor
+    #   parameters:
+    #       mintime         seconds a single timing run lasts
+    #       repeat          count of timing runs, the best
+    #                       run is reported
+    #       allocruns       count of operations traced for the
+    #                       allocation measurement
+    def __init__(self, mintime = 0.2, repeat = 3, allocruns = 50):
+        self.mintime = mintime
+        self.repeat = repeat
+        self.allocruns = allocruns
+        self.__benchmarks = []
+
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    # property: benchmarks [list] (readonly)
+    #   registered (name, function, threads) tuples
+    __benchmarks = None
+    def _get_benchmarks(self):
+        return self.__benchmarks
+    benchmarks = property(_get_benchmarks)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: register [void]
+    #   registers a function without arguments executing a
+    #   single operation, called concurrently by threads
+    def register(self, name, function, threads = 1):
+        self.__benchmarks.append((name, function, threads))
+
+    # method: measure [BenchResult]
+    #   measures the throughput and the allocations of function,
+    #   the throughput of all threads is summed up
+    def measure(self, name, function, threads = 1):
+        function()
+        loops = self._calibrate(function)
+        best = 0.0
+        for i in range(self.repeat):
+            if threads > 1:
+                best = max(best, self._concurrent(function, threads))
+                continue
+            started = time.perf_counter()
+            for j in range(loops):
+                function()
+            elapsed = time.perf_counter() - started
+            best = max(best, loops / elapsed)
+        return BenchResult(name, best, self._allocations(function))
+
+    # method: run [list]
+    #   measures all benchmarks whose name contains pattern
+    def run(self, pattern = None, output = sys.stdout):
+        results = []
+        for name, function, threads in self.__benchmarks:
+            if pattern is not None and pattern not in name:
+                continue
+            result = self.measure(name, function, threads)
+            results.append(result)
+            if output is not None:
+                output.write('%-48s %14.1f ops/s %10d B/op\n' % (name, result.opspersec, result.bytesperop))
+                output.flush()
+        return results
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    # method: _calibrate [integer]
+    #   returns the count of loops lasting at least mintime
+    def _calibrate(self, function):
+        loops = 1
+        while True:
+            started = time.perf_counter()
+            for i in range(loops):
+                function()
+            if time.perf_counter() - started >= self.mintime / 4:
+                return max(1, int(loops * 4))
+            loops *= 2
+
+    # method: _concurrent [float]
+    #   operations per second of threads calling function
+    #   for mintime seconds
+    def _concurrent(self, function, threads):
+        counts = [0] * threads
+        start = threading.Barrier(threads + 1)
+        stop = threading.Event()
+
+        def worker(index):
+            start.wait()
+            while not stop.is_set():
+                function()
+                counts[index] += 1
+
+        workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+        for thread in workers:
+            thread.start()
+        start.wait()
+        started = time.perf_counter()
+        time.sleep(self.mintime)
+        stop.set()
+        for thread in workers:
+            thread.join()
+        return sum(counts) / (time.perf_counter() - started)
+
+    # method: _allocations [integer]
+    #   peak bytes allocated by a single operation, averaged
+    def _allocations(self, function):
+        tracemalloc.start()
+        try:
+            total = 0
+            for i in range(self.allocruns):
+                tracemalloc.reset_peak()
+                current = tracemalloc.get_traced_memory()[0]
+                function()
+                total += tracemalloc.get_traced_memory()[1] - current
+            return total // self.allocruns
+        finally:
+            tracemalloc.stop()
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class BenchBaseline
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class BenchBaseline(object):
+
+    # constructor
+    #   parameters:
+    #       path            json file of the baseline
+    #       tolerance       relative change accepted before a
+    #                       result is flagged as regression
+    def __init__(self, path, tolerance = 0.10):
+        self.path = path
+        self.tolerance = tolerance
+        self.results = dict()
+        if os.path.exists(path):
+            with open(path) as f:
+                self.results = json.load(f).get('results', dict())
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: save [void]
+    #   stores results as the new baseline
+    def save(self, results):
+        self.results = dict([(result.name, result.asdict()) for result in results])
+        data = {'python': platform.python_version(), 'machine': platform.machine(), 'created': time.time(), 'results': self.results}
+        with open(self.path, 'w') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+
+    # method: compare [list]
+    #   writes the change against the baseline for each
+    #   result, returns the names of the regressed results
+    def compare(self, results, output = sys.stdout):
+        regressions = []
+        for result in results:
+            baseline = self.results.get(result.name)
+            if baseline is None:
+                continue
+            speed = result.opspersec / baseline['opspersec'] - 1.0
+            memory = (result.bytesperop - baseline['bytesperop']) / float(max(baseline['bytesperop'], 1))
+            flagged = speed < -self.tolerance or memory > self.tolerance
+            if flagged:
+                regressions.append(result.name)
+            output.write('%-48s %+7.1f%% ops/s %+7.1f%% B/op%s\n' % (result.name, speed * 100, memory * 100, '  REGRESSION' if flagged else ''))
+        return regressions
+
+# function: main [integer]
+#   command line of the benchmark scripts, runs the benchmarks
+#   of runner and compares them to the baseline at path
+def main(argv, runner, path):
+    usage = 'usage: %s [-q] [-f filter] [-t tolerance] [-b baseline] [-s]' % os.path.basename(sys.argv[0])
+    try:
+        opts, args = getopt.getopt(argv, 'hqsf:t:b:', ['help', 'quick', 'save', 'filter=', 'tolerance=', 'baseline='])
+    except getopt.GetoptError:
+        print(usage)
+        return 2
+    save = False
+    pattern = None
+    tolerance = 0.10
+    for opt, arg in opts:
+        if opt in ('-h', '--help'):
+            print(usage)
+            return 0
+        elif opt in ('-q', '--quick'):
+            runner.mintime = 0.05
+            runner.repeat = 1
+        elif opt in ('-s', '--save'):
+            save = True
+        elif opt in ('-f', '--filter'):
+            pattern = arg
+        elif opt in ('-t', '--tolerance'):
+            tolerance = float(arg)
+        elif opt in ('-b', '--baseline'):
+            path = arg
+    results = runner.run(pattern)
+    baseline = BenchBaseline(path, tolerance)
+    if save:
+        baseline.save(results)
+        print('baseline saved to ' + path)
+        return 0
+    if len(baseline.results) == 0:
+        print('no baseline at %s, create one with --save' % path)
+        return 0
+    print('')
+    regressions = baseline.compare(results)
+    if len(regressions) > 0:
+        print('%d regression(s) beyond %.0f%%' % (len(regressions), tolerance * 100))
+        return 1
+    return 0
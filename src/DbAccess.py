@@ -2,12 +2,95 @@
 # -*- coding: utf-8 -*-
 
 import sys
-import getopt
-import warnings
-import string
-import MySQLdb as mysql
-from MySQLdb import cursors
+import time
+import threading
+import collections
+import decimal
+import operator
+import itertools
+import contextvars
+import concurrent.futures
+from RIP_DbDrivers import *
 from RIP_DbSqlCompiler import *
+from RIP_DbMonitor import *
+
+# numpy is imported by the first columnar result, see
+# _importNumpy
+numpy = None
+
+EN_ROWMODE = enum(Dict = 0,
+                  Compact = 1)
+
+EN_ROUTING = enum(LeastConnections = 0,
+                  WeightedRoundRobin = 1)
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbRow
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbRow(tuple):
+
+    __slots__ = ()
+
+    # field names and their indices, set on the row types
+    # created by createRowType
+    _fields = ()
+    _index = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._index[key])
+        return tuple.__getitem__(self, key)
+
+    def __repr__(self):
+        return 'DbRow(' + ', '.join([name + '=' + repr(value) for name, value in zip(self._fields, self)]) + ')'
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    def get(self, key, default = None):
+        index = self._index.get(key)
+        if index is None:
+            return default
+        return tuple.__getitem__(self, index)
+
+    def keys(self):
+        return list(self._fields)
+
+    def asdict(self):
+        return dict(zip(self._fields, self))
+
+# row types by field list, the least recently used types
+# are dropped beyond _ROWTYPES_MAXSIZE so ad hoc queries
+# with changing column lists don't grow the cache
+_ROWTYPES_MAXSIZE = 256
+_rowtypes = collections.OrderedDict()
+_rowtypes_lock = threading.Lock()
+
+# method: createRowType [type]
+#   returns the DbRow type of a field list, the type is
+#   created once per field list
+def createRowType(fields):
+    fields = tuple(fields)
+    with _rowtypes_lock:
+        rowtype = _rowtypes.get(fields)
+        if rowtype is not None:
+            _rowtypes.move_to_end(fields)
+            return rowtype
+        members = dict()
+        members['__slots__'] = ()
+        members['_fields'] = fields
+        members['_index'] = dict([(name, index) for index, name in enumerate(fields)])
+        for index, name in enumerate(fields):
+            if name.isidentifier() and not hasattr(DbRow, name):
+                members[name] = property(operator.itemgetter(index))
+        rowtype = type('DbRow', (DbRow,), members)
+        _rowtypes[fields] = rowtype
+        if len(_rowtypes) > _ROWTYPES_MAXSIZE:
+            _rowtypes.popitem(last = False)
+    return rowtype
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 # class DbCommand
@@ -16,12 +99,16 @@ from RIP_DbSqlCompiler import *
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 class DbConnection(object):
 
-    def __init__(self, config = None):
+    def __init__(self, config = None, pool = None, driver = None):
         if config is not None:
             self.__host = config.host
             self.__name = config.name
             self.__user = config.user
             self.__password = config.password
+            if driver is None:
+                driver = getattr(config, 'driver', None)
+        self.__pool = pool
+        self.__driver = getDriver(driver)
     
     # ------------------------------------------------------
     #   public properties 
@@ -63,6 +150,13 @@ class DbConnection(object):
         self.__password = value
     password = property(_get_password, _set_password)
 
+    # property: driver [DbDriver] (readonly)
+    #   driver opening the connection and its cursors
+    __driver = None
+    def _get_driver(self):
+        return self.__driver
+    driver = property(_get_driver)
+
     # property: mysqlconnection [MySQLdb.Connection]
     #   password of user
     __mysqlconnection = None
@@ -77,44 +171,206 @@ class DbConnection(object):
         return self.__is_connected
     is_connected = property(_get_is_connected)
 
+    # property: pool [DbConnectionPool]
+    #   pool the mysqlconnection is checked out from,
+    #   None if the connection connects directly
+    __pool = None
+    def _get_pool(self):
+        return self.__pool
+    def _set_pool(self, value):
+        self.__pool = value
+    pool = property(_get_pool, _set_pool)
+
+    # property: scope [DbScope]
+    #   routing scope the connection was created in, writes
+    #   mark the scope as written
+    __scope = None
+    def _get_scope(self):
+        return self.__scope
+    def _set_scope(self, value):
+        self.__scope = value
+    scope = property(_get_scope, _set_scope)
+
+    # property: prepared [integer]
+    #   count of statements kept prepared per connection,
+    #   0 sends all queries as text
+    __prepared = 0
+    def _get_prepared(self):
+        return self.__prepared
+    def _set_prepared(self, value):
+        if value > 0 and not self.__driver.supports_prepared:
+            raise ValueError('driver %s does not support prepared statements' % self.__driver.name)
+        self.__prepared = value
+    prepared = property(_get_prepared, _set_prepared)
+
+    # property: resultcache [DbResultCache]
+    #   cache serving select commands of the connection,
+    #   None if results are not cached
+    __resultcache = None
+    def _get_resultcache(self):
+        return self.__resultcache
+    def _set_resultcache(self, value):
+        self.__resultcache = value
+    resultcache = property(_get_resultcache, _set_resultcache)
+
+    # property: in_transaction [boolean] (readonly)
+    #   indicates if a transaction scope is open
+    __transactiondepth = 0
+    def _get_in_transaction(self):
+        return self.__transactiondepth > 0
+    in_transaction = property(_get_in_transaction)
+
+    # property: rollbackonly [boolean] (readonly)
+    #   indicates that a nested scope failed, the transaction
+    #   is rolled back when the outermost scope ends
+    __rollbackonly = False
+    def _get_rollbackonly(self):
+        return self.__rollbackonly
+    rollbackonly = property(_get_rollbackonly)
+
+    # property: transactioncursor [MySQLdb.cursors.Cursor] (readonly)
+    #   cursor shared by the commands of a transaction scope
+    __transactioncursor = None
+    def _get_transactioncursor(self):
+        return self.__transactioncursor
+    transactioncursor = property(_get_transactioncursor)
+
+    # property: pending [boolean] (readonly)
+    #   indicates that a cursor was opened since the last commit
+    #   or rollback, the connection may hold an open transaction
+    __pending = False
+    def _get_pending(self):
+        return self.__pending
+    pending = property(_get_pending)
+
     # ------------------------------------------------------
     #   public methods 
     # ------------------------------------------------------
 
     # method: connect [void]
-    #   connects to the db
+    #   connects to the db, or checks out a connection
+    #   if the connection is pooled
     def connect(self):
         try:
-            self.__mysqlconnection = mysql.connect(self.host, 
-                                        self.user, 
-                                        self.password, 
-                                        self.name, charset='utf8')
+            if self.__pool is not None:
+                self.__mysqlconnection = self.__pool.acquire()
+            else:
+                self.__mysqlconnection = self.__driver.connect(self.host, 
+                                            self.user, 
+                                            self.password, 
+                                            self.name)
             self.__is_connected = True
-        except mysql.Error as e:
+        except self.__driver.Error as e:
             self.__is_connected = False
             raise e
 
     # method: close [void]
-    #   wrapper method for closing the connection
+    #   wrapper method for closing the connection, a pooled
+    #   connection is returned to its pool instead and rolled
+    #   back only if it is pending
     def close(self):
-        self.__mysqlconnection.close()
+        if self.__pool is not None:
+            self.__pool.release(self.__mysqlconnection, self.__pending)
+        else:
+            self.__mysqlconnection.close()
+        self.__mysqlconnection = None
         self.__is_connected = False
+        self.__pending = False
         return
 
     # method: commit [void]
     #   wrapper method for commiting queries
     def commit(self):
         self.__mysqlconnection.commit()
+        self.__pending = False
 
     # method: method rollback [void]
     #   wrapper for rollback queries
     def rollback(self):
         self.__mysqlconnection.rollback()
+        self.__pending = False
 
     # method: cursor [MySQLdb.cursors.Cursor]
-    #   wrapper method to create a cursor 
+    #   wrapper method to create a cursor, buffered cursors
+    #   execute parameterized queries as prepared statements
+    #   if prepared is set
     def cursor(self, cursortype=cursors.DictCursor):
-        return self.mysqlconnection.cursor(cursortype)
+        self.__pending = True
+        if self.__prepared > 0 and cursortype.__name__ in ('Cursor', 'DictCursor'):
+            return self.__driver.preparedCursor(self.mysqlconnection, cursortype, self.__prepared)
+        return self.__driver.cursor(self.mysqlconnection, cursortype)
+
+    # method: clone [DbConnection]
+    #   creates an unconnected connection to the same database,
+    #   sharing the pool of this connection
+    def clone(self):
+        conn = DbConnection(self, self.__pool, self.__driver)
+        conn.resultcache = self.__resultcache
+        conn.prepared = self.__prepared
+        conn.scope = self.__scope
+        return conn
+
+    # method: transaction [DbTransaction]
+    #   creates a transaction scope, commands executed inside
+    #   the scope are committed once when it is left and
+    #   rolled back if it is left by an exception
+    def transaction(self):
+        return DbTransaction(self)
+
+    # method: begin [void]
+    #   opens a transaction scope, connects if necessary.
+    #   nested scopes join the outermost one
+    def begin(self):
+        if self.__transactiondepth == 0:
+            self.__transactionopened = not self.is_connected
+            if self.__transactionopened:
+                self.connect()
+            try:
+                self.__transactioncursor = self.cursor(cursors.Cursor)
+            except:
+                if self.__transactionopened:
+                    self.close()
+                raise
+            self.__transactiontables = set()
+            self.__rollbackonly = False
+        self.__transactiondepth += 1
+
+    # method: end [void]
+    #   closes a transaction scope, the outermost scope
+    #   commits or rolls back the transaction. a failed nested
+    #   scope marks the transaction rollback-only, the outermost
+    #   scope then rolls back and raises DbTransactionError
+    #   even if the failure was caught
+    def end(self, success = True):
+        self.__transactiondepth -= 1
+        if self.__transactiondepth > 0:
+            if not success:
+                self.__rollbackonly = True
+            return
+        try:
+            if success and not self.__rollbackonly:
+                self.commit()
+            else:
+                self.rollback()
+        finally:
+            self.__transactioncursor.close()
+            self.__transactioncursor = None
+            if self.__transactionopened:
+                self.close()
+            for table in self.__transactiontables:
+                self.invalidate(table)
+        if success and self.__rollbackonly:
+            raise DbTransactionError('transaction rolled back, a nested scope failed')
+
+    # method: invalidate [void]
+    #   drops cached results of table after it was written,
+    #   inside a transaction again when the scope ends
+    def invalidate(self, table):
+        if self.__resultcache is None:
+            return
+        if self.in_transaction:
+            self.__transactiontables.add(table)
+        self.__resultcache.invalidate(table)
 
     # method: createCommand [DbCommand]
     #   creates a DbCommand
@@ -131,6 +387,11 @@ class DbConnection(object):
     def createInsertCommand(self, tablename):
         return DbInsertCommand(self, tablename)
 
+    # method: createUpsertCommand [DbUpsertCommand]
+    #   creates a DbUpsertCommand
+    def createUpsertCommand(self, tablename):
+        return DbUpsertCommand(self, tablename)
+
     # method: createUpdateCommand [DbUpdateCommand]
     #   creates a DbUpdateCommand
     def createUpdateCommand(self, tablename):
@@ -141,6 +402,488 @@ class DbConnection(object):
     def createDeleteCommand(self, tablename):
         return DbDeleteCommand(self, tablename)
     
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbResultCache
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbResultCache(object):
+
+    # constructor 
+    #   parameters:
+    #       ttl             seconds a result is served
+    #       maxbytes        estimated memory bound, the least
+    #                       recently used results are evicted
+    def __init__(self, ttl = 60.0, maxbytes = 64 * 1024 * 1024):
+        self.__ttl = ttl
+        self.__maxbytes = maxbytes
+        self.__entries = collections.OrderedDict()
+        self.__tables = dict()
+        self.__generations = dict()
+        self.__bytes = 0
+        self.__hits = 0
+        self.__misses = 0
+        self.__lock = threading.Lock()
+    
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    __ttl = 0
+    def _get_ttl(self):
+        return self.__ttl
+    def _set_ttl(self, value):
+        self.__ttl = value
+    ttl = property(_get_ttl, _set_ttl)
+
+    __maxbytes = 0
+    def _get_maxbytes(self):
+        return self.__maxbytes
+    maxbytes = property(_get_maxbytes)
+
+    # property: bytes [integer] (readonly)
+    #   estimated memory used by the cached results
+    __bytes = 0
+    def _get_bytes(self):
+        return self.__bytes
+    bytes = property(_get_bytes)
+
+    def _get_count(self):
+        return len(self.__entries)
+    count = property(_get_count)
+
+    __hits = 0
+    def _get_hits(self):
+        return self.__hits
+    hits = property(_get_hits)
+
+    __misses = 0
+    def _get_misses(self):
+        return self.__misses
+    misses = property(_get_misses)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: createKey [tuple]
+    #   key of a query executed with parameters
+    def createKey(self, query, parameters):
+        if isinstance(parameters, dict):
+            parameters = sorted([(name, repr(value)) for name, value in parameters.items()])
+        return (query, repr(parameters))
+
+    # method: get [rows]
+    #   returns the cached rows or None if missing or expired
+    def get(self, key):
+        with self.__lock:
+            entry = self.__entries.pop(key, None)
+            if entry is not None and entry[1] < time.time():
+                self._remove(key, entry)
+                entry = None
+            if entry is None:
+                self.__misses += 1
+                return None
+            self.__entries[key] = entry
+            self.__hits += 1
+            return entry[0]
+
+    # method: generation [tuple]
+    #   invalidation counters of tables, taken before a read
+    #   and passed to put
+    def generation(self, tables):
+        with self.__lock:
+            return tuple([self.__generations.get(table, 0) for table in sorted(tables)])
+
+    # method: put [void]
+    #   caches rows read from tables. if generation is given
+    #   the rows are dropped when one of the tables was
+    #   invalidated since, they may predate a write
+    def put(self, key, rows, tables, generation = None):
+        size = self._sizeof(rows)
+        if size > self.__maxbytes:
+            return
+        with self.__lock:
+            if generation is not None and generation != tuple([self.__generations.get(table, 0) for table in sorted(tables)]):
+                return
+            entry = self.__entries.pop(key, None)
+            if entry is not None:
+                self._remove(key, entry)
+            self.__entries[key] = (rows, time.time() + self.__ttl, size, tables)
+            self.__bytes += size
+            for table in tables:
+                self.__tables.setdefault(table, set()).add(key)
+            while self.__bytes > self.__maxbytes:
+                key, entry = self.__entries.popitem(False)
+                self._remove(key, entry)
+
+    # method: invalidate [void]
+    #   drops all results read from table
+    def invalidate(self, table):
+        with self.__lock:
+            self.__generations[table] = self.__generations.get(table, 0) + 1
+            for key in self.__tables.pop(table, ()):
+                entry = self.__entries.pop(key, None)
+                if entry is not None:
+                    self._remove(key, entry)
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.__tables.clear()
+            self.__bytes = 0
+            self.__hits = 0
+            self.__misses = 0
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    # method: _remove [void]
+    #   accounts a removed entry, the lock has to be held
+    def _remove(self, key, entry):
+        self.__bytes -= entry[2]
+        for table in entry[3]:
+            keys = self.__tables.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if len(keys) == 0:
+                    del self.__tables[table]
+
+    # method: _sizeof [integer]
+    #   estimated memory of a result
+    def _sizeof(self, rows):
+        size = sys.getsizeof(rows)
+        for row in rows:
+            size += sys.getsizeof(row)
+            values = row.values() if isinstance(row, dict) else row
+            for value in values:
+                size += sys.getsizeof(value)
+        return size
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbTransaction
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbTransaction(object):
+
+    def __init__(self, dbconnection):
+        self.__connection = dbconnection
+    
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    # property: connection [DbConnection] (readonly)
+    #   connection the transaction is running on
+    __connection = None
+    def _get_connection(self):
+        return self.__connection
+    connection = property(_get_connection)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    def __enter__(self):
+        self.__connection.begin()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.__connection.end(type is None)
+        return False
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbTransactionError
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbTransactionError(Exception):
+    pass
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbPoolError
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbPoolError(Exception):
+    pass
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbBulkInsertError
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbBulkInsertError(Exception):
+
+    # constructor 
+    #   parameters:
+    #       error           exception the failed batch raised
+    #       lastrowid       lastrowid of the first batch
+    #       rowsaffected    rowsaffected of each committed batch
+    def __init__(self, error, lastrowid, rowsaffected):
+        super(DbBulkInsertError, self).__init__('%d rows committed before a batch failed: %s' % (sum(rowsaffected), error))
+        self.__error = error
+        self.__lastrowid = lastrowid
+        self.__rowsaffected = rowsaffected
+
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    # property: error [Exception] (readonly)
+    #   exception the failed batch raised
+    __error = None
+    def _get_error(self):
+        return self.__error
+    error = property(_get_error)
+
+    # property: lastrowid [integer] (readonly)
+    #   lastrowid of the first batch
+    __lastrowid = -1
+    def _get_lastrowid(self):
+        return self.__lastrowid
+    lastrowid = property(_get_lastrowid)
+
+    # property: rowsaffected [list] (readonly)
+    #   rowsaffected of each batch committed before the failure
+    __rowsaffected = []
+    def _get_rowsaffected(self):
+        return self.__rowsaffected
+    rowsaffected = property(_get_rowsaffected)
+
+    # property: committed [integer] (readonly)
+    #   rows committed before the failure
+    def _get_committed(self):
+        return sum(self.__rowsaffected)
+    committed = property(_get_committed)
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbConnectionPool
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbConnectionPool(object):
+
+    # constructor 
+    #   parameters:
+    #       config          object holding host, name, user
+    #                       and password of the database
+    #       minsize         connections kept open while idle
+    #       maxsize         upper bound of open connections
+    #       timeout         seconds acquire waits for a free
+    #                       connection before it fails
+    #       idletimeout     seconds an idle connection above
+    #                       minsize is kept open
+    #       ping            checks liveness on checkout
+    #       driver          driver opening the connections,
+    #                       by default the one of config
+    def __init__(self, config, minsize = 1, maxsize = 10, timeout = 30.0, idletimeout = 300.0, ping = True, driver = None):
+        if maxsize < 1 or minsize < 0 or minsize > maxsize:
+            raise ValueError('invalid pool size %d..%d' % (minsize, maxsize))
+        self.__host = config.host
+        self.__name = config.name
+        self.__user = config.user
+        self.__password = config.password
+        self.__minsize = minsize
+        self.__maxsize = maxsize
+        self.__timeout = timeout
+        self.__idletimeout = idletimeout
+        self.__ping = ping
+        self.__driver = getDriver(driver if driver is not None else getattr(config, 'driver', None))
+        self.__idle = collections.deque()
+        self.__size = 0
+        self.__closed = False
+        self.__lock = threading.Condition(threading.Lock())
+
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    # property: minsize [integer] (readonly)
+    #   connections kept open while idle
+    __minsize = 0
+    def _get_minsize(self):
+        return self.__minsize
+    minsize = property(_get_minsize)
+
+    # property: maxsize [integer] (readonly)
+    #   upper bound of open connections
+    __maxsize = 0
+    def _get_maxsize(self):
+        return self.__maxsize
+    maxsize = property(_get_maxsize)
+
+    # property: timeout [float]
+    #   seconds acquire waits for a free connection
+    __timeout = None
+    def _get_timeout(self):
+        return self.__timeout
+    def _set_timeout(self, value):
+        self.__timeout = value
+    timeout = property(_get_timeout, _set_timeout)
+
+    # property: idletimeout [float]
+    #   seconds an idle connection above minsize is kept open
+    __idletimeout = None
+    def _get_idletimeout(self):
+        return self.__idletimeout
+    def _set_idletimeout(self, value):
+        self.__idletimeout = value
+    idletimeout = property(_get_idletimeout, _set_idletimeout)
+
+    # property: size [integer] (readonly)
+    #   count of open connections, idle and checked out
+    __size = 0
+    def _get_size(self):
+        return self.__size
+    size = property(_get_size)
+
+    # property: idle [integer] (readonly)
+    #   count of connections waiting for checkout
+    def _get_idle(self):
+        return len(self.__idle)
+    idle = property(_get_idle)
+
+    # property: inuse [integer] (readonly)
+    #   count of checked out connections
+    def _get_inuse(self):
+        return self.__size - len(self.__idle)
+    inuse = property(_get_inuse)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: fill [void]
+    #   opens connections until minsize is reached
+    def fill(self):
+        conns = []
+        while self.size < self.minsize:
+            conns.append(self.acquire())
+        for conn in conns:
+            self.release(conn)
+
+    # method: acquire [MySQLdb.Connection]
+    #   checks out an idle connection or opens a new one,
+    #   waits up to timeout seconds if maxsize is reached
+    def acquire(self, timeout = None):
+        if timeout is None:
+            timeout = self.__timeout
+        deadline = None
+        if timeout is not None:
+            deadline = time.time() + timeout
+
+        conn = None
+        with self.__lock:
+            while True:
+                if self.__closed:
+                    raise DbPoolError('pool is closed')
+                self._evict()
+                if len(self.__idle) > 0:
+                    conn = self.__idle.pop()[0]
+                    break
+                if self.__size < self.__maxsize:
+                    self.__size += 1
+                    break
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise DbPoolError('timeout after %.1fs waiting for a connection' % timeout)
+                self.__lock.wait(remaining)
+
+        if conn is not None and self.__ping:
+            try:
+                self.__driver.ping(conn)
+            except self.__driver.Error:
+                self._close(conn)
+                conn = None
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except:
+                with self.__lock:
+                    self.__size -= 1
+                    self.__lock.notify()
+                raise
+        return conn
+
+    # method: release [void]
+    #   returns a checked out connection to the pool. it is
+    #   rolled back first unless rollback is False, which the
+    #   caller passes if no statement ran since the last commit
+    def release(self, conn, rollback = True):
+        if rollback:
+            try:
+                conn.rollback()
+            except self.__driver.Error:
+                self.discard(conn)
+                return
+        with self.__lock:
+            if not self.__closed:
+                self.__idle.append((conn, time.time()))
+                self.__lock.notify()
+                return
+            self.__size -= 1
+        self._close(conn)
+
+    # method: discard [void]
+    #   closes a checked out connection instead of
+    #   returning it, e.g. after it got broken
+    def discard(self, conn):
+        with self.__lock:
+            self.__size -= 1
+            self.__lock.notify()
+        self._close(conn)
+
+    # method: close [void]
+    #   closes all idle connections, connections still
+    #   checked out are closed on release
+    def close(self):
+        with self.__lock:
+            self.__closed = True
+            idle = [entry[0] for entry in self.__idle]
+            self.__idle.clear()
+            self.__size -= len(idle)
+            self.__lock.notify_all()
+        for conn in idle:
+            self._close(conn)
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    # method: _connect [MySQLdb.Connection]
+    #   opens a new connection to the db
+    def _connect(self):
+        return self.__driver.connect(self.__host, 
+                                     self.__user, 
+                                     self.__password, 
+                                     self.__name)
+
+    # method: _close [void]
+    #   closes a connection, errors are ignored
+    def _close(self, conn):
+        try:
+            conn.close()
+        except self.__driver.Error:
+            pass
+
+    # method: _evict [void]
+    #   drops idle connections above minsize which exceeded
+    #   idletimeout, the lock has to be held by the caller
+    def _evict(self):
+        if self.__idletimeout is None:
+            return
+        limit = time.time() - self.__idletimeout
+        while len(self.__idle) > 0 and self.__size > self.__minsize and self.__idle[0][1] < limit:
+            conn = self.__idle.popleft()[0]
+            self.__size -= 1
+            self._close(conn)
+
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 # class DbCommand
 #
@@ -184,7 +927,7 @@ class DbCommand(object):
     #   returns query string used by command
     def _get_query(self):
         if self.is_sqlstatement:
-            query = self.sql.render()
+            query = self.sql.compile()
         else:
             query = str(self.sql)
         return query
@@ -197,13 +940,16 @@ class DbCommand(object):
         return isinstance(self.sql, DbSqlStatement)
     is_sqlstatement = property(_get_is_sqlstatement)
 
-    # property: parameters [dictionary] (readonly)
+    # property: parameters [dictionary]
     #   holds a reference to the parameters collection
-    #   used by a dbcommand-object when executed
+    #   used by a dbcommand-object when executed, may be
+    #   replaced to execute the command again with new values
     __parameters = dict()
     def _get_parameters(self):
         return self.__parameters
-    parameters = property(_get_parameters)
+    def _set_parameters(self, value):
+        self.__parameters = value
+    parameters = property(_get_parameters, _set_parameters)
 
     # property: lastrowid [integer] (readonly)
     #   returns last id of affected row by command
@@ -213,6 +959,24 @@ class DbCommand(object):
         return self.__lastrowid
     lastrowid = property(_get_lastrowid)
 
+    # property: rowmode [EN_ROWMODE]
+    #   type of fetched rows, dictionaries or compact DbRow
+    #   tuples supporting index, key and attribute access
+    __rowmode = EN_ROWMODE.Dict
+    def _get_rowmode(self):
+        return self.__rowmode
+    def _set_rowmode(self, value):
+        self.__rowmode = value
+    rowmode = property(_get_rowmode, _set_rowmode)
+
+    # property: description [tuple] (readonly)
+    #   column description of the last executed query,
+    #   None if it returned no rows
+    __description = None
+    def _get_description(self):
+        return self.__description
+    description = property(_get_description)
+
     # property: rowsaffected [integer] (readonly)
     #   returns count of rows affected by command
     #   if no rows are affected, it will return -1
@@ -226,25 +990,64 @@ class DbCommand(object):
     # ------------------------------------------------------
     
     # method: registerField
-    #   registers a field used in query
+    #   registers a field used in query. a condition on the
+    #   field shares its parameter while both bind the same
+    #   value, a condition bound to another value is moved to
+    #   a new parameter
     def registerField(self, name, value=None):
         self.sql.registerField(name)
         if (value is not None):
+            if name in self.parameters and self.parameters[name] != value:
+                renamed = self.sql.renameParameter(name)
+                if renamed is not None:
+                    self.parameters[renamed] = self.parameters[name]
             self.parameters[name] = value
 
-    # method: registerCondition
-    #   registers a condition used in query
-    def registerCondition(self, name, value=None):
-        self.sql.registerCondition(name)
+    # method: registerCondition [DbSqlCondition]
+    #   registers a condition used in query, on group if
+    #   given. the value is bound to the parameter named by
+    #   the condition, unique if the field is compared twice
+    def registerCondition(self, name, value=None, operator='AND', group=None):
+        return self.registerConditionWithOperand(name, '=', value, operator, group)
+
+    # method: registerConditionWithOperand [DbSqlCondition]
+    #   registers a condition with operand used in query
+    def registerConditionWithOperand(self, name, operand, value=None, operator='AND', group=None):
+        condition = self._conditions(group).registerCondition(name, operand, operator)
         if (value is not None):
-            self.parameters[name] = value
-
-    # method: registerCondition
-    #   registers a condition used in query
-    def registerConditionWithOperand(self, name, operand, value=None):
-        self.sql.registerCondition(name, operand)
-        if (value is not None):
-            self.parameters[name] = value
+            self._bind(condition.parameter, value)
+        return condition
+
+    # method: registerInCondition [DbSqlInCondition]
+    #   registers a condition matching any of values, each
+    #   value is bound to its own parameter
+    def registerInCondition(self, name, values, negate=False, operator='AND', group=None):
+        values = list(values)
+        condition = self._conditions(group).registerInCondition(name, len(values), operator, negate)
+        for parameter, value in zip(condition.parameters, values):
+            self._bind(parameter, value)
+        return condition
+
+    # method: registerBetweenCondition [DbSqlBetweenCondition]
+    #   registers a condition matching values from low to
+    #   high inclusive
+    def registerBetweenCondition(self, name, low, high, negate=False, operator='AND', group=None):
+        condition = self._conditions(group).registerBetweenCondition(name, operator, negate)
+        self._bind(condition.low, low)
+        self._bind(condition.high, high)
+        return condition
+
+    # method: registerNullCondition [DbSqlNullCondition]
+    #   registers a condition matching NULL, or anything but
+    #   NULL if isnull is False
+    def registerNullCondition(self, name, isnull=True, operator='AND', group=None):
+        return self._conditions(group).registerNullCondition(name, isnull, operator)
+
+    # method: registerGroup [DbSqlConditionGroup]
+    #   registers a parenthesized group of conditions, passed
+    #   as group to the register methods of its conditions
+    def registerGroup(self, operator='AND', group=None):
+        return self._conditions(group).registerGroup(operator)
 
     # method: registerLikeCondition
     #   registers a condition with like operand used in query
@@ -264,73 +1067,135 @@ class DbCommand(object):
     # method: fetchone [rows]
     #   executes command and returns one row
     def fetchone(self, cursortype=cursors.DictCursor):
+        if self.rowmode == EN_ROWMODE.Compact:
+            cursortype = cursors.Cursor
+        probe = monitor.probe()
         conn_open = self.connection.is_connected
         if not (conn_open):
             self.connection.connect()
+            probe.lap('connect')
         try:
             cursor = self.connection.cursor(cursortype)
-            self._execute(cursor)
+            self._execute(cursor, probe)
             ret = cursor.fetchone()
             cursor.close()
+            if ret is not None:
+                probe.count(1)
+                if self.rowmode == EN_ROWMODE.Compact:
+                    ret = self._compactRows((ret,))[0]
+            probe.lap('fetch')
             return ret
-        except mysql.Error as e:
+        except self.connection.driver.Error as e:
+            probe.fail(e)
             raise e
-        except mysql.Warning as e:
+        except self.connection.driver.Warning as e:
+            probe.fail(e)
             raise e
         finally:
-            if not (conn_open):
-                self.connection.close()
+            try:
+                probe.finish(self)
+            finally:
+                if not (conn_open):
+                    self.connection.close()
 
     # method: fetchall [rows]
     #   executes command and returns rows
     def fetchall(self, cursortype=cursors.DictCursor):
+        if self.rowmode == EN_ROWMODE.Compact:
+            cursortype = cursors.Cursor
+        probe = monitor.probe()
         conn_open = self.connection.is_connected
         if not (conn_open):
             self.connection.connect()
+            probe.lap('connect')
         try:
-            self.connection.connect()
             cursor = self.connection.cursor(cursortype)
-            self._execute(cursor)
+            self._execute(cursor, probe)
             ret = cursor.fetchall()
             cursor.close()
+            if self.rowmode == EN_ROWMODE.Compact:
+                ret = self._compactRows(ret)
+            probe.count(len(ret))
+            probe.lap('fetch')
             return ret
-        except mysql.Error as e:
+        except self.connection.driver.Error as e:
+            probe.fail(e)
             raise e
-        except mysql.Warning as e:
+        except self.connection.driver.Warning as e:
+            probe.fail(e)
             raise e
         finally:
-            if not (conn_open):
-                self.connection.close()
+            try:
+                probe.finish(self)
+            finally:
+                if not (conn_open):
+                    self.connection.close()
 
     # method: commit [void]
-    #   commits the command
+    #   commits the command, inside a transaction scope the
+    #   command is executed and committed with the scope
     def commit(self):
+        probe = monitor.probe()
+        if self.connection.in_transaction:
+            try:
+                self._execute(self.connection.transactioncursor, probe)
+                self._invalidate()
+            except Exception as e:
+                probe.fail(e)
+                raise
+            finally:
+                probe.finish(self)
+            return
         conn_open = self.connection.is_connected
         if not (conn_open):
             self.connection.connect()
+            probe.lap('connect')
         try:
-            self.connection.connect()
             cursor = self.connection.cursor(cursors.Cursor)
-            self._execute(cursor)
+            self._execute(cursor, probe)
             self.connection.commit()
+            probe.lap('commit')
             cursor.close()
-        except mysql.Error as e:
+            self._invalidate()
+        except self.connection.driver.Error as e:
+            probe.fail(e)
             self.connection.rollback()
             raise e
-        except mysql.Warning as e:
+        except self.connection.driver.Warning as e:
+            probe.fail(e)
             self.connection.rollback()
             raise e
         finally:
-            if not (conn_open):
-                self.connection.close()
+            try:
+                probe.finish(self)
+            finally:
+                if not (conn_open):
+                    self.connection.close()
 
     # ------------------------------------------------------
     #   private methods 
     # ------------------------------------------------------
 
+    # method: _bind [void]
+    #   binds the value of a condition to parameter. if it is
+    #   also a field assigned to another value, the condition
+    #   is moved to a new parameter
+    def _bind(self, parameter, value):
+        if parameter in self.sql.fields and parameter in self.parameters and self.parameters[parameter] != value:
+            parameter = self.sql.renameParameter(parameter)
+        self.parameters[parameter] = value
+
+    # method: _conditions [DbSqlConditionList]
+    #   the statement or the group conditions are registered on
+    def _conditions(self, group):
+        if group is None:
+            return self.sql
+        return group
+
     # method: _execute [void]
-    #   registers a condition used in query
-    def _execute(self, cursor):
+    #   executes the query on cursor, the compile and execute
+    #   time is recorded on probe
+    def _execute(self, cursor, probe=nullprobe):
 
         if isinstance(self.parameters, dict):
             p = tuple(self.parameters.values())
@@ -340,15 +1205,39 @@ class DbCommand(object):
             p = self.parameters
 
         query = self.query
-        #print(query)
+        probe.lap('compile')
 
-        if self.parameters is None or len(self.parameters) is 0:
+        if self.parameters is None or len(self.parameters) == 0:
             cursor.execute(query)
         else:
             cursor.execute(query, self.parameters)
-
-        self.__rowsaffected = cursor.rowcount
-        self.__lastrowid = cursor.lastrowid
+        probe.lap('execute')
+        self._result(cursor.rowcount, cursor.lastrowid, cursor.description)
+
+    # method: _result [void]
+    #   records rowsaffected, lastrowid and description of
+    #   an execution
+    def _result(self, rowsaffected, lastrowid, description = None):
+        self.__rowsaffected = rowsaffected
+        self.__lastrowid = lastrowid
+        self.__description = description
+
+    # method: _compactRows [tuple]
+    #   converts tuple rows into DbRow objects, rows of a
+    #   statement without result columns are returned as is
+    def _compactRows(self, rows):
+        if self.description is None:
+            return rows
+        rowtype = createRowType([column[0] for column in self.description])
+        return tuple(map(rowtype, rows))
+
+    # method: _invalidate [void]
+    #   drops cached results of the table written by the command
+    def _invalidate(self):
+        if self.connection.scope is not None:
+            self.connection.scope.written = True
+        if self.is_sqlstatement:
+            self.connection.invalidate(self.sql.table)
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 # class DbSelectCommand
@@ -388,19 +1277,363 @@ class DbSelectCommand(DbCommand):
     def registerRemoteRelation(self, table, field, referencetable, referencefield):
         self.sql.registerRemoteRelation(table, field, referencetable, referencefield)
         
+    # method: fetchall [rows]
+    #   executes command and returns rows, served from the
+    #   resultcache of the connection if there is one
+    def fetchall(self, cursortype=cursors.DictCursor):
+        cache = self.connection.resultcache
+        if cache is None or self.connection.in_transaction:
+            return super(DbSelectCommand, self).fetchall(cursortype)
+        key = cache.createKey(self.query, self.parameters) + (cursortype.__name__, self.rowmode)
+        tables = set([self.sql.table])
+        for relation in self.sql.relations:
+            tables.add(relation.table)
+            tables.add(relation.referencetable)
+        generation = cache.generation(tables)
+        rows = cache.get(key)
+        if rows is None:
+            rows = super(DbSelectCommand, self).fetchall(cursortype)
+            cache.put(key, rows, tables, generation)
+        if len(rows) > 0 and isinstance(rows[0], dict):
+            rows = tuple([dict(row) for row in rows])
+        return rows
+
     # method: execute [rows]
     #   executes query and returns all rows
     def execute(self):
         return self.fetchall()
 
+    # method: paginate [generator]
+    #   yields the rows ordered by key, fetched in pages of
+    #   pagesize rows. pages are sought with key > last key
+    #   instead of a limit offset, so every page costs the
+    #   same regardless of its depth. key has to be unique.
+    #   the conditions are grouped before the key condition is
+    #   added, the statement must not have an orderby or limit
+    def paginate(self, key='id', pagesize=1000):
+        if self.sql.orderby != '' or self.sql.limit_start > 0 or self.sql.limit_duration > 0:
+            raise ValueError('paginate orders and limits by key, the statement has an orderby or limit')
+        column = key.split('.')[-1]
+        statement = self.sql.copy()
+        if statement.conditionLength > 1:
+            statement.groupConditions()
+        if not ('*' in statement.fields or key in statement.fields or column in statement.fields):
+            statement.registerField(key)
+        statement.orderby = key
+        statement.limit_duration = pagesize
+
+        condition = None
+        command = DbCommand(self.connection, statement)
+        command.parameters = dict(self.parameters)
+        command.rowmode = self.rowmode
+        rows = command.fetchall()
+        while len(rows) > 0:
+            for row in rows:
+                yield row
+            if len(rows) < pagesize:
+                break
+            if condition is None:
+                condition = statement.registerCondition(key, '>')
+            command.parameters[condition.parameter] = rows[-1][column]
+            rows = command.fetchall()
+
+    # method: iterate [generator]
+    #   executes query on a server-side cursor and yields the
+    #   rows fetched in batches of batch_size, so the result is
+    #   never buffered as a whole. the connection stays checked
+    #   out until the generator is exhausted or closed
+    def iterate(self, batch_size=1000, cursortype=cursors.SSDictCursor):
+        if self.rowmode == EN_ROWMODE.Compact:
+            cursortype = cursors.SSCursor
+        for rows in self._iterateBatches(batch_size, cursortype):
+            if self.rowmode == EN_ROWMODE.Compact:
+                rows = self._compactRows(rows)
+            for row in rows:
+                yield row
+
+    # method: executeColumnar [dictionary]
+    #   executes query and returns a dictionary of column name
+    #   to numpy array. numeric columns become int64 or float64
+    #   arrays (NULL as nan), string columns with at most
+    #   maxcategories distinct values a DbEncodedColumn and all
+    #   other columns object arrays. the rows are streamed and
+    #   converted in batches of batch_size
+    def executeColumnar(self, batch_size=10000, maxcategories=1024):
+        if _importNumpy() is None:
+            raise ImportError('executeColumnar requires numpy')
+        columns = None
+        for rows in self._iterateBatches(batch_size, cursors.SSCursor):
+            if columns is None:
+                columns = [DbColumnBuffer(maxcategories) for column in self.description]
+            for index, values in enumerate(zip(*rows)):
+                columns[index].append(values)
+        if self.description is None:
+            return dict()
+        if columns is None:
+            columns = [DbColumnBuffer(maxcategories) for column in self.description]
+        ret = dict()
+        for index, column in enumerate(self.description):
+            ret[column[0]] = columns[index].result()
+        return ret
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    # method: _iterateBatches [generator]
+    #   executes query on a server-side cursor and yields
+    #   the rows in lists of batch_size. fetch time excludes
+    #   the time the caller spends between batches
+    def _iterateBatches(self, batch_size, cursortype):
+        probe = monitor.probe()
+        conn_open = self.connection.is_connected
+        cursor = None
+        try:
+            if not (conn_open):
+                self.connection.connect()
+                probe.lap('connect')
+            cursor = self.connection.cursor(cursortype)
+            self._execute(cursor, probe)
+            while True:
+                started = time.time()
+                rows = cursor.fetchmany(batch_size)
+                probe.add('fetch', time.time() - started)
+                if not rows:
+                    break
+                probe.count(len(rows))
+                yield rows
+        except Exception as e:
+            probe.fail(e)
+            raise
+        finally:
+            try:
+                if cursor is not None:
+                    cursor.close()
+                probe.finish(self)
+            finally:
+                if not (conn_open) and self.connection.is_connected:
+                    self.connection.close()
+
+# function: _importNumpy [module]
+#   imports numpy on first use, None if it is not installed
+def _importNumpy():
+    global numpy
+    if numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            return None
+    return numpy
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbEncodedColumn
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbEncodedColumn(object):
+
+    # constructor 
+    #   parameters:
+    #       codes           int32 array of indices into
+    #                       categories, -1 for NULL
+    #       categories      object array of distinct values
+    def __init__(self, codes, categories):
+        self.__codes = codes
+        self.__categories = categories
+
+    def __len__(self):
+        return len(self.__codes)
+    
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    __codes = None
+    def _get_codes(self):
+        return self.__codes
+    codes = property(_get_codes)
+
+    __categories = None
+    def _get_categories(self):
+        return self.__categories
+    categories = property(_get_categories)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: decode [numpy.ndarray]
+    #   returns the values as object array
+    def decode(self):
+        values = numpy.empty(len(self.__categories) + 1, dtype=object)
+        values[:-1] = self.__categories
+        return values[self.__codes]
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbColumnBuffer
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbColumnBuffer(object):
+
+    NUMERIC = (int, float, decimal.Decimal)
+
+    def __init__(self, maxcategories):
+        if _importNumpy() is None:
+            raise ImportError('DbColumnBuffer requires numpy')
+        self.__maxcategories = maxcategories
+        self.__kind = None
+        self.__chunks = []
+        self.__categories = dict()
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: append [void]
+    #   converts the values of a batch into an array chunk
+    def append(self, values):
+        if self.__kind is None:
+            for value in values:
+                if value is None:
+                    continue
+                if isinstance(value, self.NUMERIC) and not isinstance(value, bool):
+                    self.__kind = 'numeric'
+                elif isinstance(value, str):
+                    self.__kind = 'category'
+                else:
+                    self.__kind = 'object'
+                break
+            if self.__kind is None:
+                self.__chunks.append(numpy.array(values, dtype=object))
+                return
+            self._fill()
+
+        if self.__kind == 'numeric':
+            chunk = self._numeric(values)
+            if chunk is not None:
+                self.__chunks.append(chunk)
+                return
+            self._convert('object')
+        elif self.__kind == 'category':
+            chunk = self._encode(values)
+            if chunk is not None:
+                self.__chunks.append(chunk)
+                return
+            self._convert('object')
+        self.__chunks.append(numpy.array(values, dtype=object))
+
+    # method: result [numpy.ndarray or DbEncodedColumn]
+    #   concatenates the chunks of all batches
+    def result(self):
+        if len(self.__chunks) == 0:
+            return numpy.array([], dtype=object)
+        values = numpy.concatenate(self._unify(self.__chunks))
+        if self.__kind == 'category':
+            return DbEncodedColumn(values, self._categories())
+        return values
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    # method: _unify [list]
+    #   numpy concatenates int64 and uint64 to float64, so
+    #   the int64 chunks of a uint64 column are widened to
+    #   uint64 or, if they hold negative values, all chunks
+    #   to object
+    def _unify(self, chunks):
+        dtypes = set([chunk.dtype for chunk in chunks])
+        if dtypes != set([numpy.dtype(numpy.int64), numpy.dtype(numpy.uint64)]):
+            return chunks
+        if all([len(chunk) == 0 or chunk.min() >= 0 for chunk in chunks]):
+            return [chunk.astype(numpy.uint64) for chunk in chunks]
+        return [chunk.astype(object) for chunk in chunks]
+
+    # method: _numeric [numpy.ndarray]
+    #   returns an int64 or float64 chunk, uint64 if an integer
+    #   exceeds int64 (BIGINT UNSIGNED), None if a value is
+    #   not numeric or fits neither
+    def _numeric(self, values):
+        dtype = numpy.int64
+        for value in values:
+            if value is None:
+                dtype = numpy.float64
+            elif isinstance(value, float) or isinstance(value, decimal.Decimal):
+                dtype = numpy.float64
+            elif not isinstance(value, int) or isinstance(value, bool):
+                return None
+        if dtype is numpy.float64:
+            return numpy.array([numpy.nan if value is None else float(value) for value in values], dtype=dtype)
+        try:
+            return numpy.array(values, dtype=dtype)
+        except OverflowError:
+            pass
+        try:
+            return numpy.array(values, dtype=numpy.uint64)
+        except OverflowError:
+            return None
+
+    # method: _encode [numpy.ndarray]
+    #   returns an int32 chunk of category codes, None if a
+    #   value is not a string or there are too many categories
+    def _encode(self, values):
+        categories = self.__categories
+        codes = numpy.empty(len(values), dtype=numpy.int32)
+        for index, value in enumerate(values):
+            if value is None:
+                codes[index] = -1
+                continue
+            code = categories.get(value)
+            if code is None:
+                if not isinstance(value, str) or len(categories) >= self.__maxcategories:
+                    return None
+                code = len(categories)
+                categories[value] = code
+            codes[index] = code
+        return codes
+
+    def _categories(self):
+        categories = numpy.empty(len(self.__categories), dtype=object)
+        for value, code in self.__categories.items():
+            categories[code] = value
+        return categories
+
+    # method: _fill [void]
+    #   replaces the chunks read before the column kind was
+    #   known, they only hold NULL values
+    def _fill(self):
+        if self.__kind == 'numeric':
+            self.__chunks = [numpy.full(len(chunk), numpy.nan) for chunk in self.__chunks]
+        elif self.__kind == 'category':
+            self.__chunks = [numpy.full(len(chunk), -1, dtype=numpy.int32) for chunk in self.__chunks]
+
+    # method: _convert [void]
+    #   switches the column kind, chunks of the previous
+    #   kind are converted to object arrays
+    def _convert(self, kind):
+        chunks = self.__chunks
+        if self.__kind == 'category' and kind == 'object':
+            chunks = [DbEncodedColumn(chunk, self._categories()).decode() for chunk in chunks]
+        self.__chunks = [chunk.astype(object) for chunk in chunks]
+        self.__kind = kind
+
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 # class DbInsertCommand
 #
 #
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 class DbInsertCommand(DbCommand):
-    def __init__(self, dbconnection, tablename):
-        sql = DbSqlInsertStatement(tablename)
+
+    # constructor
+    #   parameters:
+    #       dbconnection    a initialized dbconnection
+    #       tablename       table inserted into
+    #       sql             insert statement, a new
+    #                       DbSqlInsertStatement if None
+    def __init__(self, dbconnection, tablename, sql=None):
+        if sql is None:
+            sql = DbSqlInsertStatement(tablename)
         super(DbInsertCommand, self).__init__(dbconnection, sql)
 
     # ------------------------------------------------------
@@ -413,6 +1646,157 @@ class DbInsertCommand(DbCommand):
         self.commit()
         return self.lastrowid
 
+    # method: executeBulk [tuple]
+    #   inserts an iterable of parameter dictionaries with
+    #   multi-row inserts of up to batchsize rows, each batch
+    #   stays below maxpacket bytes (max_allowed_packet of the
+    #   server if None). commits every batch or, if commitbatches
+    #   is False, once after the last batch. returns the lastrowid
+    #   of the first batch and the rowsaffected of each batch.
+    #   all rows need the same fields. if a batch fails after
+    #   earlier batches were committed, DbBulkInsertError reports
+    #   them, otherwise the error of the batch is raised
+    def executeBulk(self, rows, batchsize=1000, maxpacket=None, commitbatches=True):
+        probe = monitor.probe()
+        result = [-1, []]
+        if self.connection.in_transaction:
+            try:
+                self._insertRows(self.connection.transactioncursor, rows, batchsize, maxpacket, False, result)
+                probe.lap('execute')
+                return tuple(result)
+            except Exception as e:
+                probe.fail(e)
+                raise
+            finally:
+                try:
+                    probe.finish(self)
+                finally:
+                    if len(result[1]) > 0:
+                        self._invalidate()
+
+        conn_open = self.connection.is_connected
+        if not (conn_open):
+            self.connection.connect()
+            probe.lap('connect')
+        cursor = None
+        written = False
+        try:
+            cursor = self.connection.cursor(cursors.Cursor)
+            self._insertRows(cursor, rows, batchsize, maxpacket, commitbatches, result)
+            probe.lap('execute')
+            if not commitbatches:
+                self.connection.commit()
+                probe.lap('commit')
+            written = len(result[1]) > 0
+            return tuple(result)
+        except Exception as e:
+            probe.fail(e)
+            self.connection.rollback()
+            if commitbatches and len(result[1]) > 0:
+                written = True
+                raise DbBulkInsertError(e, result[0], result[1]) from e
+            raise
+        finally:
+            try:
+                probe.finish(self)
+            finally:
+                if written:
+                    self._invalidate()
+                if cursor is not None:
+                    cursor.close()
+                if not (conn_open):
+                    self.connection.close()
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    # method: _insertRows [void]
+    #   splits rows into batches and executes them on cursor,
+    #   records the lastrowid and the rowsaffected of the
+    #   executed batches in result. raises ValueError for a row
+    #   whose fields differ from the registered ones
+    def _insertRows(self, cursor, rows, batchsize, maxpacket, commit, result):
+        if maxpacket is None:
+            cursor.execute('SELECT @@max_allowed_packet')
+            maxpacket = int(cursor.fetchone()[0])
+        budget = maxpacket - 1024
+
+        batch = []
+        size = 0
+        for index, row in enumerate(rows):
+            if self.sql.fieldLength == 0:
+                for name in row:
+                    self.registerField(name)
+            fields = self.sql.fields
+            if len(row) != len(fields) or not all(name in row for name in fields):
+                raise ValueError('row %d has the fields %s, expected %s' % (index, ', '.join(row), ', '.join(fields)))
+            values = [row[name] for name in fields]
+            rowsize = 4
+            for value in values:
+                rowsize += self._sizeof(value)
+            if len(batch) > 0 and (len(batch) >= batchsize or size + rowsize > budget):
+                self._executeBatch(cursor, batch, commit, result)
+                batch = []
+            if len(batch) == 0:
+                size = len(self.sql.renderRows(0))
+            batch.append(values)
+            size += rowsize
+        if len(batch) > 0:
+            self._executeBatch(cursor, batch, commit, result)
+
+    # method: _executeBatch [void]
+    #   executes one multi-row insert and records its result
+    def _executeBatch(self, cursor, batch, commit, result):
+        parameters = []
+        for values in batch:
+            parameters.extend(values)
+        cursor.execute(self.sql.renderRows(len(batch)), tuple(parameters))
+        if commit:
+            self.connection.commit()
+        if result[0] == -1:
+            result[0] = cursor.lastrowid
+        result[1].append(cursor.rowcount)
+
+    # method: _sizeof [integer]
+    #   upper bound of the escaped size of a value in a query
+    def _sizeof(self, value):
+        if value is None:
+            return 5
+        if isinstance(value, bytes):
+            return 2 * len(value) + 12
+        if isinstance(value, str):
+            return 2 * len(value.encode('utf-8')) + 3
+        if isinstance(value, (int, float)):
+            return 32
+        return 2 * len(str(value)) + 3
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbUpsertCommand
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbUpsertCommand(DbInsertCommand):
+    def __init__(self, dbconnection, tablename):
+        super(DbUpsertCommand, self).__init__(dbconnection, tablename, DbSqlUpsertStatement(tablename))
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: registerUpdateField
+    #   registers a field assigned if the row already exists,
+    #   all fields are assigned if none is registered
+    def registerUpdateField(self, name):
+        self.sql.registerUpdateField(name)
+        
+    # method: execute [rows]
+    #   executes upsert-query and returns affected row count,
+    #   1 for an inserted and 2 for an updated row
+    def execute(self):
+        self.commit()
+        return self.rowsaffected
+
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 # class DbUpdateCommand
 #
@@ -484,6 +1868,15 @@ class DbTableAdapter(object):
         return self.__tablename
     tablename = property(_get_tablename)
 
+    # property: rowmode [EN_ROWMODE]
+    #   row type of the created select commands
+    __rowmode = EN_ROWMODE.Dict
+    def _get_rowmode(self):
+        return self.__rowmode
+    def _set_rowmode(self, value):
+        self.__rowmode = value
+    rowmode = property(_get_rowmode, _set_rowmode)
+
     def count(self):        
         cmd = self.createSelectCommand()
         cmd.registerField('COUNT(*)')
@@ -498,16 +1891,41 @@ class DbTableAdapter(object):
             return 0;
         return int(rows[0]['MAX(id)'])
 
+    def minid(self):        
+        cmd = self.createSelectCommand()
+        cmd.registerField('MIN(id)')
+        rows = cmd.execute()
+        if (rows[0]['MIN(id)'] is None):
+            return 0;
+        return int(rows[0]['MIN(id)'])
+
+    # method: parallelScan [generator]
+    #   reads the whole table in id ranges of chunk ids, up to
+    #   workers ranges are queried concurrently on separate
+    #   connections. yields the rows as the ranges complete,
+    #   or with a callback the result of callback(rows) per
+    #   range. the callback runs on the scanning thread or is
+    #   submitted to executor, e.g. a ProcessPoolExecutor
+    def parallelScan(self, workers=4, chunk=10000, fields=None, callback=None, executor=None):
+        return self._scan(self._ranges(chunk), workers, fields, callback, executor)
+
     # method: createSelectCommand [DbSelectCommand]
     #   wrapper method to create a DbSelectCommand
     def createSelectCommand(self):
-        return self.connection.createSelectCommand(self.tablename)
+        cmd = self.connection.createSelectCommand(self.tablename)
+        cmd.rowmode = self.rowmode
+        return cmd
 
     # method: createInsertCommand [DbInsertCommand]
     #   wrapper method to create a DbInsertCommand
     def createInsertCommand(self):
         return self.connection.createInsertCommand(self.tablename)
 
+    # method: createUpsertCommand [DbUpsertCommand]
+    #   wrapper method to create a DbUpsertCommand
+    def createUpsertCommand(self):
+        return self.connection.createUpsertCommand(self.tablename)
+
     # method: createUpdateCommand [DbUpdateCommand]
     #   wrapper method to create a DbUpdateCommand
     def createUpdateCommand(self):
@@ -518,6 +1936,305 @@ class DbTableAdapter(object):
     def createDeleteCommand(self):
         return self.connection.createDeleteCommand(self.tablename)
 
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    # method: _ranges [generator]
+    #   yields the adapter and the bounds of each id range of
+    #   chunk ids
+    def _ranges(self, chunk):
+        low = self.minid()
+        high = self.maxid()
+        for start in range(low, high + 1, chunk):
+            yield (self, (start, start + chunk))
+
+    # method: _scan [generator]
+    #   scans the ranges of tasks, pairs of an adapter and its
+    #   bounds, on up to workers threads of its own
+    def _scan(self, tasks, workers, fields, callback, executor):
+        tasks = iter(tasks)
+        with concurrent.futures.ThreadPoolExecutor(workers) as threads:
+            pending = set()
+            for adapter, bounds in tasks:
+                pending.add(threads.submit(adapter._scanRange, bounds, fields, callback, executor))
+                if len(pending) >= 2 * workers:
+                    break
+            while len(pending) > 0:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for adapter, bounds in tasks:
+                    pending.add(threads.submit(adapter._scanRange, bounds, fields, callback, executor))
+                    if len(pending) >= 2 * workers:
+                        break
+                for future in done:
+                    if callback is not None:
+                        yield future.result()
+                    else:
+                        for row in future.result():
+                            yield row
+
+    # method: _scanRange [rows]
+    #   reads the rows of an id range on a connection of its own
+    def _scanRange(self, bounds, fields, callback, executor):
+        cmd = self.connection.clone().createSelectCommand(self.tablename)
+        cmd.rowmode = self.rowmode
+        for field in (fields or ['*']):
+            cmd.registerField(field)
+        cmd.sql.registerCondition('id', '>=', 'AND', False, 'scan_low')
+        cmd.sql.registerCondition('id', '<', 'AND', False, 'scan_high')
+        cmd.registerParameter('scan_low', bounds[0])
+        cmd.registerParameter('scan_high', bounds[1])
+        rows = cmd.execute()
+        if callback is None:
+            return rows
+        if executor is not None:
+            return executor.submit(callback, rows).result()
+        return callback(rows)
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbScope
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbScope(object):
+
+    def __init__(self, variable):
+        self.__variable = variable
+        self.__depth = 0
+        self.__token = None
+        self.written = False
+
+    def __enter__(self):
+        if self.__depth == 0:
+            self.__token = self.__variable.set(self)
+        self.__depth += 1
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.__depth -= 1
+        if self.__depth == 0:
+            self.__variable.reset(self.__token)
+            self.__token = None
+        return False
+
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    # property: written [boolean]
+    #   indicates if a command wrote inside the scope
+    __written = False
+    def _get_written(self):
+        return self.__written
+    def _set_written(self, value):
+        self.__written = value
+    written = property(_get_written, _set_written)
+
+# method: measureReplicaLag [float]
+#   returns the seconds a replica is behind its source, None
+#   if replication is stopped or not configured on the server
+def measureReplicaLag(connection):
+    cursor = connection.cursor(cursors.DictCursor)
+    try:
+        try:
+            cursor.execute('SHOW REPLICA STATUS')
+            column = 'Seconds_Behind_Source'
+        except connection.driver.Error:
+            cursor.execute('SHOW SLAVE STATUS')
+            column = 'Seconds_Behind_Master'
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    if row is None or row[column] is None:
+        return None
+    return float(row[column])
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbReplica
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbReplica(object):
+
+    # constructor 
+    #   parameters:
+    #       config          object holding host, name, user
+    #                       and password of the replica
+    #       weight          share of reads relative to the
+    #                       other replicas
+    #       driver          driver opening the connections
+    def __init__(self, config, weight = 1, driver = None):
+        if weight <= 0:
+            raise ValueError('invalid replica weight %s' % weight)
+        self.host = config.host
+        self.name = config.name
+        self.user = config.user
+        self.password = config.password
+        self.__weight = weight
+        self.__driver = getDriver(driver if driver is not None else getattr(config, 'driver', None))
+        self.__lock = threading.Lock()
+        self.lagprobe = measureReplicaLag
+    
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    # property: weight [integer] (readonly)
+    #   share of reads relative to the other replicas
+    __weight = 1
+    def _get_weight(self):
+        return self.__weight
+    weight = property(_get_weight)
+
+    __driver = None
+    def _get_driver(self):
+        return self.__driver
+    driver = property(_get_driver)
+
+    # property: pool [DbConnectionPool] (readonly)
+    #   pool of the replica, None if it connects directly
+    __pool = None
+    def _get_pool(self):
+        return self.__pool
+    pool = property(_get_pool)
+
+    # property: inuse [integer] (readonly)
+    #   count of checked out connections
+    __inuse = 0
+    def _get_inuse(self):
+        return self.__inuse
+    inuse = property(_get_inuse)
+
+    # property: lag [float] (readonly)
+    #   seconds the replica was behind at the last check,
+    #   None if replication is stopped, the replica is
+    #   unreachable or was not measured yet
+    __lag = None
+    def _get_lag(self):
+        return self.__lag
+    lag = property(_get_lag)
+
+    # property: checked [float] (readonly)
+    #   time of the last lag check
+    __checked = 0.0
+    def _get_checked(self):
+        return self.__checked
+    checked = property(_get_checked)
+
+    # property: measuring [boolean] (readonly)
+    #   indicates if a background lag check is running
+    __measuring = False
+    def _get_measuring(self):
+        return self.__measuring
+    measuring = property(_get_measuring)
+
+    # property: lagprobe [function]
+    #   measures the lag on a connected DbConnection
+    __lagprobe = None
+    def _get_lagprobe(self):
+        return self.__lagprobe
+    def _set_lagprobe(self, value):
+        self.__lagprobe = value
+    lagprobe = property(_get_lagprobe, _set_lagprobe)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: acquire [MySQLdb.Connection]
+    #   checks out a connection, DbConnection uses the replica
+    #   like a pool to count the connections in use
+    def acquire(self):
+        with self.__lock:
+            self.__inuse += 1
+        try:
+            if self.__pool is not None:
+                return self.__pool.acquire()
+            return self.__driver.connect(self.host, self.user, self.password, self.name)
+        except:
+            with self.__lock:
+                self.__inuse -= 1
+            raise
+
+    # method: release [void]
+    #   returns a connection checked out by acquire, rollback
+    #   is passed to the pool
+    def release(self, conn, rollback = True):
+        with self.__lock:
+            self.__inuse -= 1
+        if self.__pool is not None:
+            self.__pool.release(conn, rollback)
+        else:
+            conn.close()
+
+    # method: enablePool [DbConnectionPool]
+    #   pools the connections to the replica
+    def enablePool(self, minsize = 1, maxsize = 10, timeout = 30.0, idletimeout = 300.0, ping = True, fill = True):
+        self.disablePool()
+        self.__pool = DbConnectionPool(self, minsize, maxsize, timeout, idletimeout, ping, self.__driver)
+        if fill:
+            self.__pool.fill()
+        return self.__pool
+
+    # method: disablePool [void]
+    def disablePool(self):
+        if self.__pool is not None:
+            self.__pool.close()
+            self.__pool = None
+
+    # method: createConnection [DbConnection]
+    #   creates a connection to the replica
+    def createConnection(self):
+        conn = DbConnection(self, self, self.__driver)
+        return conn
+
+    # method: measure [float]
+    #   measures the lag if the last check is older than
+    #   interval seconds, concurrent callers get the last lag
+    def measure(self, interval = 0.0):
+        now = time.time()
+        if now - self.__checked < interval:
+            return self.__lag
+        with self.__lock:
+            if now - self.__checked < interval:
+                return self.__lag
+            self.__checked = now
+        conn = self.createConnection()
+        try:
+            conn.connect()
+            try:
+                self.__lag = self.__lagprobe(conn)
+            finally:
+                conn.close()
+        except conn.driver.Error:
+            self.__lag = None
+        return self.__lag
+
+    # method: refresh [float]
+    #   returns the last lag without blocking, it is measured
+    #   on a background thread if the last check is older than
+    #   interval seconds
+    def refresh(self, interval = 0.0):
+        with self.__lock:
+            if self.__measuring or time.time() - self.__checked < interval:
+                return self.__lag
+            self.__measuring = True
+        thread = threading.Thread(target=self._measureBackground, name='DbReplica lag ' + self.host, daemon=True)
+        thread.start()
+        return self.__lag
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    # method: _measureBackground [void]
+    #   measures the lag on the thread started by refresh
+    def _measureBackground(self):
+        try:
+            self.measure()
+        finally:
+            self.__measuring = False
+
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 # class DbFactory
 #
@@ -525,11 +2242,32 @@ class DbTableAdapter(object):
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 class DbFactory(object):
 
-    def __init__(self, config):
+    # constructor 
+    #   parameters:
+    #       config          object holding host, name, user
+    #                       and password of the primary
+    #       driver          driver name or instance, by
+    #                       default the one of config
+    #       replicas        configs of read replicas, or
+    #                       (config, weight) tuples
+    def __init__(self, config, driver = None, replicas = None):
         self.host = config.host
         self.database = config.name
         self.user = config.user
         self.password = config.password
+        if driver is None:
+            driver = getattr(config, 'driver', None)
+        self.__driver = getDriver(driver)
+        self.__replicas = []
+        self.__scopes = contextvars.ContextVar('pydblayer_scope', default=None)
+        self.__sequence = itertools.count()
+        self.__weights = dict()
+        self.__lock = threading.Lock()
+        for replica in replicas or ():
+            if isinstance(replica, tuple):
+                self.addReplica(*replica)
+            else:
+                self.addReplica(replica)
     
     # ------------------------------------------------------
     #   public properties 
@@ -562,20 +2300,188 @@ class DbFactory(object):
         self.__password = value
     password = property(_get_password, _set_password)
 
+    # property: driver [DbDriver] (readonly)
+    #   driver of all created connections
+    __driver = None
+    def _get_driver(self):
+        return self.__driver
+    driver = property(_get_driver)
+
+    # property: pool [DbConnectionPool] (readonly)
+    #   pool shared by all created connections,
+    #   None if pooling is disabled
+    __pool = None
+    def _get_pool(self):
+        return self.__pool
+    pool = property(_get_pool)
+
+    # settings of the pool, applied to added replicas
+    __poolsettings = None
+
+    # property: prepared [integer] (readonly)
+    #   count of statements kept prepared per connection,
+    #   0 if prepared statements are disabled
+    __prepared = 0
+    def _get_prepared(self):
+        return self.__prepared
+    prepared = property(_get_prepared)
+
+    # property: replicas [list] (readonly)
+    #   DbReplica objects serving the select commands
+    __replicas = None
+    def _get_replicas(self):
+        return self.__replicas
+    replicas = property(_get_replicas)
+
+    # property: routing [EN_ROUTING]
+    #   strategy choosing the replica of a select command
+    __routing = EN_ROUTING.LeastConnections
+    def _get_routing(self):
+        return self.__routing
+    def _set_routing(self, value):
+        self.__routing = value
+    routing = property(_get_routing, _set_routing)
+
+    # property: maxlag [float]
+    #   seconds a replica may be behind, replicas lagging
+    #   more or not measured yet are skipped. None disables
+    #   the lag checks
+    __maxlag = None
+    def _get_maxlag(self):
+        return self.__maxlag
+    def _set_maxlag(self, value):
+        self.__maxlag = value
+    maxlag = property(_get_maxlag, _set_maxlag)
+
+    # property: lagcheck [float]
+    #   seconds a measured lag is reused
+    __lagcheck = 5.0
+    def _get_lagcheck(self):
+        return self.__lagcheck
+    def _set_lagcheck(self, value):
+        self.__lagcheck = value
+    lagcheck = property(_get_lagcheck, _set_lagcheck)
+
+    # property: pinafterwrite [boolean]
+    #   routes the reads of a scope to the primary after
+    #   a write inside the scope
+    __pinafterwrite = True
+    def _get_pinafterwrite(self):
+        return self.__pinafterwrite
+    def _set_pinafterwrite(self, value):
+        self.__pinafterwrite = value
+    pinafterwrite = property(_get_pinafterwrite, _set_pinafterwrite)
+
+    # property: resultcache [DbResultCache] (readonly)
+    #   result cache shared by all created connections,
+    #   None if results are not cached
+    __resultcache = None
+    def _get_resultcache(self):
+        return self.__resultcache
+    resultcache = property(_get_resultcache)
+
     # ------------------------------------------------------
     #   public methods 
     # ------------------------------------------------------
+
+    # method: enablePool [DbConnectionPool]
+    #   switches to pooled mode, created commands check out
+    #   their connection from the pool and return it after
+    #   execution instead of connecting on every call. the
+    #   pool opens minsize connections at once if fill is set,
+    #   on the first acquires otherwise
+    def enablePool(self, minsize = 1, maxsize = 10, timeout = 30.0, idletimeout = 300.0, ping = True, fill = True):
+        self.disablePool()
+        self.__pool = DbConnectionPool(self.createConnection(), minsize, maxsize, timeout, idletimeout, ping)
+        if fill:
+            self.__pool.fill()
+        self.__poolsettings = (minsize, maxsize, timeout, idletimeout, ping, fill)
+        for replica in self.__replicas:
+            replica.enablePool(*self.__poolsettings)
+        return self.__pool
+
+    # method: enableResultCache [DbResultCache]
+    #   caches the rows of select commands on created
+    #   connections, writes through these commands invalidate
+    #   the tables they touch. reads routed to a replica are
+    #   not cached, their rows may predate an invalidation
+    def enableResultCache(self, ttl = 60.0, maxbytes = 64 * 1024 * 1024):
+        self.__resultcache = DbResultCache(ttl, maxbytes)
+        return self.__resultcache
+
+    # method: disableResultCache [void]
+    def disableResultCache(self):
+        self.__resultcache = None
+
+    # method: enablePrepared [void]
+    #   executes parameterized queries of created connections
+    #   as server-side prepared statements, each connection
+    #   keeps up to maxsize statements prepared. the driver
+    #   has to support prepared statements
+    def enablePrepared(self, maxsize = 64):
+        if not self.__driver.supports_prepared:
+            raise ValueError('driver %s does not support prepared statements' % self.__driver.name)
+        self.__prepared = maxsize
+
+    # method: disablePrepared [void]
+    def disablePrepared(self):
+        self.__prepared = 0
+
+    # method: disablePool [void]
+    #   closes the pool and switches back to direct connections
+    def disablePool(self):
+        if self.__pool is not None:
+            self.__pool.close()
+            self.__pool = None
+        self.__poolsettings = None
+        for replica in self.__replicas:
+            replica.disablePool()
+
+    # method: addReplica [DbReplica]
+    #   adds a read replica, pooled like the primary
+    def addReplica(self, config, weight = 1):
+        replica = DbReplica(config, weight, self.__driver)
+        if self.__poolsettings is not None:
+            replica.enablePool(*self.__poolsettings)
+        self.__replicas.append(replica)
+        return replica
+
+    # method: scope [DbScope]
+    #   returns the routing scope of the current thread or
+    #   task, a new one if none is entered. reads inside a
+    #   scope go to the primary once it was written
+    def scope(self):
+        scope = self.__scopes.get()
+        if scope is None:
+            scope = DbScope(self.__scopes)
+        return scope
     
     # method: createConnection [DbConnection]
-    #   creates a connection
+    #   creates a connection to the primary
     def createConnection(self):
-        conn = DbConnection()
+        conn = DbConnection(None, self.__pool, self.__driver)
+        conn.resultcache = self.__resultcache
+        conn.prepared = self.__prepared
+        conn.scope = self.__scopes.get()
         conn.host = self.host
         conn.name = self.database
         conn.user = self.user        
         conn.password = self.password
         return conn
 
+    # method: createReadConnection [DbConnection]
+    #   creates a connection to a replica chosen by routing,
+    #   to the primary if no replica is available. replica
+    #   connections don't use the resultcache
+    def createReadConnection(self):
+        replica = self._route()
+        if replica is None:
+            return self.createConnection()
+        conn = replica.createConnection()
+        conn.prepared = self.__prepared
+        conn.scope = self.__scopes.get()
+        return conn
+
     # method: createCommand [DbCommand]
     #   creates a command
     def createCommand(self, sql):
@@ -583,9 +2489,10 @@ class DbFactory(object):
         return conn.createCommand(sql)
 
     # method: createSelectCommand [DbSelectCommand]
-    #   creates a select command
+    #   creates a select command, executed on a replica if
+    #   replicas are added
     def createSelectCommand(self, tablename):
-        conn = self.createConnection()
+        conn = self.createReadConnection()
         return conn.createSelectCommand(tablename)
 
     # method: createDbInsertCommand [DbInsertCommand]
@@ -594,6 +2501,12 @@ class DbFactory(object):
         conn = self.createConnection()
         return conn.createInsertCommand(tablename)
 
+    # method: createDbUpsertCommand [DbUpsertCommand]
+    #   creates a upsert command
+    def createUpsertCommand(self, tablename):
+        conn = self.createConnection()
+        return conn.createUpsertCommand(tablename)
+
     # method: createDbUpdateCommand [DbUpdateCommand]
     #   creates a update command
     def createUpdateCommand(self, tablename):
@@ -605,3 +2518,50 @@ class DbFactory(object):
     def createDeleteCommand(self, tablename):
         conn = self.createConnection()
         return conn.createDeleteCommand(tablename)
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    # method: _route [DbReplica]
+    #   chooses the replica of a read, None routes it to
+    #   the primary
+    def _route(self):
+        if len(self.__replicas) == 0:
+            return None
+        scope = self.__scopes.get()
+        if self.__pinafterwrite and scope is not None and scope.written:
+            return None
+        candidates = [replica for replica in self.__replicas if self._available(replica)]
+        if len(candidates) == 0:
+            return None
+        if self.__routing == EN_ROUTING.WeightedRoundRobin:
+            return self._roundRobin(candidates)
+        start = next(self.__sequence) % len(candidates)
+        candidates = candidates[start:] + candidates[:start]
+        return min(candidates, key=lambda replica: replica.inuse / float(replica.weight))
+
+    # method: _available [boolean]
+    #   indicates if a replica was within maxlag at its last
+    #   check, the lag is refreshed in the background so the
+    #   read does not wait for it
+    def _available(self, replica):
+        if self.__maxlag is None:
+            return True
+        lag = replica.refresh(self.__lagcheck)
+        return lag is not None and lag <= self.__maxlag
+
+    # method: _roundRobin [DbReplica]
+    #   smooth weighted round robin, every replica is chosen
+    #   by its weight and picks are spread evenly
+    def _roundRobin(self, candidates):
+        with self.__lock:
+            total = 0
+            best = None
+            for replica in candidates:
+                self.__weights[replica] = self.__weights.get(replica, 0) + replica.weight
+                total += replica.weight
+                if best is None or self.__weights[replica] > self.__weights[best]:
+                    best = replica
+            self.__weights[best] -= total
+            return best
@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import functools
+import concurrent.futures
+from RIP_DbAccess import *
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class AsyncDbConnection
+#
+#   runs the blocking commands on a thread pool executor,
+#   the drivers have no asynchronous protocol. a query in
+#   flight holds a worker thread and a pooled connection
+#   until it returns, so the queries running at once are
+#   bounded by threads and maxsize. hundreds of concurrent
+#   queries need as many threads and server connections,
+#   queries above the bound wait for a thread or connection
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class AsyncDbConnection(object):
+
+    # constructor 
+    #   parameters:
+    #       config          object holding host, name, user
+    #                       and password of the database
+    #       minsize         connections kept open while idle
+    #       maxsize         upper bound of open connections
+    #       timeout         seconds a query waits for a free
+    #                       connection before it fails
+    #       driver          driver name or instance, by
+    #                       default the one of config
+    #       threads         worker threads of the executor, by
+    #                       default maxsize. more threads than
+    #                       connections wait in the pool and
+    #                       leave threads to calls of run
+    #
+    #   the pool is created empty, connections are opened on
+    #   the executor by open or by the first queries
+    def __init__(self, config, minsize = 1, maxsize = 10, timeout = 30.0, idletimeout = 300.0, driver = None, threads = None):
+        if threads is None:
+            threads = maxsize
+        self.__factory = DbFactory(config, driver)
+        self.__factory.enablePool(minsize, maxsize, timeout, idletimeout, fill=False)
+        self.__executor = concurrent.futures.ThreadPoolExecutor(threads)
+    
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    # property: factory [DbFactory] (readonly)
+    #   factory creating the pooled blocking commands
+    __factory = None
+    def _get_factory(self):
+        return self.__factory
+    factory = property(_get_factory)
+
+    # property: pool [DbConnectionPool] (readonly)
+    #   pool shared by all commands of the connection
+    def _get_pool(self):
+        return self.__factory.pool
+    pool = property(_get_pool)
+
+    # property: executor [concurrent.futures.Executor] (readonly)
+    #   executor running the blocking driver calls
+    __executor = None
+    def _get_executor(self):
+        return self.__executor
+    executor = property(_get_executor)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: run [coroutine]
+    #   runs a blocking function on the executor
+    def run(self, function, *args):
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self.__executor, functools.partial(function, *args))
+
+    # method: open [coroutine]
+    #   opens the minsize connections of the pool on the
+    #   executor
+    async def open(self):
+        await self.run(self.__factory.pool.fill)
+        return self
+
+    # method: close [coroutine]
+    #   waits for running queries and closes the pool
+    async def close(self):
+        await asyncio.get_running_loop().run_in_executor(None, self.__executor.shutdown, True)
+        self.__factory.disablePool()
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, type, value, traceback):
+        await self.close()
+        return False
+
+    # method: transaction [AsyncDbTransaction]
+    #   creates a transaction scope on one pooled connection,
+    #   commands created by the scope are committed once when
+    #   it is left and rolled back if it is left by an exception
+    def transaction(self):
+        return AsyncDbTransaction(self)
+
+    # method: createCommand [AsyncDbCommand]
+    #   creates a AsyncDbCommand
+    def createCommand(self, sql):
+        return AsyncDbCommand(self, self.__factory.createCommand(sql))
+
+    # method: createSelectCommand [AsyncDbCommand]
+    #   creates a AsyncDbCommand wrapping a DbSelectCommand
+    def createSelectCommand(self, tablename):
+        return AsyncDbCommand(self, self.__factory.createSelectCommand(tablename))
+
+    # method: createInsertCommand [AsyncDbCommand]
+    #   creates a AsyncDbCommand wrapping a DbInsertCommand
+    def createInsertCommand(self, tablename):
+        return AsyncDbCommand(self, self.__factory.createInsertCommand(tablename))
+
+    # method: createUpsertCommand [AsyncDbCommand]
+    #   creates a AsyncDbCommand wrapping a DbUpsertCommand
+    def createUpsertCommand(self, tablename):
+        return AsyncDbCommand(self, self.__factory.createUpsertCommand(tablename))
+
+    # method: createUpdateCommand [AsyncDbCommand]
+    #   creates a AsyncDbCommand wrapping a DbUpdateCommand
+    def createUpdateCommand(self, tablename):
+        return AsyncDbCommand(self, self.__factory.createUpdateCommand(tablename))
+
+    # method: createDeleteCommand [AsyncDbCommand]
+    #   creates a AsyncDbCommand wrapping a DbDeleteCommand
+    def createDeleteCommand(self, tablename):
+        return AsyncDbCommand(self, self.__factory.createDeleteCommand(tablename))
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class AsyncDbTransaction
+#
+#   async counterpart of DbTransaction. the scope checks
+#   out one connection when it is entered, its commands run
+#   one after another on that connection
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class AsyncDbTransaction(object):
+
+    # constructor 
+    #   parameters:
+    #       asyncconnection the AsyncDbConnection running
+    #                       the scope
+    def __init__(self, asyncconnection):
+        self.__asyncconnection = asyncconnection
+        self.__connection = asyncconnection.factory.createConnection()
+        self.__lock = asyncio.Lock()
+    
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    # property: asyncconnection [AsyncDbConnection] (readonly)
+    __asyncconnection = None
+    def _get_asyncconnection(self):
+        return self.__asyncconnection
+    asyncconnection = property(_get_asyncconnection)
+
+    # property: connection [DbConnection] (readonly)
+    #   connection the transaction is running on
+    __connection = None
+    def _get_connection(self):
+        return self.__connection
+    connection = property(_get_connection)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: run [coroutine]
+    #   runs a blocking function on the executor, calls of
+    #   the scope are serialized as they share the connection
+    async def run(self, function, *args):
+        async with self.__lock:
+            return await self.__asyncconnection.run(function, *args)
+
+    async def __aenter__(self):
+        await self.run(self.__connection.begin)
+        return self
+
+    async def __aexit__(self, type, value, traceback):
+        await self.run(self.__connection.end, type is None)
+        return False
+
+    # method: createCommand [AsyncDbCommand]
+    #   creates a AsyncDbCommand running in the scope
+    def createCommand(self, sql):
+        return AsyncDbCommand(self, self.__connection.createCommand(sql))
+
+    # method: createSelectCommand [AsyncDbCommand]
+    #   creates a AsyncDbCommand wrapping a DbSelectCommand
+    def createSelectCommand(self, tablename):
+        return AsyncDbCommand(self, self.__connection.createSelectCommand(tablename))
+
+    # method: createInsertCommand [AsyncDbCommand]
+    #   creates a AsyncDbCommand wrapping a DbInsertCommand
+    def createInsertCommand(self, tablename):
+        return AsyncDbCommand(self, self.__connection.createInsertCommand(tablename))
+
+    # method: createUpsertCommand [AsyncDbCommand]
+    #   creates a AsyncDbCommand wrapping a DbUpsertCommand
+    def createUpsertCommand(self, tablename):
+        return AsyncDbCommand(self, self.__connection.createUpsertCommand(tablename))
+
+    # method: createUpdateCommand [AsyncDbCommand]
+    #   creates a AsyncDbCommand wrapping a DbUpdateCommand
+    def createUpdateCommand(self, tablename):
+        return AsyncDbCommand(self, self.__connection.createUpdateCommand(tablename))
+
+    # method: createDeleteCommand [AsyncDbCommand]
+    #   creates a AsyncDbCommand wrapping a DbDeleteCommand
+    def createDeleteCommand(self, tablename):
+        return AsyncDbCommand(self, self.__connection.createDeleteCommand(tablename))
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class AsyncDbCommand
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class AsyncDbCommand(object):
+
+    # constructor 
+    #   parameters:
+    #       asyncconnection the AsyncDbConnection or the
+    #                       AsyncDbTransaction running the
+    #                       command
+    #       command         the wrapped DbCommand, its
+    #                       register methods and properties
+    #                       are available on the wrapper
+    def __init__(self, asyncconnection, command):
+        self.__asyncconnection = asyncconnection
+        self.__command = command
+
+    def __getattr__(self, name):
+        return getattr(self.__command, name)
+    
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    # property: asyncconnection [AsyncDbConnection] (readonly)
+    __asyncconnection = None
+    def _get_asyncconnection(self):
+        return self.__asyncconnection
+    asyncconnection = property(_get_asyncconnection)
+
+    # property: command [DbCommand] (readonly)
+    #   the wrapped blocking command
+    __command = None
+    def _get_command(self):
+        return self.__command
+    command = property(_get_command)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: fetchone [coroutine]
+    #   executes command and returns one row
+    async def fetchone(self):
+        return await self.__asyncconnection.run(self.__command.fetchone)
+
+    # method: fetchall [coroutine]
+    #   executes command and returns rows
+    async def fetchall(self):
+        return await self.__asyncconnection.run(self.__command.fetchall)
+
+    # method: commit [coroutine]
+    #   commits the command
+    async def commit(self):
+        return await self.__asyncconnection.run(self.__command.commit)
+
+    # method: execute [coroutine]
+    #   runs execute of the wrapped command, the result
+    #   depends on the command type
+    async def execute(self):
+        return await self.__asyncconnection.run(self.__command.execute)
+
+    # method: executeBulk [coroutine]
+    #   runs executeBulk of a wrapped insert command
+    async def executeBulk(self, rows, batchsize=1000, maxpacket=None, commitbatches=True):
+        return await self.__asyncconnection.run(self.__command.executeBulk, rows, batchsize, maxpacket, commitbatches)
+
+    # method: iterate [async generator]
+    #   streams the rows of a wrapped select command, each
+    #   batch is fetched on the executor
+    async def iterate(self, batch_size=1000):
+        rows = self.__command.iterate(batch_size)
+        try:
+            while True:
+                batch = await self.__asyncconnection.run(self._fetchBatch, rows, batch_size)
+                if len(batch) == 0:
+                    break
+                for row in batch:
+                    yield row
+        finally:
+            await self.__asyncconnection.run(rows.close)
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    def _fetchBatch(self, rows, batch_size):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                break
+        return batch
@@ -0,0 +1,561 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import re
+import abc
+import weakref
+import importlib
+import importlib.util
+import threading
+import collections
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbCursorKinds
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbCursorKinds(object):
+
+    # cursor kinds passed to DbConnection.cursor, drivers
+    # map them by class name to their own cursors
+    class Cursor(object):
+        pass
+
+    class DictCursor(Cursor):
+        pass
+
+    class SSCursor(Cursor):
+        pass
+
+    class SSDictCursor(Cursor):
+        pass
+
+cursors = DbCursorKinds
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbModuleException
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbModuleException(object):
+
+    # descriptor of a PEP 249 exception of a driver, taken
+    # from the driver module which is imported on the first
+    # access. drivers without module get default
+    def __init__(self, name, default):
+        self.__name = name
+        self.__default = default
+
+    def __get__(self, driver, owner):
+        if driver is None or driver.modulename is None:
+            return self.__default
+        return getattr(driver.module, self.__name)
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbDriver
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbDriver(abc.ABC):
+
+    # name the driver is registered with
+    name = ''
+
+    # module imported on first connect, None if the driver
+    # does not wrap a module
+    modulename = None
+
+    # exceptions raised by the connections of the driver,
+    # named after PEP 249 and mapped from the driver module
+    Error = DbModuleException('Error', Exception)
+    Warning = DbModuleException('Warning', Warning)
+    InterfaceError = DbModuleException('InterfaceError', Exception)
+    DatabaseError = DbModuleException('DatabaseError', Exception)
+    DataError = DbModuleException('DataError', Exception)
+    OperationalError = DbModuleException('OperationalError', Exception)
+    IntegrityError = DbModuleException('IntegrityError', Exception)
+    InternalError = DbModuleException('InternalError', Exception)
+    ProgrammingError = DbModuleException('ProgrammingError', Exception)
+    NotSupportedError = DbModuleException('NotSupportedError', Exception)
+
+    EXCEPTIONS = ('Error', 'Warning', 'InterfaceError', 'DatabaseError', 'DataError', 'OperationalError',
+                  'IntegrityError', 'InternalError', 'ProgrammingError', 'NotSupportedError')
+
+    # indicates if the driver overrides _prepare
+    supports_prepared = False
+
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    # property: module [module] (readonly)
+    #   driver module, imported on first use so importing
+    #   the layer does not load the driver
+    __module = None
+    def _get_module(self):
+        if self.__module is None and self.modulename is not None:
+            module = importlib.import_module(self.modulename)
+            self._load(module)
+            self.__module = module
+        return self.__module
+    module = property(_get_module)
+
+    # property: is_installed [boolean] (readonly)
+    #   indicates if the driver module is installed, checked
+    #   without importing it
+    def _get_is_installed(self):
+        if self.modulename is None or self.__module is not None:
+            return True
+        try:
+            return importlib.util.find_spec(self.modulename) is not None
+        except ImportError:
+            return False
+    is_installed = property(_get_is_installed)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: connect [object] (abstract)
+    #   opens a connection providing commit, rollback,
+    #   close and ping
+    @abc.abstractmethod
+    def connect(self, host, user, password, database):
+        pass
+
+    # method: cursor [object] (abstract)
+    #   creates a cursor of the kind named like cursortype,
+    #   one of Cursor, DictCursor, SSCursor and SSDictCursor
+    @abc.abstractmethod
+    def cursor(self, connection, cursortype):
+        pass
+
+    # method: ping [void]
+    #   raises Error if connection is broken
+    def ping(self, connection):
+        connection.ping()
+
+    # method: preparedCursor [DbPreparedCursor]
+    #   creates a cursor executing parameterized queries as
+    #   server-side prepared statements, the statements are
+    #   kept per connection in a lru cache of maxsize entries
+    def preparedCursor(self, connection, cursortype, maxsize):
+        if not self.supports_prepared or type(self)._prepare is DbDriver._prepare:
+            raise self.NotSupportedError('driver %s does not support prepared statements' % self.name)
+        return DbPreparedCursor(self, connection, self.preparedCache(connection, maxsize), cursortype)
+
+    # method: preparedCache [DbPreparedCache]
+    #   returns the prepared statements of connection
+    def preparedCache(self, connection, maxsize):
+        with _preparedlock:
+            cache = _preparedcaches.get(connection)
+            if cache is None:
+                cache = DbPreparedCache(maxsize)
+                _preparedcaches[connection] = cache
+        return cache
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    # method: _prepare [object] (abstract)
+    #   creates a cursor preparing the query on its first
+    #   execution and reusing the statement for the same query,
+    #   placeholders are positional. drivers setting
+    #   supports_prepared override it
+    def _prepare(self, connection):
+        raise self.NotSupportedError('driver %s does not support prepared statements' % self.name)
+
+    # method: _load [void]
+    #   prepares the driver after its module was imported
+    def _load(self, module):
+        self._mapExceptions(module)
+
+    # method: _mapExceptions [void]
+    #   takes over the PEP 249 exceptions of a driver module
+    def _mapExceptions(self, module):
+        for name in self.EXCEPTIONS:
+            setattr(self, name, getattr(module, name))
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbMySQLdbDriver
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbMySQLdbDriver(DbDriver):
+
+    name = 'mysqldb'
+
+    modulename = 'MySQLdb'
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    def connect(self, host, user, password, database):
+        return self.module.connect(host, user, password, database, charset='utf8')
+
+    def cursor(self, connection, cursortype):
+        if issubclass(cursortype, DbCursorKinds.Cursor):
+            cursortype = getattr(self.__cursors, cursortype.__name__)
+        return connection.cursor(cursortype)
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    def _load(self, module):
+        super(DbMySQLdbDriver, self)._load(module)
+        self.__cursors = importlib.import_module('MySQLdb.cursors')
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbPyMySQLDriver
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbPyMySQLDriver(DbDriver):
+
+    name = 'pymysql'
+
+    modulename = 'pymysql'
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    def connect(self, host, user, password, database):
+        return self.module.connect(host=host, user=user, password=password, database=database, charset='utf8')
+
+    def cursor(self, connection, cursortype):
+        return connection.cursor(getattr(self.__cursors, cursortype.__name__))
+
+    def ping(self, connection):
+        connection.ping(reconnect=False)
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    def _load(self, module):
+        super(DbPyMySQLDriver, self)._load(module)
+        self.__cursors = importlib.import_module('pymysql.cursors')
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbMySQLConnectorDriver
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbMySQLConnectorDriver(DbDriver):
+
+    name = 'mysqlconnector'
+
+    modulename = 'mysql.connector'
+
+    supports_prepared = True
+
+    # cursor kind name: (buffered, dictionary)
+    KINDS = {
+        'Cursor': (True, False),
+        'DictCursor': (True, True),
+        'SSCursor': (False, False),
+        'SSDictCursor': (False, True),
+    }
+
+    # constructor
+    #   parameters:
+    #       pure            True uses the pure python protocol,
+    #                       False the C extension and None the
+    #                       C extension if it is installed
+    def __init__(self, pure = None):
+        self.__pure = pure
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    def connect(self, host, user, password, database):
+        options = dict()
+        if self.__pure is not None:
+            options['use_pure'] = self.__pure
+        return self.module.connect(host=host, user=user, password=password, database=database, charset='utf8',
+                                     autocommit=False, **options)
+
+    def cursor(self, connection, cursortype):
+        buffered, dictionary = self.KINDS[cursortype.__name__]
+        return connection.cursor(buffered=buffered, dictionary=dictionary)
+
+    def ping(self, connection):
+        connection.ping(reconnect=False)
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    def _prepare(self, connection):
+        return connection.cursor(prepared=True)
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbPreparedCache
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbPreparedCache(object):
+
+    # constructor
+    #   parameters:
+    #       maxsize         count of statements kept prepared,
+    #                       the least recently used is closed
+    def __init__(self, maxsize = 64):
+        self.__entries = collections.OrderedDict()
+        self.__maxsize = maxsize
+        self.__hits = 0
+        self.__misses = 0
+
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    __maxsize = 0
+    def _get_maxsize(self):
+        return self.__maxsize
+    maxsize = property(_get_maxsize)
+
+    def _get_count(self):
+        return len(self.__entries)
+    count = property(_get_count)
+
+    __hits = 0
+    def _get_hits(self):
+        return self.__hits
+    hits = property(_get_hits)
+
+    __misses = 0
+    def _get_misses(self):
+        return self.__misses
+    misses = property(_get_misses)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: get [tuple]
+    #   returns (cursor, query, names) prepared for query
+    def get(self, query):
+        entry = self.__entries.get(query)
+        if entry is None:
+            self.__misses += 1
+            return None
+        self.__hits += 1
+        self.__entries.move_to_end(query)
+        return entry
+
+    # method: put [void]
+    #   adds a prepared statement, closes the least recently
+    #   used one if maxsize is exceeded
+    def put(self, query, entry):
+        self.__entries[query] = entry
+        while len(self.__entries) > self.__maxsize:
+            self._close(self.__entries.popitem(last=False)[1])
+
+    # method: clear [void]
+    #   closes all statements
+    def clear(self):
+        while len(self.__entries) > 0:
+            self._close(self.__entries.popitem()[1])
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    def _close(self, entry):
+        try:
+            entry[0].close()
+        except Exception:
+            pass
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbPreparedCursor
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbPreparedCursor(object):
+
+    # constructor
+    #   parameters:
+    #       driver          driver of the connection
+    #       connection      connection of the driver
+    #       cache           prepared statements of connection
+    #       cursortype      Cursor or DictCursor, queries
+    #                       without parameters are executed
+    #                       on a cursor of this kind
+    def __init__(self, driver, connection, cache, cursortype):
+        self.__driver = driver
+        self.__connection = connection
+        self.__cache = cache
+        self.__cursortype = cursortype
+        self.__dictrows = cursortype.__name__ == 'DictCursor'
+        self.__cursor = None
+        self.__rows = ()
+        self.__index = 0
+
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    __description = None
+    def _get_description(self):
+        return self.__description
+    description = property(_get_description)
+
+    __rowcount = -1
+    def _get_rowcount(self):
+        return self.__rowcount
+    rowcount = property(_get_rowcount)
+
+    __lastrowid = None
+    def _get_lastrowid(self):
+        return self.__lastrowid
+    lastrowid = property(_get_lastrowid)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: execute [integer]
+    #   executes query as prepared statement, queries without
+    #   parameters are sent as text
+    def execute(self, query, parameters = None):
+        if parameters is None or len(parameters) == 0:
+            cursor = self._text()
+            cursor.execute(query)
+            self._fetched(cursor, False)
+            return self.__rowcount
+        entry = self.__cache.get(query)
+        if entry is None:
+            positional, names = _positional(query)
+            entry = (self.__driver._prepare(self.__connection), positional, names)
+            self.__cache.put(query, entry)
+        cursor, positional, names = entry
+        if names is not None and isinstance(parameters, dict):
+            parameters = tuple([parameters[name] for name in names])
+        cursor.execute(positional, parameters)
+        self._fetched(cursor, self.__dictrows)
+        return self.__rowcount
+
+    def fetchone(self):
+        if self.__index >= len(self.__rows):
+            return None
+        self.__index += 1
+        return self.__rows[self.__index - 1]
+
+    def fetchmany(self, size = 1):
+        rows = self.__rows[self.__index:self.__index + size]
+        self.__index += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self.__rows[self.__index:]
+        self.__index = len(self.__rows)
+        return rows
+
+    # method: close [void]
+    #   closes the text cursor, the prepared statements stay
+    #   open in the cache of the connection
+    def close(self):
+        if self.__cursor is not None:
+            self.__cursor.close()
+            self.__cursor = None
+        self.__rows = ()
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    def _text(self):
+        if self.__cursor is None:
+            self.__cursor = self.__driver.cursor(self.__connection, self.__cursortype)
+        return self.__cursor
+
+    # method: _fetched [void]
+    #   buffers the result of cursor, rows of a prepared
+    #   statement are converted to dictionaries if requested
+    def _fetched(self, cursor, dictrows):
+        self.__description = cursor.description
+        self.__lastrowid = cursor.lastrowid
+        self.__index = 0
+        if self.__description is None:
+            self.__rows = ()
+            self.__rowcount = cursor.rowcount
+            return
+        rows = cursor.fetchall()
+        if dictrows:
+            names = [column[0] for column in self.__description]
+            rows = [dict(zip(names, row)) for row in rows]
+        self.__rows = tuple(rows)
+        self.__rowcount = len(self.__rows)
+
+_RE_NAMED = re.compile(r'%\(([^)]*)\)s')
+_positionals = dict()
+
+# method: _positional [tuple]
+#   converts named placeholders to positional ones, returns
+#   the query and the parameter names in order or None if
+#   the query has no named placeholders
+def _positional(query):
+    result = _positionals.get(query)
+    if result is None:
+        names = _RE_NAMED.findall(query)
+        if len(names) == 0:
+            result = (query, None)
+        else:
+            result = (_RE_NAMED.sub('%s', query), names)
+        if len(_positionals) >= 4096:
+            _positionals.clear()
+        _positionals[query] = result
+    return result
+
+# prepared statements per connection of all drivers
+_preparedcaches = weakref.WeakKeyDictionary()
+_preparedlock = threading.Lock()
+
+_drivers = dict()
+_factories = {
+    'mysqldb': DbMySQLdbDriver,
+    'mysqlclient': DbMySQLdbDriver,
+    'pymysql': DbPyMySQLDriver,
+    'mysqlconnector': DbMySQLConnectorDriver,
+}
+
+# default driver name used if none is configured
+defaultdriver = 'mysqldb'
+
+# method: registerDriver [void]
+#   registers a driver instance under its name
+def registerDriver(driver):
+    _drivers[driver.name] = driver
+
+# method: availableDrivers [list]
+#   names of the registered drivers whose module is installed
+def availableDrivers():
+    names = []
+    for name in sorted(set(_factories) | set(_drivers)):
+        if getDriver(name).is_installed:
+            names.append(name)
+    return names
+
+# method: getDriver [DbDriver]
+#   resolves a driver instance, a driver name or None for
+#   the default driver
+def getDriver(driver = None):
+    if driver is None:
+        driver = defaultdriver
+    if not isinstance(driver, str):
+        return driver
+    instance = _drivers.get(driver)
+    if instance is None:
+        factory = _factories.get(driver)
+        if factory is None:
+            raise ValueError('unknown driver: ' + driver)
+        instance = factory()
+        _drivers[driver] = instance
+    return instance
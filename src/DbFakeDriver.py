@@ -0,0 +1,348 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import time
+import sqlite3
+import decimal
+import datetime
+import tempfile
+import threading
+from RIP_DbDrivers import *
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbFakeDriver
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbFakeDriver(DbDriver):
+
+    name = 'fake'
+
+    Error = sqlite3.Error
+    Warning = sqlite3.Warning
+    InterfaceError = sqlite3.InterfaceError
+    DatabaseError = sqlite3.DatabaseError
+    DataError = sqlite3.DataError
+    OperationalError = sqlite3.OperationalError
+    IntegrityError = sqlite3.IntegrityError
+    InternalError = sqlite3.InternalError
+    ProgrammingError = sqlite3.ProgrammingError
+    NotSupportedError = sqlite3.NotSupportedError
+
+    # sqlite keeps the compiled statement of a cursor, which
+    # stands in for the server-side prepared statement
+    supports_prepared = True
+
+    # constructor
+    #   parameters:
+    #       path                directory of the sqlite files,
+    #                           one per database name, a new
+    #                           temporary directory by default
+    #       connectlatency      seconds to open a connection
+    #       roundtriplatency    seconds per statement, commit,
+    #                           rollback and ping
+    #       rowlatency          seconds per transferred row
+    #       maxpacket           value of @@max_allowed_packet
+    def __init__(self, path = None, connectlatency = 0.0, roundtriplatency = 0.0, rowlatency = 0.0, maxpacket = 4 * 1024 * 1024):
+        if path is None:
+            path = tempfile.mkdtemp(prefix='pydblayer-')
+        self.__path = path
+        self.connectlatency = connectlatency
+        self.roundtriplatency = roundtriplatency
+        self.rowlatency = rowlatency
+        self.maxpacket = maxpacket
+        self.__queries = dict()
+        self.__lock = threading.Lock()
+        self.__connects = 0
+        self.__roundtrips = 0
+
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    # property: path [string] (readonly)
+    #   directory of the sqlite files
+    __path = None
+    def _get_path(self):
+        return self.__path
+    path = property(_get_path)
+
+    # property: connects [integer] (readonly)
+    #   count of opened connections
+    __connects = 0
+    def _get_connects(self):
+        return self.__connects
+    connects = property(_get_connects)
+
+    # property: roundtrips [integer] (readonly)
+    #   count of statements, commits, rollbacks and pings
+    __roundtrips = 0
+    def _get_roundtrips(self):
+        return self.__roundtrips
+    roundtrips = property(_get_roundtrips)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    def connect(self, host, user, password, database):
+        with self.__lock:
+            self.__connects += 1
+        self.wait(self.connectlatency)
+        connection = sqlite3.connect(os.path.join(self.__path, database + '.sqlite'), timeout=30.0, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=OFF')
+        return DbFakeConnection(self, connection)
+
+    def cursor(self, connection, cursortype):
+        return connection.cursor(cursortype)
+
+    # method: roundtrip [void]
+    #   waits for a roundtrip to the server
+    def roundtrip(self):
+        with self.__lock:
+            self.__roundtrips += 1
+        self.wait(self.roundtriplatency)
+
+    # method: transfer [void]
+    #   waits for rows sent by the server
+    def transfer(self, rows):
+        self.wait(self.rowlatency * rows)
+
+    def wait(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    # method: translate [string]
+    #   rewrites a MySQL query for sqlite, translations are
+    #   cached per query
+    def translate(self, query):
+        translated = self.__queries.get(query)
+        if translated is None:
+            translated = _RE_PLACEHOLDER.sub(_placeholder, query)
+            translated = _RE_AUTOINCREMENT.sub('INTEGER PRIMARY KEY AUTOINCREMENT', translated)
+            translated = _RE_ENGINE.sub('', translated)
+            translated = _RE_DUPLICATE.sub('ON CONFLICT DO UPDATE SET', translated)
+            translated = _RE_VALUES.sub(r'excluded.\1', translated)
+            translated = _RE_EXPLAIN.sub('EXPLAIN QUERY PLAN ', translated)
+            translated = translated.replace('@@max_allowed_packet', str(self.maxpacket))
+            self.__queries[query] = translated
+        return translated
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    def _prepare(self, connection):
+        return DbFakeCursor(connection, False, True)
+
+_RE_PLACEHOLDER = re.compile(r'%\(([^)]*)\)s|%s|%%')
+_RE_AUTOINCREMENT = re.compile(r'\bINT(?:EGER)?\s+PRIMARY\s+KEY\s+AUTO_INCREMENT\b', re.IGNORECASE)
+_RE_ENGINE = re.compile(r'\s+ENGINE\s*=\s*\w+', re.IGNORECASE)
+_RE_DUPLICATE = re.compile(r'\bON\s+DUPLICATE\s+KEY\s+UPDATE\b', re.IGNORECASE)
+_RE_VALUES = re.compile(r'\bVALUES\((\w+)\)', re.IGNORECASE)
+_RE_EXPLAIN = re.compile(r'^\s*EXPLAIN\s+', re.IGNORECASE)
+
+# types MySQL drivers accept as parameter but sqlite does not
+_ADAPTED = (decimal.Decimal, datetime.date, datetime.time, datetime.timedelta)
+
+def _adaptValue(value):
+    if isinstance(value, _ADAPTED):
+        return str(value)
+    return value
+
+def _adapt(parameters):
+    if isinstance(parameters, dict):
+        return dict([(key, _adaptValue(value)) for key, value in parameters.items()])
+    return tuple([_adaptValue(value) for value in parameters])
+
+def _placeholder(match):
+    if match.group(1) is not None:
+        return ':' + match.group(1)
+    if match.group(0) == '%s':
+        return '?'
+    return '%'
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbFakeConnection
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbFakeConnection(object):
+
+    # cursor kind name: (rows as dictionaries, buffered)
+    KINDS = {
+        'Cursor': (False, True),
+        'DictCursor': (True, True),
+        'SSCursor': (False, False),
+        'SSDictCursor': (True, False),
+    }
+
+    def __init__(self, driver, connection):
+        self.__driver = driver
+        self.__connection = connection
+
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    __driver = None
+    def _get_driver(self):
+        return self.__driver
+    driver = property(_get_driver)
+
+    # property: connection [sqlite3.Connection] (readonly)
+    #   underlying sqlite connection
+    __connection = None
+    def _get_connection(self):
+        return self.__connection
+    connection = property(_get_connection)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    def cursor(self, cursortype = cursors.Cursor):
+        dictrows, buffered = self.KINDS[cursortype.__name__]
+        return DbFakeCursor(self, dictrows, buffered)
+
+    def commit(self):
+        self.__driver.roundtrip()
+        self.__connection.commit()
+
+    def rollback(self):
+        self.__driver.roundtrip()
+        self.__connection.rollback()
+
+    def ping(self):
+        self.__driver.roundtrip()
+        self.__connection.execute('SELECT 1')
+
+    def close(self):
+        self.__connection.close()
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbFakeCursor
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbFakeCursor(object):
+
+    # constructor
+    #   parameters:
+    #       connection      DbFakeConnection of the cursor
+    #       dictrows        returns rows as dictionaries
+    #       buffered        transfers all rows on execute like
+    #                       the MySQLdb store-result cursors
+    def __init__(self, connection, dictrows, buffered):
+        self.__connection = connection
+        self.__driver = connection.driver
+        self.__cursor = connection.connection.cursor()
+        self.__dictrows = dictrows
+        self.__buffered = buffered
+        self.__rows = None
+        self.__index = 0
+        self.arraysize = 1
+
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    __description = None
+    def _get_description(self):
+        return self.__description
+    description = property(_get_description)
+
+    __rowcount = -1
+    def _get_rowcount(self):
+        return self.__rowcount
+    rowcount = property(_get_rowcount)
+
+    # property: lastrowid [integer] (readonly)
+    #   id of the first inserted row like MySQL reports it
+    __lastrowid = None
+    def _get_lastrowid(self):
+        return self.__lastrowid
+    lastrowid = property(_get_lastrowid)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    def execute(self, query, parameters = None):
+        self.__driver.roundtrip()
+        translated = self.__driver.translate(query)
+        if parameters is None:
+            self.__cursor.execute(translated)
+        else:
+            self.__cursor.execute(translated, _adapt(parameters))
+        self._executed(translated)
+        return self.__rowcount
+
+    def executemany(self, query, parameters):
+        self.__driver.roundtrip()
+        translated = self.__driver.translate(query)
+        self.__cursor.executemany(translated, [_adapt(values) for values in parameters])
+        self._executed(translated)
+        return self.__rowcount
+
+    def fetchone(self):
+        rows = self.fetchmany(1)
+        if len(rows) == 0:
+            return None
+        return rows[0]
+
+    def fetchmany(self, size = None):
+        if size is None:
+            size = self.arraysize
+        if self.__rows is not None:
+            rows = self.__rows[self.__index:self.__index + size]
+            self.__index += len(rows)
+            return rows
+        rows = self._convert(self.__cursor.fetchmany(size))
+        self.__driver.transfer(len(rows))
+        return rows
+
+    def fetchall(self):
+        if self.__rows is not None:
+            rows = self.__rows[self.__index:]
+            self.__index = len(self.__rows)
+            return rows
+        rows = self._convert(self.__cursor.fetchall())
+        self.__driver.transfer(len(rows))
+        return rows
+
+    def close(self):
+        self.__cursor.close()
+        self.__rows = None
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    def _executed(self, query):
+        self.__description = self.__cursor.description
+        self.__rows = None
+        self.__index = 0
+        if self.__description is None:
+            self.__rowcount = self.__cursor.rowcount
+            self.__lastrowid = self.__cursor.lastrowid
+            if self.__rowcount > 1 and query.lstrip()[:6].upper() == 'INSERT':
+                self.__lastrowid -= self.__rowcount - 1
+        elif self.__buffered:
+            self.__rows = self._convert(self.__cursor.fetchall())
+            self.__rowcount = len(self.__rows)
+            self.__driver.transfer(len(self.__rows))
+        else:
+            self.__rowcount = -1
+
+    def _convert(self, rows):
+        if not self.__dictrows:
+            return tuple(rows)
+        names = [column[0] for column in self.__description]
+        return tuple([dict(zip(names, row)) for row in rows])
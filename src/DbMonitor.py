@@ -0,0 +1,954 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import sys
+import json
+import getopt
+import collections
+import time
+import threading
+
+# logging, logging.handlers and http.server are imported
+# by notify, the slow query log and the exporter on first
+# use, they are not needed to import the module
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbCommandEvent
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbCommandEvent(object):
+
+    # constructor 
+    #   parameters:
+    #       command         the executed DbCommand
+    #       timings         seconds spent per phase: compile,
+    #                       connect, execute, fetch and total
+    #       rows            count of returned rows
+    #       error           exception raised by the command
+    def __init__(self, command, timings, rows, error):
+        self.__command = command
+        self.__timings = timings
+        self.__rows = rows
+        self.__error = error
+    
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    # property: command [DbCommand] (readonly)
+    #   the command, its connection is still open while
+    #   the observers are notified
+    __command = None
+    def _get_command(self):
+        return self.__command
+    command = property(_get_command)
+
+    # property: kind [string] (readonly)
+    #   class name of the command
+    def _get_kind(self):
+        return type(self.__command).__name__
+    kind = property(_get_kind)
+
+    # property: table [string] (readonly)
+    #   table of the sqlstatement, empty for sql-strings
+    def _get_table(self):
+        if self.__command.is_sqlstatement:
+            return self.__command.sql.table
+        return ''
+    table = property(_get_table)
+
+    # property: timings [dict] (readonly)
+    #   seconds spent per phase
+    __timings = None
+    def _get_timings(self):
+        return self.__timings
+    timings = property(_get_timings)
+
+    # property: duration [float] (readonly)
+    #   seconds spent in the command
+    def _get_duration(self):
+        return self.__timings.get('total', 0.0)
+    duration = property(_get_duration)
+
+    # property: rows [integer] (readonly)
+    #   count of returned rows
+    __rows = 0
+    def _get_rows(self):
+        return self.__rows
+    rows = property(_get_rows)
+
+    # property: rowsaffected [integer] (readonly)
+    #   rowsaffected of the last execution of the command
+    def _get_rowsaffected(self):
+        return self.__command.rowsaffected
+    rowsaffected = property(_get_rowsaffected)
+
+    # property: error [Exception] (readonly)
+    #   exception raised by the command, None on success
+    __error = None
+    def _get_error(self):
+        return self.__error
+    error = property(_get_error)
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbProbe
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbProbe(object):
+
+    __slots__ = ('__monitor', '__timings', '__started', '__last', '__rows', '__error')
+
+    def __init__(self, monitor):
+        self.__monitor = monitor
+        self.__timings = dict()
+        self.__started = time.time()
+        self.__last = self.__started
+        self.__rows = 0
+        self.__error = None
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: lap [void]
+    #   adds the time since the last lap to phase
+    def lap(self, phase):
+        now = time.time()
+        self.__timings[phase] = self.__timings.get(phase, 0.0) + now - self.__last
+        self.__last = now
+
+    # method: add [void]
+    #   adds seconds measured by the caller to phase, for
+    #   phases interrupted by other work
+    def add(self, phase, seconds):
+        self.__timings[phase] = self.__timings.get(phase, 0.0) + seconds
+
+    # method: count [void]
+    #   adds returned rows
+    def count(self, rows):
+        self.__rows += rows
+
+    # method: fail [void]
+    #   records the exception raised by the command
+    def fail(self, error):
+        self.__error = error
+
+    # method: finish [void]
+    #   notifies the observers of the monitor
+    def finish(self, command):
+        self.__timings['total'] = time.time() - self.__started
+        self.__monitor.notify(DbCommandEvent(command, self.__timings, self.__rows, self.__error))
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbNullProbe
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbNullProbe(object):
+
+    __slots__ = ()
+
+    def lap(self, phase):
+        pass
+
+    def add(self, phase, seconds):
+        pass
+
+    def count(self, rows):
+        pass
+
+    def fail(self, error):
+        pass
+
+    def finish(self, command):
+        pass
+
+nullprobe = DbNullProbe()
+
+# function: explain [list]
+#   runs EXPLAIN for the query of a command on its connection,
+#   returns None if the connection is already closed
+def explain(command):
+    connection = command.connection
+    if not connection.is_connected:
+        return None
+    cursor = connection.cursor()
+    try:
+        if command.parameters is None or len(command.parameters) == 0:
+            cursor.execute('EXPLAIN ' + command.query)
+        else:
+            cursor.execute('EXPLAIN ' + command.query, command.parameters)
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+# function: fingerprint [string]
+#   normalizes a query by replacing literals and placeholders
+#   with '?' and collapsing whitespace and IN-lists
+def fingerprint(query):
+    query = _RE_STRING.sub('?', query)
+    query = _RE_PLACEHOLDER.sub('?', query)
+    query = _RE_NUMBER.sub('?', query)
+    query = _RE_INLIST.sub('(?+)', query)
+    return _RE_SPACE.sub(' ', query).strip()
+
+_RE_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_RE_PLACEHOLDER = re.compile(r'%\([^)]*\)s|%s')
+_RE_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_RE_INLIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_RE_SPACE = re.compile(r'\s+')
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbMonitor
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbMonitor(object):
+
+    def __init__(self):
+        self.__observers = ()
+        self.__lock = threading.Lock()
+    
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    # property: active [boolean] (readonly)
+    #   indicates if any observer is registered
+    def _get_active(self):
+        return len(self.__observers) > 0
+    active = property(_get_active)
+
+    __observers = ()
+    def _get_observers(self):
+        return self.__observers
+    observers = property(_get_observers)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: probe [DbProbe]
+    #   returns a probe timing a command, a no-op probe if
+    #   no observer is registered
+    def probe(self):
+        if len(self.__observers) == 0:
+            return nullprobe
+        return DbProbe(self)
+
+    # method: register [void]
+    #   registers an observer, an object with a method
+    #   observe(event) called after every command
+    def register(self, observer):
+        with self.__lock:
+            if observer not in self.__observers:
+                self.__observers = self.__observers + (observer,)
+
+    def unregister(self, observer):
+        with self.__lock:
+            self.__observers = tuple([o for o in self.__observers if o is not observer])
+
+    # method: notify [void]
+    #   passes an event to all observers. an observer raising
+    #   is logged and skipped, it must not mask the result of
+    #   the command or keep the other observers from the event
+    def notify(self, event):
+        for observer in self.__observers:
+            try:
+                observer.observe(event)
+            except Exception:
+                import logging
+                logging.getLogger('pydblayer.monitor').exception('observer %r failed', observer)
+
+# monitor notified by all commands
+monitor = DbMonitor()
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbHistogram
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbHistogram(object):
+
+    def __init__(self, buckets):
+        self.__buckets = buckets
+        self.__counts = [0] * len(buckets)
+        self.__sum = 0.0
+        self.__count = 0
+    
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    __buckets = ()
+    def _get_buckets(self):
+        return self.__buckets
+    buckets = property(_get_buckets)
+
+    # property: counts [list] (readonly)
+    #   cumulative count per bucket
+    __counts = None
+    def _get_counts(self):
+        return self.__counts
+    counts = property(_get_counts)
+
+    __sum = 0.0
+    def _get_sum(self):
+        return self.__sum
+    sum = property(_get_sum)
+
+    __count = 0
+    def _get_count(self):
+        return self.__count
+    count = property(_get_count)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    def observe(self, value):
+        self.__sum += value
+        self.__count += 1
+        for index, bound in enumerate(self.__buckets):
+            if value <= bound:
+                self.__counts[index] += 1
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbMetricsRegistry
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbMetricsRegistry(object):
+
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets = None):
+        self.__buckets = buckets or self.BUCKETS
+        self.__histograms = dict()
+        self.__counters = dict()
+        self.__lock = threading.Lock()
+    
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    # property: histograms [dictionary] (readonly)
+    #   latency histogram per (command, table, phase)
+    __histograms = None
+    def _get_histograms(self):
+        return self.__histograms
+    histograms = property(_get_histograms)
+
+    # property: counters [dictionary] (readonly)
+    #   value per (name, command, table), names are rows,
+    #   rowsaffected, errors, connects and commands
+    __counters = None
+    def _get_counters(self):
+        return self.__counters
+    counters = property(_get_counters)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: enable [void]
+    #   registers the registry at the monitor
+    def enable(self):
+        monitor.register(self)
+
+    def disable(self):
+        monitor.unregister(self)
+
+    # method: observe [void]
+    #   accounts an executed command
+    def observe(self, event):
+        kind = event.kind
+        table = event.table
+        with self.__lock:
+            for phase, seconds in event.timings.items():
+                key = (kind, table, phase)
+                histogram = self.__histograms.get(key)
+                if histogram is None:
+                    histogram = DbHistogram(self.__buckets)
+                    self.__histograms[key] = histogram
+                histogram.observe(seconds)
+            self._add('commands', kind, table, 1)
+            self._add('rows', kind, table, event.rows)
+            if event.rowsaffected > 0:
+                self._add('rowsaffected', kind, table, event.rowsaffected)
+            if event.error is not None:
+                self._add('errors', kind, table, 1)
+            if 'connect' in event.timings:
+                self._add('connects', kind, table, 1)
+
+    def clear(self):
+        with self.__lock:
+            self.__histograms.clear()
+            self.__counters.clear()
+
+    # method: render [string]
+    #   returns the metrics in prometheus text format
+    def render(self):
+        lines = []
+        with self.__lock:
+            lines.append('# HELP pydblayer_command_seconds time spent per command phase')
+            lines.append('# TYPE pydblayer_command_seconds histogram')
+            for key in sorted(self.__histograms):
+                histogram = self.__histograms[key]
+                labels = 'command="%s",table="%s",phase="%s"' % tuple([self._escape(value) for value in key])
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append('pydblayer_command_seconds_bucket{%s,le="%s"} %d' % (labels, repr(float(bound)), count))
+                lines.append('pydblayer_command_seconds_bucket{%s,le="+Inf"} %d' % (labels, histogram.count))
+                lines.append('pydblayer_command_seconds_sum{%s} %s' % (labels, repr(histogram.sum)))
+                lines.append('pydblayer_command_seconds_count{%s} %d' % (labels, histogram.count))
+            for name in ('commands', 'rows', 'rowsaffected', 'errors', 'connects'):
+                lines.append('# TYPE pydblayer_%s_total counter' % name)
+                for key in sorted(self.__counters):
+                    if key[0] != name:
+                        continue
+                    labels = 'command="%s",table="%s"' % (self._escape(key[1]), self._escape(key[2]))
+                    lines.append('pydblayer_%s_total{%s} %d' % (name, labels, self.__counters[key]))
+        return '\n'.join(lines) + '\n'
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    def _add(self, name, kind, table, value):
+        key = (name, kind, table)
+        self.__counters[key] = self.__counters.get(key, 0) + value
+
+    def _escape(self, value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbPrometheusExporter
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbPrometheusExporter(object):
+
+    def __init__(self, registry):
+        self.__registry = registry
+        self.__server = None
+    
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    __registry = None
+    def _get_registry(self):
+        return self.__registry
+    registry = property(_get_registry)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: write [void]
+    #   writes the metrics to a file, e.g. for the textfile
+    #   collector of the node exporter. the file is replaced
+    #   atomically
+    def write(self, path):
+        temp = path + '.tmp'
+        with open(temp, 'w') as f:
+            f.write(self.__registry.render())
+        os.replace(temp, path)
+
+    # method: serve [void]
+    #   serves the metrics over http on a background thread
+    def serve(self, port, host = '127.0.0.1'):
+        import http.server
+        registry = self.__registry
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.__server = http.server.ThreadingHTTPServer((host, port), Handler)
+        thread = threading.Thread(target=self.__server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    # method: shutdown [void]
+    #   stops serving the metrics
+    def shutdown(self):
+        if self.__server is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__server = None
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbSlowQueryLog
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbSlowQueryLog(object):
+
+    # constructor 
+    #   parameters:
+    #       path            file of the json-lines log
+    #       threshold       seconds a command must exceed
+    #       explain         runs EXPLAIN for slow SELECTs
+    #       redact          replaces the parameter values
+    #       maxbytes        size of the file before rotating
+    #       backupcount     count of rotated files kept
+    def __init__(self, path, threshold = 1.0, explain = True, redact = False, maxbytes = 10 * 1024 * 1024, backupcount = 5):
+        self.__path = path
+        self.threshold = threshold
+        self.explain = explain
+        self.redact = redact
+        import logging.handlers
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=maxbytes, backupCount=backupcount, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self.__logger = logging.getLogger('pydblayer.slowquery.%d' % id(self))
+        self.__logger.propagate = False
+        self.__logger.setLevel(logging.INFO)
+        self.__logger.addHandler(handler)
+        self.__handler = handler
+    
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    __path = None
+    def _get_path(self):
+        return self.__path
+    path = property(_get_path)
+
+    # property: threshold [float]
+    #   seconds a command must exceed to be logged
+    __threshold = 1.0
+    def _get_threshold(self):
+        return self.__threshold
+    def _set_threshold(self, value):
+        self.__threshold = value
+    threshold = property(_get_threshold, _set_threshold)
+
+    # property: explain [boolean]
+    #   indicates if slow SELECTs are explained
+    __explain = True
+    def _get_explain(self):
+        return self.__explain
+    def _set_explain(self, value):
+        self.__explain = value
+    explain = property(_get_explain, _set_explain)
+
+    # property: redact [boolean]
+    #   indicates if parameter values are replaced by '?'
+    __redact = False
+    def _get_redact(self):
+        return self.__redact
+    def _set_redact(self, value):
+        self.__redact = value
+    redact = property(_get_redact, _set_redact)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: enable [void]
+    #   registers the log at the monitor
+    def enable(self):
+        monitor.register(self)
+
+    def disable(self):
+        monitor.unregister(self)
+
+    # method: close [void]
+    #   unregisters the log and closes the file
+    def close(self):
+        self.disable()
+        self.__logger.removeHandler(self.__handler)
+        self.__handler.close()
+
+    # method: observe [void]
+    #   writes a record if the command exceeded the threshold
+    def observe(self, event):
+        if event.duration < self.__threshold:
+            return
+        command = event.command
+        query = command.query
+        record = {
+            'time': time.time(),
+            'command': event.kind,
+            'table': event.table,
+            'query': query,
+            'parameters': self._parameters(command.parameters),
+            'duration': event.duration,
+            'timings': event.timings,
+            'rows': event.rows,
+            'rowsaffected': event.rowsaffected,
+            'error': None if event.error is None else repr(event.error),
+            'callsite': self._callsite(),
+        }
+        if self.__explain and event.error is None and query.lstrip()[:6].upper() == 'SELECT':
+            try:
+                record['plan'] = explain(command)
+            except Exception as e:
+                record['plan'] = repr(e)
+        self.__logger.info(json.dumps(record, default=str))
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    def _parameters(self, parameters):
+        if parameters is None:
+            return None
+        if not self.__redact:
+            return parameters
+        if isinstance(parameters, dict):
+            return dict([(key, '?') for key in parameters])
+        return ['?'] * len(parameters)
+
+    # method: _callsite [string]
+    #   returns the innermost frame outside of pydblayer and
+    #   the standard library. frames of pydblayer are told by
+    #   their module, which is imported as RIP_Db*
+    def _callsite(self):
+        stdlib = os.path.dirname(os.__file__)
+        frame = sys._getframe(1)
+        while frame is not None:
+            filename = frame.f_code.co_filename
+            if not (frame.f_globals.get('__name__', '').startswith('RIP_Db') or filename.startswith('<') or filename.startswith(stdlib)):
+                return '%s:%d in %s' % (filename, frame.f_lineno, frame.f_code.co_name)
+            frame = frame.f_back
+        return None
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbDigestEntry
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbDigestEntry(object):
+
+    # constructor 
+    #   parameters:
+    #       fingerprint     normalized query
+    #       statement       class name of the sqlstatement
+    #       table           table of the sqlstatement
+    #       samples         count of durations kept for p99
+    def __init__(self, fingerprint, statement, table, samples = 1000):
+        self.__fingerprint = fingerprint
+        self.__statement = statement
+        self.__table = table
+        self.__durations = collections.deque(maxlen=samples)
+    
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    # property: fingerprint [string] (readonly)
+    #   normalized query
+    __fingerprint = ''
+    def _get_fingerprint(self):
+        return self.__fingerprint
+    fingerprint = property(_get_fingerprint)
+
+    # property: statement [string] (readonly)
+    #   class name of the sqlstatement, empty for raw sql
+    __statement = ''
+    def _get_statement(self):
+        return self.__statement
+    statement = property(_get_statement)
+
+    # property: table [string] (readonly)
+    #   table of the sqlstatement
+    __table = ''
+    def _get_table(self):
+        return self.__table
+    table = property(_get_table)
+
+    # property: count [integer] (readonly)
+    #   count of executions
+    __count = 0
+    def _get_count(self):
+        return self.__count
+    count = property(_get_count)
+
+    # property: total [float] (readonly)
+    #   seconds spent in all executions
+    __total = 0.0
+    def _get_total(self):
+        return self.__total
+    total = property(_get_total)
+
+    # property: max [float] (readonly)
+    #   seconds of the slowest execution
+    __max = 0.0
+    def _get_max(self):
+        return self.__max
+    max = property(_get_max)
+
+    # property: rows [integer] (readonly)
+    #   rows returned by all executions
+    __rows = 0
+    def _get_rows(self):
+        return self.__rows
+    rows = property(_get_rows)
+
+    # property: examined [integer] (readonly)
+    #   rows examined by all executions, estimated from
+    #   planrows
+    __examined = 0
+    def _get_examined(self):
+        return self.__examined
+    examined = property(_get_examined)
+
+    # property: errors [integer] (readonly)
+    #   count of failed executions
+    __errors = 0
+    def _get_errors(self):
+        return self.__errors
+    errors = property(_get_errors)
+
+    # property: planrows [integer]
+    #   rows examined per execution according to the plan,
+    #   None if the fingerprint was not explained
+    __planrows = None
+    def _get_planrows(self):
+        return self.__planrows
+    def _set_planrows(self, value):
+        self.__planrows = value
+    planrows = property(_get_planrows, _set_planrows)
+
+    # property: durations [deque] (readonly)
+    #   seconds of the last executions kept for p99
+    __durations = None
+    def _get_durations(self):
+        return self.__durations
+    durations = property(_get_durations)
+
+    # property: mean [float] (readonly)
+    #   mean seconds per execution
+    def _get_mean(self):
+        if self.__count == 0:
+            return 0.0
+        return self.__total / self.__count
+    mean = property(_get_mean)
+
+    # property: p99 [float] (readonly)
+    #   99th percentile of the kept durations
+    def _get_p99(self):
+        if len(self.__durations) == 0:
+            return 0.0
+        durations = sorted(self.__durations)
+        return durations[min(len(durations) - 1, int(len(durations) * 0.99))]
+    p99 = property(_get_p99)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: observe [void]
+    #   accounts an execution, rows examined are estimated
+    #   from the plan of the fingerprint if known
+    def observe(self, duration, rows, error):
+        self.__count += 1
+        self.__total += duration
+        self.__max = max(self.__max, duration)
+        self.__rows += rows
+        if error is not None:
+            self.__errors += 1
+        if self.__planrows is not None:
+            self.__examined += self.__planrows
+        self.__durations.append(duration)
+
+    # method: asdict [dictionary]
+    #   returns the entry as json-serializable dictionary
+    def asdict(self):
+        return {
+            'fingerprint': self.__fingerprint,
+            'statement': self.__statement,
+            'table': self.__table,
+            'count': self.__count,
+            'total': self.__total,
+            'max': self.__max,
+            'rows': self.__rows,
+            'examined': self.__examined,
+            'errors': self.__errors,
+            'planrows': self.__planrows,
+            'durations': list(self.__durations),
+        }
+
+    # method: fromdict [DbDigestEntry] (static)
+    #   restores an entry dumped by asdict
+    @staticmethod
+    def fromdict(values, samples = 1000):
+        entry = DbDigestEntry(values['fingerprint'], values['statement'], values['table'], samples)
+        entry.__count = values['count']
+        entry.__total = values['total']
+        entry.__max = values['max']
+        entry.__rows = values['rows']
+        entry.__examined = values['examined']
+        entry.__errors = values['errors']
+        entry.__planrows = values['planrows']
+        entry.__durations.extend(values['durations'])
+        return entry
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbQueryDigest
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbQueryDigest(object):
+
+    ORDERS = ('total', 'count', 'mean', 'p99', 'max', 'rows', 'examined')
+
+    # constructor 
+    #   parameters:
+    #       samples         count of durations kept per
+    #                       fingerprint for the p99
+    #       explain         explains each SELECT fingerprint
+    #                       once to estimate rows examined
+    def __init__(self, samples = 1000, explain = False):
+        self.__samples = samples
+        self.__explain = explain
+        self.__entries = dict()
+        self.__lock = threading.Lock()
+    
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    # property: entries [dictionary] (readonly)
+    #   DbDigestEntry per (statement, table, fingerprint)
+    __entries = None
+    def _get_entries(self):
+        return self.__entries
+    entries = property(_get_entries)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: enable [void]
+    #   registers the digest at the monitor
+    def enable(self):
+        monitor.register(self)
+
+    def disable(self):
+        monitor.unregister(self)
+
+    # method: observe [void]
+    #   accounts an executed command to its fingerprint
+    def observe(self, event):
+        command = event.command
+        if command.is_sqlstatement:
+            statement = type(command.sql).__name__
+        else:
+            statement = ''
+        query = fingerprint(command.query)
+        key = (statement, event.table, query)
+        with self.__lock:
+            entry = self.__entries.get(key)
+            created = entry is None
+            if created:
+                entry = DbDigestEntry(query, statement, event.table, self.__samples)
+                self.__entries[key] = entry
+        if created and self.__explain and event.error is None and query[:6].upper() == 'SELECT':
+            entry.planrows = self._planrows(command)
+        with self.__lock:
+            entry.observe(event.duration, event.rows, event.error)
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+
+    # method: report [list]
+    #   returns the top entries ordered descending by one
+    #   of ORDERS
+    def report(self, top = 10, order = 'total'):
+        if order not in self.ORDERS:
+            raise ValueError('unknown order: ' + str(order))
+        with self.__lock:
+            entries = list(self.__entries.values())
+        entries.sort(key=lambda entry: getattr(entry, order), reverse=True)
+        return entries[:top]
+
+    # method: format [string]
+    #   returns the report as text table
+    def format(self, top = 10, order = 'total'):
+        lines = ['%4s %10s %8s %10s %10s %10s %10s  %s' % ('rank', 'total', 'count', 'mean', 'p99', 'rows', 'examined', 'statement')]
+        for rank, entry in enumerate(self.report(top, order)):
+            examined = '-' if entry.planrows is None else str(entry.examined)
+            lines.append('%4d %10.4f %8d %10.6f %10.6f %10d %10s  %s %s' % (rank + 1, entry.total, entry.count, entry.mean, entry.p99,
+                entry.rows, examined, entry.statement or 'sql', entry.table))
+            lines.append('%4s %s' % ('', entry.fingerprint))
+        return '\n'.join(lines) + '\n'
+
+    # method: dump [void]
+    #   writes the entries to a json file
+    def dump(self, path):
+        with self.__lock:
+            entries = [entry.asdict() for entry in self.__entries.values()]
+        temp = path + '.tmp'
+        with open(temp, 'w') as f:
+            json.dump(entries, f)
+        os.replace(temp, path)
+
+    # method: load [DbQueryDigest] (static)
+    #   reads entries written by dump
+    @staticmethod
+    def load(path, samples = 1000):
+        digest = DbQueryDigest(samples)
+        with open(path) as f:
+            for values in json.load(f):
+                entry = DbDigestEntry.fromdict(values, samples)
+                digest.entries[(entry.statement, entry.table, entry.fingerprint)] = entry
+        return digest
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    # method: _planrows [integer]
+    #   sums the estimated rows of the plan, None if the plan
+    #   has no rows column
+    def _planrows(self, command):
+        try:
+            plan = explain(command)
+        except Exception:
+            return None
+        if not plan or 'rows' not in plan[0]:
+            return None
+        return sum([int(row['rows'] or 0) for row in plan])
+
+def _main(argv):
+    usage = 'usage: DbMonitor.py [-n top] [-o order] digest.json'
+    try:
+        opts, args = getopt.getopt(argv, 'hn:o:', ['help', 'top=', 'order='])
+    except getopt.GetoptError:
+        print(usage)
+        return 2
+    top = 10
+    order = 'total'
+    for opt, arg in opts:
+        if opt in ('-h', '--help'):
+            print(usage)
+            return 0
+        elif opt in ('-n', '--top'):
+            top = int(arg)
+        elif opt in ('-o', '--order'):
+            order = arg
+    if len(args) != 1:
+        print(usage)
+        return 2
+    sys.stdout.write(DbQueryDigest.load(args[0]).format(top, order))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(_main(sys.argv[1:]))
@@ -0,0 +1,720 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import re
+import abc
+import zlib
+import bisect
+import heapq
+import itertools
+import functools
+import threading
+import contextvars
+import concurrent.futures
+from RIP_DbAccess import *
+
+# aggregate functions, their per shard results can't be
+# merged into the result across shards
+_AGGREGATE = re.compile(r'\b(COUNT|SUM|AVG|MIN|MAX|GROUP_CONCAT|STDDEV\w*|VAR\w*|BIT_\w+|JSON_\w*AGG)\s*\(', re.IGNORECASE)
+
+# column of a merge orderby term, optionally qualified and
+# followed by ASC or DESC
+_ORDERTERM = re.compile(r'^\s*`?(?:\w+`?\.`?)?(\w+)`?(?:\s+(ASC|DESC))?\s*$', re.IGNORECASE)
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbShardMap
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbShardMap(abc.ABC):
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: shard [integer] (abstract)
+    #   returns the index of the shard holding the rows with
+    #   the shard key value, out of count shards
+    @abc.abstractmethod
+    def shard(self, value, count):
+        pass
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbHashShardMap
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbHashShardMap(DbShardMap):
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: shard [integer]
+    #   crc32 of the value as string modulo count, stable
+    #   across processes unlike the builtin hash
+    def shard(self, value, count):
+        return zlib.crc32(str(value).encode('utf-8')) % count
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbRangeShardMap
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbRangeShardMap(DbShardMap):
+
+    # constructor
+    #   parameters:
+    #       bounds          ascending lower bounds of the shards
+    #                       after the first, [1000, 2000] maps
+    #                       values below 1000 to shard 0, up to
+    #                       1999 to shard 1 and the rest to 2
+    def __init__(self, bounds):
+        bounds = list(bounds)
+        if bounds != sorted(bounds):
+            raise ValueError('bounds of a range shard map have to ascend')
+        self.__bounds = bounds
+
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    # property: bounds [list] (readonly)
+    #   lower bounds of the shards after the first
+    __bounds = None
+    def _get_bounds(self):
+        return self.__bounds
+    bounds = property(_get_bounds)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    def shard(self, value, count):
+        return bisect.bisect_right(self.__bounds, value)
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbShardedSelectCommand
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbShardedSelectCommand(DbSelectCommand):
+
+    def __init__(self, factory, tablename):
+        super(DbShardedSelectCommand, self).__init__(None, tablename)
+        self.__factory = factory
+
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    # property: factory [DbShardedFactory] (readonly)
+    #   factory executing the command on its shards
+    __factory = None
+    def _get_factory(self):
+        return self.__factory
+    factory = property(_get_factory)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: fetchone [row]
+    #   executes the query on its shards in parallel and
+    #   returns the first row in orderby order, at limit_start
+    #   of the merged rows if a limit is set
+    def fetchone(self, cursortype=cursors.DictCursor):
+        rows = self._fetch(cursortype, 1)
+        if len(rows) == 0:
+            return None
+        return rows[0]
+
+    # method: fetchall [rows]
+    #   executes the query on its shards in parallel and
+    #   merges the rows. with several shards the rows are
+    #   sorted by orderby, whose columns have to be fetched,
+    #   and the limit is applied to the merged rows
+    def fetchall(self, cursortype=cursors.DictCursor):
+        return tuple(self._fetch(cursortype, self.limit_duration))
+
+    # method: paginate [iterator]
+    #   merges the keyset pages of its shards ordered by key
+    def paginate(self, key='id', pagesize=1000):
+        column = key.split('.')[-1]
+        pages = [cmd.paginate(key, pagesize) for cmd in self._commands()]
+        return heapq.merge(*pages, key=lambda row: row[column])
+
+    # method: iterate [generator]
+    #   yields the streamed rows of its shards one shard
+    #   after the other
+    def iterate(self, batch_size=1000, cursortype=cursors.SSDictCursor):
+        commands = self._commands()
+        self._checkMerge(len(commands), False)
+        rows = itertools.chain.from_iterable([cmd.iterate(batch_size, cursortype) for cmd in commands])
+        if len(commands) > 1 and self.limit_duration > 0:
+            rows = itertools.islice(rows, self.limit_start, self.limit_start + self.limit_duration)
+        for row in rows:
+            yield row
+
+    def executeColumnar(self, batch_size=10000, maxcategories=1024):
+        raise ValueError('executeColumnar is not supported across shards')
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    # method: _fetch [list]
+    #   fetches and merges the rows of its shards, duration
+    #   rows from the offset on if duration is not 0
+    def _fetch(self, cursortype, duration):
+        commands = self._commands(duration)
+        self._checkMerge(len(commands), True)
+        results = self.__factory._parallel([functools.partial(cmd.fetchall, cursortype) for cmd in commands])
+        rows = self._order(list(itertools.chain.from_iterable(results)), len(commands))
+        if len(commands) > 1 and duration > 0:
+            rows = rows[self._offset():self._offset() + duration]
+        self._result(len(rows), -1, commands[0].description)
+        return rows
+
+    # method: _offset [integer]
+    #   first row of the result, limit_start only applies
+    #   with a limit_duration like in the rendered statement
+    def _offset(self):
+        if self.limit_duration > 0:
+            return self.limit_start
+        return 0
+
+    # method: _commands [list]
+    #   select commands of the shards the query runs on,
+    #   limited to duration rows, by default limit_duration.
+    #   with several shards each one reads the rows up to the
+    #   end of the limit
+    def _commands(self, duration = None):
+        if duration is None:
+            duration = self.limit_duration
+        targets = self.__factory._targets(self.sql, self.parameters)
+        commands = self.__factory._shardCommands(self, targets)
+        if duration > 0:
+            for cmd in commands:
+                if len(commands) > 1:
+                    cmd.sql.limit_start = 0
+                    cmd.sql.limit_duration = self._offset() + duration
+                else:
+                    cmd.sql.limit_start = self._offset()
+                    cmd.sql.limit_duration = duration
+        return commands
+
+    # method: _create [DbSelectCommand]
+    #   creates the command of a shard
+    def _create(self, shard):
+        return shard.createSelectCommand(self.sql.table)
+
+    # method: _checkMerge [void]
+    #   raises ValueError before the query runs on count
+    #   shards if their rows can't be merged: aggregates
+    #   return one partial row per shard, and an ordered
+    #   merge needs every orderby term to be a fetched column
+    def _checkMerge(self, count, ordered):
+        if count < 2:
+            return
+        for field in self.sql.fields:
+            if _AGGREGATE.search(field):
+                raise ValueError('aggregate %s is not merged across shards, use DbShardedTableAdapter or fanout' % field)
+        if not ordered or self.sql.orderby == '':
+            return
+        fetched = set()
+        for field in self.sql.fields:
+            parts = re.split(r'\s+AS\s+', field, flags=re.IGNORECASE)
+            fetched.add(parts[-1].strip().strip('`').split('.')[-1].strip('`'))
+        for term in self.sql.orderby.split(','):
+            match = _ORDERTERM.match(term)
+            if match is None:
+                raise ValueError('orderby term %s is no column, rows of several shards are merged by fetched columns' % term.strip())
+            if match.group(1) not in fetched and '*' not in fetched:
+                raise ValueError('orderby column %s is not fetched, rows of several shards are merged by fetched columns' % match.group(1))
+
+    # method: _order [list]
+    #   sorts the merged rows of count shards by orderby,
+    #   NULL first like MySQL
+    def _order(self, rows, count):
+        if count < 2 or self.sql.orderby == '':
+            return rows
+        for term in reversed(self.sql.orderby.split(',')):
+            match = _ORDERTERM.match(term)
+            column = match.group(1)
+            descending = (match.group(2) or '').upper() == 'DESC'
+            rows.sort(key=lambda row: (row[column] is not None, row[column]), reverse=descending)
+        return rows
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbShardedInsertCommand
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbShardedInsertCommand(DbInsertCommand):
+
+    def __init__(self, factory, tablename, sql=None):
+        super(DbShardedInsertCommand, self).__init__(None, tablename, sql)
+        self.__factory = factory
+
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    # property: factory [DbShardedFactory] (readonly)
+    #   factory executing the command on its shards
+    __factory = None
+    def _get_factory(self):
+        return self.__factory
+    factory = property(_get_factory)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: commit [void]
+    #   executes the command on the shard of its key field
+    def commit(self):
+        index = self.__factory.shardIndex(self.__factory._keyValue(self.parameters))
+        self._result(*self.__factory._commit(self, [index]))
+
+    # method: executeBulk [dictionary]
+    #   groups rows by the shard of their key field and
+    #   inserts the groups in parallel. returns the result
+    #   of DbInsertCommand.executeBulk per shard index
+    def executeBulk(self, rows, batchsize=1000, maxpacket=None, commitbatches=True):
+        groups = dict()
+        for row in rows:
+            index = self.__factory.shardIndex(self.__factory._keyValue(row))
+            groups.setdefault(index, []).append(row)
+        targets = sorted(groups)
+        commands = self.__factory._shardCommands(self, targets)
+        calls = [functools.partial(cmd.executeBulk, groups[index], batchsize, maxpacket, commitbatches) for index, cmd in zip(targets, commands)]
+        return dict(zip(targets, self.__factory._parallel(calls)))
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    # method: _create [DbInsertCommand]
+    #   creates the command of a shard
+    def _create(self, shard):
+        return shard.createInsertCommand(self.sql.table)
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbShardedUpsertCommand
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbShardedUpsertCommand(DbShardedInsertCommand):
+
+    def __init__(self, factory, tablename):
+        super(DbShardedUpsertCommand, self).__init__(factory, tablename, DbSqlUpsertStatement(tablename))
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: registerUpdateField
+    #   registers a field assigned if the row already exists
+    def registerUpdateField(self, name):
+        self.sql.registerUpdateField(name)
+
+    # method: execute [rows]
+    #   executes upsert-query and returns affected row count
+    def execute(self):
+        self.commit()
+        return self.rowsaffected
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    def _create(self, shard):
+        return shard.createUpsertCommand(self.sql.table)
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbShardedUpdateCommand
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbShardedUpdateCommand(DbUpdateCommand):
+
+    def __init__(self, factory, tablename):
+        super(DbShardedUpdateCommand, self).__init__(None, tablename)
+        self.__factory = factory
+
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    __factory = None
+    def _get_factory(self):
+        return self.__factory
+    factory = property(_get_factory)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: commit [void]
+    #   executes the command on the shard of its key
+    #   condition, on all shards in parallel without one
+    def commit(self):
+        targets = self.__factory._targets(self.sql, self.parameters)
+        self._result(*self.__factory._commit(self, targets))
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    def _create(self, shard):
+        return shard.createUpdateCommand(self.sql.table)
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbShardedDeleteCommand
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbShardedDeleteCommand(DbDeleteCommand):
+
+    def __init__(self, factory, tablename):
+        super(DbShardedDeleteCommand, self).__init__(None, tablename)
+        self.__factory = factory
+
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    __factory = None
+    def _get_factory(self):
+        return self.__factory
+    factory = property(_get_factory)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: commit [void]
+    #   executes the command on the shard of its key
+    #   condition, on all shards in parallel without one
+    def commit(self):
+        targets = self.__factory._targets(self.sql, self.parameters)
+        self._result(*self.__factory._commit(self, targets))
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    def _create(self, shard):
+        return shard.createDeleteCommand(self.sql.table)
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbShardedTableAdapter
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbShardedTableAdapter(DbTableAdapter):
+
+    # constructor
+    #   parameters:
+    #       factory         DbShardedFactory of the table
+    #       tablename       name of the sharded table
+    def __init__(self, factory, tablename):
+        super(DbShardedTableAdapter, self).__init__(factory, tablename)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: count [integer]
+    #   sum of the row counts of the shards
+    def count(self):
+        return self._aggregate('COUNT(*)', sum)
+
+    # method: maxid [integer]
+    #   maximum of the highest ids of the shards
+    def maxid(self):
+        return self._aggregate('MAX(id)', max)
+
+    # method: minid [integer]
+    #   minimum of the lowest ids of the shards
+    def minid(self):
+        return self._aggregate('MIN(id)', min)
+
+    # method: parallelScan [generator]
+    #   scans the id ranges of all shards concurrently, up to
+    #   workers ranges per shard. the ranges of the shards
+    #   are interleaved and run on threads of the scan, not
+    #   on the executor of the factory
+    def parallelScan(self, workers=4, chunk=10000, fields=None, callback=None, executor=None):
+        adapters = []
+        for shard in self.connection.shards:
+            adapter = DbTableAdapter(shard.createReadConnection(), self.tablename)
+            adapter.rowmode = self.rowmode
+            adapters.append(adapter)
+        return self._scan(self._shardRanges(adapters, chunk), workers * len(adapters), fields, callback, executor)
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    # method: _aggregate [integer]
+    #   queries the aggregate field on all shards in parallel
+    #   and combines the results of the non-empty shards
+    def _aggregate(self, field, combine):
+        values = self.connection.fanout(functools.partial(self._shardAggregate, field))
+        values = [value for value in values if value is not None]
+        if len(values) == 0:
+            return 0
+        return int(combine(values))
+
+    # method: _shardRanges [generator]
+    #   yields the id ranges of the shards round robin, the
+    #   ranges are read on the shards in parallel
+    def _shardRanges(self, adapters, chunk):
+        ranges = self.connection._parallel([functools.partial(list, adapter._ranges(chunk)) for adapter in adapters])
+        for tasks in itertools.zip_longest(*ranges):
+            for task in tasks:
+                if task is not None:
+                    yield task
+
+    def _shardAggregate(self, field, shard):
+        cmd = shard.createSelectCommand(self.tablename)
+        cmd.registerField(field)
+        return cmd.execute()[0][field]
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbShardedFactory
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbShardedFactory(object):
+
+    # constructor
+    #   parameters:
+    #       configs         configs of the shards in the order of
+    #                       the shard map, or DbFactory objects
+    #                       e.g. with replicas
+    #       key             column holding the shard key
+    #       shardmap        DbShardMap of the key values,
+    #                       hashed by default
+    #       driver          driver name or instance of the
+    #                       shards created from configs
+    #       workers         threads querying the shards, four
+    #                       per shard by default
+    def __init__(self, configs, key, shardmap = None, driver = None, workers = None):
+        self.__shards = []
+        for config in configs:
+            if not isinstance(config, DbFactory):
+                config = DbFactory(config, driver)
+            self.__shards.append(config)
+        if len(self.__shards) == 0:
+            raise ValueError('a sharded factory needs at least one shard')
+        self.__key = key
+        self.__shardmap = shardmap or DbHashShardMap()
+        self.__workers = workers or 4 * len(self.__shards)
+        self.__lock = threading.Lock()
+        self.__local = threading.local()
+
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    # property: shards [list] (readonly)
+    #   DbFactory objects of the shards
+    __shards = None
+    def _get_shards(self):
+        return self.__shards
+    shards = property(_get_shards)
+
+    # property: key [string] (readonly)
+    #   column holding the shard key
+    __key = None
+    def _get_key(self):
+        return self.__key
+    key = property(_get_key)
+
+    # property: shardmap [DbShardMap] (readonly)
+    #   maps a shard key value to a shard index
+    __shardmap = None
+    def _get_shardmap(self):
+        return self.__shardmap
+    shardmap = property(_get_shardmap)
+
+    # property: executor [concurrent.futures.Executor] (readonly)
+    #   executor querying the shards in parallel, created
+    #   on the first fan-out
+    __executor = None
+    def _get_executor(self):
+        with self.__lock:
+            if self.__executor is None:
+                self.__executor = concurrent.futures.ThreadPoolExecutor(self.__workers)
+            return self.__executor
+    executor = property(_get_executor)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: enablePool [void]
+    #   enables a pool of minsize..maxsize connections on
+    #   every shard
+    def enablePool(self, minsize = 1, maxsize = 10, timeout = 30.0, idletimeout = 300.0, ping = True):
+        for shard in self.__shards:
+            shard.enablePool(minsize, maxsize, timeout, idletimeout, ping)
+
+    # method: disablePool [void]
+    def disablePool(self):
+        for shard in self.__shards:
+            shard.disablePool()
+
+    # method: enableResultCache [void]
+    #   enables a result cache on every shard
+    def enableResultCache(self, ttl = 60.0, maxbytes = 64 * 1024 * 1024):
+        for shard in self.__shards:
+            shard.enableResultCache(ttl, maxbytes)
+
+    # method: disableResultCache [void]
+    def disableResultCache(self):
+        for shard in self.__shards:
+            shard.disableResultCache()
+
+    # method: close [void]
+    #   stops the executor and closes the pools
+    def close(self):
+        with self.__lock:
+            if self.__executor is not None:
+                self.__executor.shutdown(True)
+                self.__executor = None
+        self.disablePool()
+
+    # method: shardIndex [integer]
+    #   index of the shard holding the key value
+    def shardIndex(self, value):
+        index = self.__shardmap.shard(value, len(self.__shards))
+        if index < 0 or index >= len(self.__shards):
+            raise ValueError('shard key %r maps to shard %d of %d' % (value, index, len(self.__shards)))
+        return index
+
+    # method: shard [DbFactory]
+    #   factory of the shard holding the key value
+    def shard(self, value):
+        return self.__shards[self.shardIndex(value)]
+
+    # method: fanout [list]
+    #   calls function with the DbFactory of every shard in
+    #   parallel, returns the results in shard order
+    def fanout(self, function):
+        return self._parallel([functools.partial(function, shard) for shard in self.__shards])
+
+    # method: createSelectCommand [DbSelectCommand]
+    #   creates a select command on the shard of shardkey,
+    #   without one a command running on the shard of its key
+    #   condition or on all shards
+    def createSelectCommand(self, tablename, shardkey = None):
+        if shardkey is not None:
+            return self.shard(shardkey).createSelectCommand(tablename)
+        return DbShardedSelectCommand(self, tablename)
+
+    # method: createInsertCommand [DbShardedInsertCommand]
+    #   creates an insert command running on the shard of
+    #   its key field
+    def createInsertCommand(self, tablename):
+        return DbShardedInsertCommand(self, tablename)
+
+    # method: createUpsertCommand [DbShardedUpsertCommand]
+    #   creates an upsert command running on the shard of
+    #   its key field
+    def createUpsertCommand(self, tablename):
+        return DbShardedUpsertCommand(self, tablename)
+
+    # method: createUpdateCommand [DbUpdateCommand]
+    #   creates an update command on the shard of shardkey,
+    #   without one a command running on the shard of its key
+    #   condition or on all shards
+    def createUpdateCommand(self, tablename, shardkey = None):
+        if shardkey is not None:
+            return self.shard(shardkey).createUpdateCommand(tablename)
+        return DbShardedUpdateCommand(self, tablename)
+
+    # method: createDeleteCommand [DbDeleteCommand]
+    #   creates a delete command on the shard of shardkey,
+    #   without one a command running on the shard of its key
+    #   condition or on all shards
+    def createDeleteCommand(self, tablename, shardkey = None):
+        if shardkey is not None:
+            return self.shard(shardkey).createDeleteCommand(tablename)
+        return DbShardedDeleteCommand(self, tablename)
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    # method: _keyValue [object]
+    #   shard key value of the fields of an insert
+    def _keyValue(self, fields):
+        if self.__key not in fields:
+            raise ValueError('shard key %s is not set' % self.__key)
+        return fields[self.__key]
+
+    # method: _targets [list]
+    #   indexes of the shards a statement runs on, the shard
+    #   of an equality condition on the key if all conditions
+    #   are combined with AND, all shards otherwise
+    def _targets(self, statement, parameters):
+        names = (self.__key, statement.table + '.' + self.__key)
+        for condition in statement.conditions:
+            if condition.operator == 'OR':
+                break
+        else:
+            for condition in statement.conditions:
+                if condition.field in names and condition.comparsion == '=' and condition.parameter in parameters:
+                    return [self.shardIndex(parameters[condition.parameter])]
+        return list(range(len(self.__shards)))
+
+    # method: _shardCommands [list]
+    #   creates the commands of command on the target shards,
+    #   each with a copy of its statement
+    def _shardCommands(self, command, targets):
+        commands = []
+        for index in targets:
+            cmd = command._create(self.__shards[index])
+            cmd.sql = command.sql.copy()
+            cmd.parameters = command.parameters
+            cmd.rowmode = command.rowmode
+            commands.append(cmd)
+        return commands
+
+    # method: _commit [tuple]
+    #   commits command on the target shards in parallel,
+    #   returns the summed rowsaffected and the lastrowid of
+    #   the first shard
+    def _commit(self, command, targets):
+        commands = self._shardCommands(command, targets)
+        self._parallel([cmd.commit for cmd in commands])
+        rowsaffected = sum([max(cmd.rowsaffected, 0) for cmd in commands])
+        return (rowsaffected, commands[0].lastrowid)
+
+    # method: _parallel [list]
+    #   runs the calls on the executor and waits for all of
+    #   them, so the slowest call bounds the latency. the
+    #   first failure is raised once all calls completed.
+    #   calls made on a thread of the executor, e.g. a sharded
+    #   command inside fanout, run one after the other, so
+    #   they don't wait for threads held by their callers
+    def _parallel(self, calls):
+        if len(calls) == 1 or getattr(self.__local, 'nested', False):
+            return [call() for call in calls]
+        futures = [self.executor.submit(contextvars.copy_context().run, self._run, call) for call in calls]
+        concurrent.futures.wait(futures)
+        return [future.result() for future in futures]
+
+    # method: _run [object]
+    #   runs a call on a thread of the executor
+    def _run(self, call):
+        self.__local.nested = True
+        try:
+            return call()
+        finally:
+            self.__local.nested = False
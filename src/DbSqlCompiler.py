@@ -1,14 +1,15 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import sys
-import getopt
-import warnings
-import string
+import os
+import copy
+import json
+import threading
+import collections
 
 def enum(*sequential, **values):
     enums = dict(zip(sequential, range(len(sequential))), **values)
-    reverse = dict((value, key) for key, value in enums.iteritems())
+    reverse = dict((value, key) for key, value in enums.items())
     enums["reverse_mapping"] = reverse
     return type('Enum', (), enums)
 
@@ -23,6 +24,139 @@ EN_ENCLOSEMENT = enum(No = 0,
                       Quote = 4,
                       DoubleQuote = 5)
 
+# version of the rendered sql, bumped whenever the compiler
+# renders a fingerprint differently. files saved by another
+# version are ignored on load
+SQLCACHE_VERSION = 1
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbSqlRenderCache
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbSqlRenderCache(object):
+
+    def __init__(self, maxsize = 512):
+        self.__maxsize = maxsize
+        self.__entries = collections.OrderedDict()
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+    
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    __maxsize = 0
+    def _get_maxsize(self):
+        return self.__maxsize
+    def _set_maxsize(self, value):
+        with self.__lock:
+            self.__maxsize = value
+            self._trim()
+    maxsize = property(_get_maxsize, _set_maxsize)
+
+    def _get_count(self):
+        return len(self.__entries)
+    count = property(_get_count)
+
+    __hits = 0
+    def _get_hits(self):
+        return self.__hits
+    hits = property(_get_hits)
+
+    __misses = 0
+    def _get_misses(self):
+        return self.__misses
+    misses = property(_get_misses)
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    def get(self, key):
+        with self.__lock:
+            sql = self.__entries.pop(key, None)
+            if sql is None:
+                self.__misses += 1
+                return None
+            self.__entries[key] = sql
+            self.__hits += 1
+            return sql
+
+    def put(self, key, sql):
+        with self.__lock:
+            self.__entries.pop(key, None)
+            self.__entries[key] = sql
+            self._trim()
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.__hits = 0
+            self.__misses = 0
+
+    # method: precompile [integer]
+    #   renders statements into the cache ahead of their first
+    #   execution, returns the count of cached statements.
+    #   statements with appended tokens are skipped, their
+    #   fingerprint does not cover the tokens
+    def precompile(self, statements):
+        count = 0
+        for statement in statements:
+            if statement.count > 0:
+                continue
+            self.put(statement.fingerprint, statement.render())
+            count += 1
+        return count
+
+    # method: save [void]
+    #   writes the cached statements to a json file, written
+    #   atomically. loading it at startup spares rendering the
+    #   frequent statements on their first execution
+    def save(self, path):
+        with self.__lock:
+            entries = [[key, sql] for key, sql in self.__entries.items()]
+        temp = path + '.tmp'
+        with open(temp, 'w') as f:
+            json.dump({'version': SQLCACHE_VERSION, 'entries': entries}, f)
+        os.replace(temp, path)
+
+    # method: load [integer]
+    #   adds the statements of a file written by save,
+    #   returns the count of loaded statements. a file of
+    #   another SQLCACHE_VERSION is ignored
+    def load(self, path):
+        with open(path) as f:
+            saved = json.load(f)
+        if not isinstance(saved, dict) or saved.get('version') != SQLCACHE_VERSION:
+            return 0
+        entries = saved['entries']
+        with self.__lock:
+            for key, sql in entries:
+                self.__entries[_freeze(key)] = sql
+            self._trim()
+        return len(entries)
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    def _trim(self):
+        while len(self.__entries) > self.__maxsize:
+            self.__entries.popitem(False)
+
+# function: _freeze [tuple]
+#   turns the json lists of a saved fingerprint back into
+#   tuples
+def _freeze(value):
+    if isinstance(value, list):
+        return tuple([_freeze(item) for item in value])
+    return value
+
+# shared cache of rendered statements, keyed by fingerprint
+sqlcache = DbSqlRenderCache()
+
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 # class DbSqlTokenizer
@@ -31,31 +165,36 @@ EN_ENCLOSEMENT = enum(No = 0,
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 class DbSqlTokenizer(object):
 
+    # nodes are created per condition and join, slots keep
+    # them small. the attributes are set in the constructors,
+    # slots and class attribute defaults exclude each other
+    __slots__ = ('__tokens', '__separator')
 
     def __init__(self, separator = '', tokens = None):
-        self.__tokens = list()
+        self.__tokens = None
         self.__separator = separator
 
         if tokens is not None:
             self.append(tokens)
-
-    def __del__(self):
-        pass
     
     # ------------------------------------------------------
     #   public properties 
     # ------------------------------------------------------
     
     def _get_count(self):
+        if self.__tokens is None:
+            return 0
         return len(self.__tokens)
     count = property(_get_count)
 
-    __tokens = list()
+    # property: tokens [list] (readonly)
+    #   appended tokens, the list is created on first use
     def _get_tokens(self):
+        if self.__tokens is None:
+            self.__tokens = list()
         return self.__tokens
     tokens = property(_get_tokens)
 
-    __separator = ""
     def _get_separator(self):
         return self.__separator
     separator = property(_get_separator)
@@ -76,22 +215,38 @@ class DbSqlTokenizer(object):
         return
 
     def render(self, separator = None):
-        sep = str(self.separator)
-        if separator is not None:
-            sep = str(separator)
-        
-        temp = list(self.tokens)
-        queue = list()
-        for t in temp:
-            if isinstance(t, DbSqlTokenizer):
-                queue.append(t.render())
+        buffer = []
+        self._writeTokens(buffer, self.__separator if separator is None else separator)
+        return ''.join(buffer)
+
+    # method: write [void]
+    #   appends the rendered pieces to buffer, joining the
+    #   buffer once renders a whole statement in a single pass
+    def write(self, buffer):
+        self._writeTokens(buffer, self.__separator)
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    def _writeTokens(self, buffer, separator):
+        if self.__tokens is None:
+            return
+        separator = str(separator)
+        for index, token in enumerate(self.__tokens):
+            if index > 0:
+                buffer.append(separator)
+            if isinstance(token, DbSqlTokenizer):
+                token.write(buffer)
             else:
-                queue.append(t)
+                buffer.append(token)
 
-        self.__tokens = list()
-        ret = sep.join(queue)
-        del queue
-        return ret
+# enclosing characters by EN_ENCLOSEMENT
+_ENCLOSEMENTS = {EN_ENCLOSEMENT.Square: ('[', ']'),
+                 EN_ENCLOSEMENT.Round: ('(', ')'),
+                 EN_ENCLOSEMENT.Curly: ('{', '}'),
+                 EN_ENCLOSEMENT.Quote: ("'", "'"),
+                 EN_ENCLOSEMENT.DoubleQuote: ('"', '"')}
 
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
@@ -101,6 +256,8 @@ class DbSqlTokenizer(object):
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 class DbSqlExpression(DbSqlTokenizer):
 
+    __slots__ = ('__enclosement',)
+
     def __init__(self, separator = ' '):
         super(DbSqlExpression, self).__init__(separator)
         self.__enclosement = EN_ENCLOSEMENT.No
@@ -109,7 +266,6 @@ class DbSqlExpression(DbSqlTokenizer):
     #   public properties 
     # ------------------------------------------------------
     
-    __enclosement = None
     def _get_enclosement(self):
         return self.__enclosement
     def _set_enclosement(self, value):
@@ -121,25 +277,18 @@ class DbSqlExpression(DbSqlTokenizer):
     # ------------------------------------------------------
 
     def render(self):
+        buffer = []
+        self.write(buffer)
+        return ''.join(buffer)
 
-        if self.enclosement is None:
-            return super(DbSqlExpression, self).render()
-
-        enc = []
-        if self.enclosement == EN_ENCLOSEMENT.Square:
-            enc = ["[", "]"]
-        elif self.enclosement == EN_ENCLOSEMENT.Round:
-            enc = ["(", ")"]
-        elif self.enclosement == EN_ENCLOSEMENT.Curly:
-            enc = ["{", "}"]
-        elif self.enclosement == EN_ENCLOSEMENT.Quote:
-            enc = ["'", "'"]
-        elif self.enclosement == EN_ENCLOSEMENT.DoubleQuote:
-            enc = ['"', '"']
-        else: 
-            enc = ["", ""]
-
-        return enc[0] + super(DbSqlExpression, self).render() + enc[1]
+    def write(self, buffer):
+        enclosement = _ENCLOSEMENTS.get(self.__enclosement)
+        if enclosement is None:
+            super(DbSqlExpression, self).write(buffer)
+            return
+        buffer.append(enclosement[0])
+        super(DbSqlExpression, self).write(buffer)
+        buffer.append(enclosement[1])
 
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
@@ -149,6 +298,8 @@ class DbSqlExpression(DbSqlTokenizer):
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 class DbSqlTableDefinition(object):
 
+    __slots__ = ('__name', '__fields')
+
     def __init__(self, name):
         self.__name = name
         self.__fields = []
@@ -157,14 +308,12 @@ class DbSqlTableDefinition(object):
     #   public properties 
     # ------------------------------------------------------
 
-    __name = ''
     def _get_name(self):
         return self.__name
     def _set_name(self, value):
         self.__name = value
     name = property(_get_name, _set_name)
 
-    __fields = []
     def _get_fields(self):
         return self.__fields
     fields = property(_get_fields)
@@ -199,41 +348,41 @@ class DbSqlTableDefinition(object):
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 class DbSqlFieldDefinition(object):
 
+    __slots__ = ('__table', '__name', '__sqltype', '__length', '__display')
+
     def __init__(self, table, name):
         self.__name = name
         self.__table = table
+        self.__sqltype = ''
+        self.__length = ''
+        self.__display = ''
     
     # ------------------------------------------------------
     #   public properties 
     # ------------------------------------------------------
     
-    __table = None
     def _get_table(self):
         return self.__table
     table = property(_get_table)
 
-    __name = ''
     def _get_name(self):
         return self.__name
     def _set_name(self, value):
         self.__name = value
     name = property(_get_name, _set_name)
 
-    __sqltype = ''
     def _get_sqltype(self):
         return self.__sqltype
     def _set_sqltype(self, value):
         self.__sqltype = value
     sqltype = property(_get_sqltype, _set_sqltype)
 
-    __length = ''
     def _get_length(self):
         return self.__length
     def _set_length(self, value):
         self.__length = value
     length = property(_get_length, _set_length)
 
-    __display = ''
     def _get_display(self):
         return self.__display
     def _set_display(self, value):
@@ -248,51 +397,409 @@ class DbSqlFieldDefinition(object):
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 class DbSqlCondition(DbSqlExpression):
 
-    def __init__(self, field, comparsion = '=', operator = 'AND'):
+    __slots__ = ('__field', '__comparsion', '__operator', '__parameter')
+
+    def __init__(self, field, comparsion = '=', operator = 'AND', parameter = None):
         super(DbSqlCondition, self).__init__(' ')
         self.__field = field
         self.__comparsion = comparsion
         self.__operator = operator
+        self.__parameter = parameter
     
     # ------------------------------------------------------
     #   public properties 
     # ------------------------------------------------------
 
-    __field = ''
     def _get_field(self):
         return self.__field
     def _set_field(self, value):
         self.__field = value
     field = property(_get_field, _set_field)
 
-    __comparsion = ''
     def _get_comparsion(self):
         return self.__comparsion
     def _set_comparsion(self, value):
         self.__comparsion = value
     comparsion = property(_get_comparsion, _set_comparsion)
 
-    __operator = ''
     def _get_operator(self):
         return self.__operator
     def _set_operator(self, value):
         self.__operator = value
     operator = property(_get_operator, _set_operator)
 
+    # property: parameter [string]
+    #   name of the parameter compared with, the field
+    #   name if not set
+    def _get_parameter(self):
+        if self.__parameter is None:
+            return self.__field
+        return self.__parameter
+    def _set_parameter(self, value):
+        self.__parameter = value
+    parameter = property(_get_parameter, _set_parameter)
+
+    # property: parameters [tuple] (readonly)
+    #   names of all parameters bound by the condition
+    def _get_parameters(self):
+        return (self.parameter,)
+    parameters = property(_get_parameters)
+
+    def _get_shape(self):
+        return ('condition', self.__field, self.__comparsion, self.__operator, self.enclosement, self.__parameter)
+    shape = property(_get_shape)
+
     # ------------------------------------------------------
     #   public methods 
     # ------------------------------------------------------
     
-    def render(self):
-        self.append(self.__field)
-        self.append(self.__comparsion)
-        self.append('%(' + self.__field + ')s')
-
-        tokens = DbSqlTokenizer(' ')
-        tokens.append(self.__operator)
-        tokens.append(super(DbSqlCondition, self).render())
-        return tokens.render()
-        
+    def write(self, buffer):
+        buffer.append(self.__operator)
+        buffer.append(' ')
+        self._writePredicate(buffer)
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    # method: _copy [DbSqlCondition]
+    #   returns a copy of the condition for the copy of a
+    #   statement, parent is the statement or group it is
+    #   copied onto
+    def _copy(self, parent):
+        return copy.copy(self)
+
+    # method: _renameParameter [void]
+    #   binds the condition to parameter name instead of old,
+    #   overridden by the condition types
+    def _renameParameter(self, old, name):
+        if self.parameter == old:
+            self.__parameter = name
+
+    # method: _writePredicate [void]
+    #   writes the enclosed condition without its operator,
+    #   as for the first condition of a group
+    def _writePredicate(self, buffer):
+        enclosement = _ENCLOSEMENTS.get(self.enclosement, ('', ''))
+        buffer.append(enclosement[0])
+        self._writeComparison(buffer)
+        buffer.append(enclosement[1])
+
+    # method: _writeComparison [void]
+    #   writes the comparison, overridden by the condition
+    #   types
+    def _writeComparison(self, buffer):
+        buffer.append(self.__field)
+        buffer.append(' ')
+        buffer.append(self.__comparsion)
+        buffer.append(' %(')
+        buffer.append(self.parameter)
+        buffer.append(')s')
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbSqlInCondition
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbSqlInCondition(DbSqlCondition):
+
+    __slots__ = ('__parameters',)
+
+    # constructor
+    #   parameters:
+    #       field           compared field
+    #       parameters      names of the parameters of the
+    #                       list, one per value
+    #       operator        combining operator
+    #       negate          renders NOT IN
+    def __init__(self, field, parameters, operator = 'AND', negate = False):
+        if len(parameters) == 0:
+            raise ValueError('IN condition on %s without values' % field)
+        super(DbSqlInCondition, self).__init__(field, 'NOT IN' if negate else 'IN', operator)
+        self.__parameters = tuple(parameters)
+
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    def _get_parameters(self):
+        return self.__parameters
+    parameters = property(_get_parameters)
+
+    def _get_shape(self):
+        return ('in', self.field, self.comparsion, self.operator, self.enclosement, self.__parameters)
+    shape = property(_get_shape)
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    def _renameParameter(self, old, name):
+        self.__parameters = tuple([name if parameter == old else parameter for parameter in self.__parameters])
+
+    def _writeComparison(self, buffer):
+        buffer.append(self.field)
+        buffer.append(' ')
+        buffer.append(self.comparsion)
+        buffer.append(' (')
+        for index, parameter in enumerate(self.__parameters):
+            if index > 0:
+                buffer.append(', ')
+            buffer.append('%(')
+            buffer.append(parameter)
+            buffer.append(')s')
+        buffer.append(')')
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbSqlBetweenCondition
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbSqlBetweenCondition(DbSqlCondition):
+
+    __slots__ = ('__low', '__high')
+
+    # constructor
+    #   parameters:
+    #       field           compared field
+    #       low             parameter of the lower bound
+    #       high            parameter of the upper bound
+    #       operator        combining operator
+    #       negate          renders NOT BETWEEN
+    def __init__(self, field, low, high, operator = 'AND', negate = False):
+        super(DbSqlBetweenCondition, self).__init__(field, 'NOT BETWEEN' if negate else 'BETWEEN', operator)
+        self.__low = low
+        self.__high = high
+
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    def _get_low(self):
+        return self.__low
+    low = property(_get_low)
+
+    def _get_high(self):
+        return self.__high
+    high = property(_get_high)
+
+    def _get_parameters(self):
+        return (self.__low, self.__high)
+    parameters = property(_get_parameters)
+
+    def _get_shape(self):
+        return ('between', self.field, self.comparsion, self.operator, self.enclosement, self.__low, self.__high)
+    shape = property(_get_shape)
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    def _renameParameter(self, old, name):
+        if self.__low == old:
+            self.__low = name
+        if self.__high == old:
+            self.__high = name
+
+    def _writeComparison(self, buffer):
+        buffer.append(self.field)
+        buffer.append(' ')
+        buffer.append(self.comparsion)
+        buffer.append(' %(')
+        buffer.append(self.__low)
+        buffer.append(')s AND %(')
+        buffer.append(self.__high)
+        buffer.append(')s')
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbSqlNullCondition
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbSqlNullCondition(DbSqlCondition):
+
+    __slots__ = ()
+
+    def __init__(self, field, isnull = True, operator = 'AND'):
+        super(DbSqlNullCondition, self).__init__(field, 'IS NULL' if isnull else 'IS NOT NULL', operator)
+
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    def _get_parameters(self):
+        return ()
+    parameters = property(_get_parameters)
+
+    def _get_shape(self):
+        return ('null', self.field, self.comparsion, self.operator, self.enclosement)
+    shape = property(_get_shape)
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    def _renameParameter(self, old, name):
+        pass
+
+    def _writeComparison(self, buffer):
+        buffer.append(self.field)
+        buffer.append(' ')
+        buffer.append(self.comparsion)
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbSqlConditionList
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbSqlConditionList(object):
+
+    # register methods shared by statements and condition
+    # groups, the classes provide conditions, _appendCondition,
+    # _parameterName and _invalidate
+    __slots__ = ()
+
+    # ------------------------------------------------------
+    #   public methods 
+    # ------------------------------------------------------
+
+    # method: registerCondition [DbSqlCondition]
+    #   registers a comparison, the parameter is named after
+    #   the field unless the name is already taken
+    def registerCondition(self, field, comparsion = '=', operator = 'AND', enclosed = False, parameter = None):
+        name = self._parameterName(field, parameter)
+        condition = DbSqlCondition(field, comparsion, operator, None if name == field else name)
+        if enclosed:
+            condition.enclosement = EN_ENCLOSEMENT.Round
+        return self._appendCondition(condition)
+
+    def registerStringCondition(self, field, operator = 'AND'):
+        return self.registerCondition(field, 'LIKE', operator)
+
+    # method: registerInCondition [DbSqlInCondition]
+    #   registers field IN a list of count values, each value
+    #   is bound to its own parameter
+    def registerInCondition(self, field, count, operator = 'AND', negate = False):
+        parameters = [self._parameterName(field) for index in range(count)]
+        return self._appendCondition(DbSqlInCondition(field, parameters, operator, negate))
+
+    # method: registerBetweenCondition [DbSqlBetweenCondition]
+    #   registers field BETWEEN two parameters
+    def registerBetweenCondition(self, field, operator = 'AND', negate = False):
+        low = self._parameterName(field)
+        high = self._parameterName(field)
+        return self._appendCondition(DbSqlBetweenCondition(field, low, high, operator, negate))
+
+    # method: registerNullCondition [DbSqlNullCondition]
+    #   registers field IS NULL or IS NOT NULL
+    def registerNullCondition(self, field, isnull = True, operator = 'AND'):
+        return self._appendCondition(DbSqlNullCondition(field, isnull, operator))
+
+    # method: registerGroup [DbSqlConditionGroup]
+    #   registers a parenthesized group, its conditions are
+    #   registered on the returned group
+    def registerGroup(self, operator = 'AND'):
+        return self._appendCondition(DbSqlConditionGroup(self, operator))
+
+    # method: renameParameter [string]
+    #   binds the conditions comparing with parameter to a
+    #   new numbered parameter, e.g. if parameter is also the
+    #   assignment of a field to another value. returns the
+    #   new name, None if no condition uses parameter
+    def renameParameter(self, parameter):
+        if not any([parameter in condition.parameters for condition in self.conditions]):
+            return None
+        name = self._parameterName(parameter)
+        for condition in self.conditions:
+            condition._renameParameter(parameter, name)
+        self._invalidate()
+        return name
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbSqlConditionGroup
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbSqlConditionGroup(DbSqlCondition, DbSqlConditionList):
+
+    __slots__ = ('__parent', '__conditions')
+
+    # constructor
+    #   parameters:
+    #       parent          statement or group the group is
+    #                       registered on, names the parameters
+    #       operator        combining operator
+    def __init__(self, parent, operator = 'AND'):
+        super(DbSqlConditionGroup, self).__init__('', '', operator)
+        self.enclosement = EN_ENCLOSEMENT.Round
+        self.__parent = parent
+        self.__conditions = []
+
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    def _get_conditions(self):
+        return self.__conditions
+    conditions = property(_get_conditions)
+
+    def _get_parameters(self):
+        parameters = ()
+        for condition in self.__conditions:
+            parameters += condition.parameters
+        return parameters
+    parameters = property(_get_parameters)
+
+    def _get_shape(self):
+        return ('group', self.operator, self.enclosement, tuple([condition.shape for condition in self.__conditions]))
+    shape = property(_get_shape)
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    def _appendCondition(self, condition):
+        self._invalidate()
+        self.__conditions.append(condition)
+        return condition
+
+    def _parameterName(self, field, parameter = None):
+        return self.__parent._parameterName(field, parameter)
+
+    def _invalidate(self):
+        self.__parent._invalidate()
+
+    def _renameParameter(self, old, name):
+        for condition in self.__conditions:
+            condition._renameParameter(old, name)
+
+    # method: _copy [DbSqlConditionGroup]
+    #   copies the group and its conditions onto parent
+    def _copy(self, parent):
+        group = copy.copy(self)
+        group.__parent = parent
+        group.__conditions = [condition._copy(group) for condition in self.__conditions]
+        return group
+
+    # method: _writeComparison [void]
+    #   writes the conditions, the operator of the first
+    #   one is left out
+    def _writeComparison(self, buffer):
+        if len(self.__conditions) == 0:
+            raise ValueError('condition group without conditions')
+        for index, condition in enumerate(self.__conditions):
+            if index > 0:
+                buffer.append(' ')
+                condition.write(buffer)
+            else:
+                condition._writePredicate(buffer)
+
+
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 # class DbSqlJoin
 #
@@ -300,6 +807,8 @@ class DbSqlCondition(DbSqlExpression):
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 class DbSqlJoin(DbSqlExpression):
 
+    __slots__ = ('__table', '__field', '__referencetable', '__referencefield')
+
     def __init__(self, table, field, referencetable, referencefield):
         super(DbSqlJoin, self).__init__(' ')
         self.__table = table
@@ -311,47 +820,60 @@ class DbSqlJoin(DbSqlExpression):
     #   public properties 
     # ------------------------------------------------------
 
-    __table = ''
     def _get_table(self):
         return self.__table
     def _set_table(self, value):
         self.__table = value
     table = property(_get_table, _set_table)
 
-    __field = ''
     def _get_field(self):
         return self.__field
     def _set_field(self, value):
         self.__field = value
     field = property(_get_field, _set_field)
 
-    __referencetable = ''
     def _get_referencetable(self):
         return self.__referencetable
     def _set_referencetable(self, value):
         self.__referencetable = value
     referencetable = property(_get_referencetable, _set_referencetable)
 
-    __referencefield = ''
     def _get_referencefield(self):
         return self.__referencefield
     def _set_referencefield(self, value):
         self.__referencefield = value
     referencefield = property(_get_referencefield, _set_referencefield)
 
+    def _get_shape(self):
+        return (type(self).__name__, self.__table, self.__field, self.__referencetable, self.__referencefield, self.enclosement)
+    shape = property(_get_shape)
+
     # ------------------------------------------------------
     #   public methods 
     # ------------------------------------------------------
     
-    def render(self):
-        self.append('JOIN')
-        self.append(self.__referencetable)
-        self.append('ON')
-        self.append(self.__table + '.' + self.__field)
-        self.append('=')
-        self.append(self.__referencetable + '.' + self.__referencefield)
-        return super(DbSqlJoin, self).render()
-        
+    def write(self, buffer):
+        enclosement = _ENCLOSEMENTS.get(self.enclosement, ('', ''))
+        buffer.append(enclosement[0])
+        self._writeJoin(buffer)
+        buffer.append(enclosement[1])
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    def _writeJoin(self, buffer):
+        buffer.append('JOIN ')
+        buffer.append(self.__referencetable)
+        buffer.append(' ON ')
+        buffer.append(self.__table)
+        buffer.append('.')
+        buffer.append(self.__field)
+        buffer.append(' = ')
+        buffer.append(self.__referencetable)
+        buffer.append('.')
+        buffer.append(self.__referencefield)
+
         
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 # class DbSqlInnerJoin
@@ -360,13 +882,14 @@ class DbSqlJoin(DbSqlExpression):
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 class DbSqlInnerJoin(DbSqlJoin):
 
+    __slots__ = ()
+
     def __init__(self, table, field, referencetable, referencefield):
         super(DbSqlInnerJoin, self).__init__(table, field, referencetable, referencefield)
     
-    def render(self):
-        self.append('INNER')
-        return super(DbSqlInnerJoin, self).render()
-
+    def _writeJoin(self, buffer):
+        buffer.append('INNER ')
+        super(DbSqlInnerJoin, self)._writeJoin(buffer)
 
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
@@ -374,25 +897,27 @@ class DbSqlInnerJoin(DbSqlJoin):
 #
 #
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
-class DbSqlStatement(DbSqlExpression):
+class DbSqlStatement(DbSqlExpression, DbSqlConditionList):
+
+    __slots__ = ('__table', '__fields', '__relations', '__conditions', '__parameternames', '__rendered')
 
     def __init__(self, table):
         self.__table = table
         self.__fields = []
         self.__relations = []
         self.__conditions = []
+        self.__parameternames = set()
+        self.__rendered = None
         super(DbSqlStatement, self).__init__(' ')
     
     # ------------------------------------------------------
     #   public properties 
     # ------------------------------------------------------
     
-    __table = ''
     def _get_table(self):
         return self.__table
     table = property(_get_table)
     
-    __fields = []
     def _get_fields(self):
         return self.__fields
     fields = property(_get_fields)
@@ -401,7 +926,6 @@ class DbSqlStatement(DbSqlExpression):
         return len(self.__fields)
     fieldLength = property(_get_fieldLength)
     
-    __conditions = []
     def _get_conditions(self):
         return self.__conditions
     conditions = property(_get_conditions)
@@ -409,6 +933,21 @@ class DbSqlStatement(DbSqlExpression):
     def _get_conditionLength(self):
         return len(self.__conditions)
     conditionLength = property(_get_conditionLength)
+    
+    def _get_relations(self):
+        return self.__relations
+    relations = property(_get_relations)
+
+    # property: fingerprint [tuple] (readonly)
+    #   shape of the statement, equal for all statements
+    #   rendering the same sql regardless of parameter values
+    def _get_fingerprint(self):
+        return (type(self).__name__,
+                self.__table,
+                tuple(self.__fields),
+                tuple([relation.shape for relation in self.__relations]),
+                tuple([condition.shape for condition in self.__conditions])) + self._shape()
+    fingerprint = property(_get_fingerprint)
 
     # ------------------------------------------------------
     #   public methods 
@@ -434,34 +973,159 @@ class DbSqlStatement(DbSqlExpression):
         for relation in self.__relations:
             self.append(relation)
 
+    def append(self, obj):
+        self._invalidate()
+        super(DbSqlStatement, self).append(obj)
+
     def registerField(self, name):
+        self._invalidate()
         self.__fields.append(name)
 
     def registerRelation(self, field, referencetable, referencefield):
+        self._invalidate()
         self.__relations.append(DbSqlInnerJoin(self.__table, field, referencetable, referencefield))
 
     def registerRemoteRelation(self, table, field, referencetable, referencefield):
+        self._invalidate()
         self.__relations.append(DbSqlInnerJoin(table, field, referencetable, referencefield))
 
-    def registerCondition(self, field, comparsion = '=', operator = 'AND', enclosed = False):
-        condition = None
-        if self.conditionLength == 0:
-            condition = DbSqlCondition(field, comparsion, 'WHERE')
+    # method: groupConditions [DbSqlConditionGroup]
+    #   moves the registered conditions into one group, so a
+    #   condition registered afterwards applies to all of them
+    #   even if they are combined with OR
+    def groupConditions(self):
+        group = DbSqlConditionGroup(self)
+        for condition in self.__conditions:
+            group._appendCondition(condition)
+        del self.__conditions[:]
+        return self._appendCondition(group)
+
+    # method: copy [DbSqlStatement]
+    #   creates a statement of the same type with the same
+    #   fields, relations and copies of the conditions
+    def copy(self):
+        statement = type(self)(self.__table)
+        statement.__fields.extend(self.__fields)
+        statement.__relations.extend(self.__relations)
+        statement.__conditions.extend([condition._copy(statement) for condition in self.__conditions])
+        statement.__parameternames.update(self.__parameternames)
+        return statement
+
+    # method: render [string]
+    #   renders the statement in a single pass without changing
+    #   it, the result is kept until the statement is modified
+    def render(self):
+        if self.__rendered is None:
+            buffer = []
+            self.write(buffer)
+            self.__rendered = ''.join(buffer)
+        return self.__rendered
+
+    # method: write [void]
+    #   appends the pieces of the statement to buffer, the
+    #   appended tokens come first
+    def write(self, buffer):
+        offset = len(buffer)
+        super(DbSqlStatement, self).write(buffer)
+        start = len(buffer)
+        self._write(buffer)
+        if start > offset and len(buffer) > start:
+            buffer.insert(start, ' ')
+
+    # method: compile [string]
+    #   returns the rendered statement from sqlcache, only
+    #   statements not cached yet are rendered
+    def compile(self):
+        if self.__rendered is not None:
+            return self.__rendered
+        if self.count > 0:
+            return self.render()
+        key = self.fingerprint
+        sql = sqlcache.get(key)
+        if sql is None:
+            sql = self.render()
+            sqlcache.put(key, sql)
         else:
-            condition = DbSqlCondition(field, comparsion, operator)
-        if enclosed:
-            condition.enclosement = EN_ENCLOSEMENT.Round
-        self.__conditions.append(condition)
+            self.__rendered = sql
+        return sql
 
-    def registerStringCondition(self, field, operator = 'AND'):
-        self.registerCondition(field, 'LIKE', operator)
-    def render(self):
-        return super(DbSqlStatement, self).render()
+    # method: invalidate [void]
+    #   drops the rendered statement, required after fields
+    #   or conditions were changed without the register methods
+    def invalidate(self):
+        self.__rendered = None
 
     # ------------------------------------------------------
     #   private methods 
     # ------------------------------------------------------
 
+    # method: _shape [tuple]
+    #   statement specific part of the fingerprint
+    def _shape(self):
+        return ()
+
+    # method: _write [void]
+    #   appends the pieces of the statement to buffer,
+    #   overridden by the statement types
+    def _write(self, buffer):
+        pass
+
+    def _invalidate(self):
+        self.__rendered = None
+
+    # method: _appendCondition [DbSqlCondition]
+    #   appends a registered condition, the first one
+    #   starts the WHERE clause
+    def _appendCondition(self, condition):
+        if len(self.__conditions) == 0:
+            condition.operator = 'WHERE'
+        self._invalidate()
+        self.__conditions.append(condition)
+        return condition
+
+    # method: _parameterName [string]
+    #   reserves parameter if given, otherwise the field name
+    #   or the field name numbered after the names taken
+    def _parameterName(self, field, parameter = None):
+        if parameter is None:
+            parameter = field
+            index = 1
+            while parameter in self.__parameternames:
+                parameter = field + '_' + str(index)
+                index += 1
+        self.__parameternames.add(parameter)
+        return parameter
+
+    def _writeFields(self, buffer):
+        buffer.append(', '.join(self.__fields))
+
+    def _writeAssignments(self, buffer):
+        for index, field in enumerate(self.__fields):
+            if index > 0:
+                buffer.append(', ')
+            buffer.append(field)
+            buffer.append(' = %(')
+            buffer.append(field)
+            buffer.append(')s')
+
+    def _writeParameters(self, buffer):
+        for index, field in enumerate(self.__fields):
+            if index > 0:
+                buffer.append(', ')
+            buffer.append('%(')
+            buffer.append(field)
+            buffer.append(')s')
+
+    def _writeRelations(self, buffer):
+        for relation in self.__relations:
+            buffer.append(' ')
+            relation.write(buffer)
+
+    def _writeConditions(self, buffer):
+        for condition in self.__conditions:
+            buffer.append(' ')
+            condition.write(buffer)
+
     def _appendFields(self, template, enclosed = False):
         tokenizer = DbSqlExpression(', ')
         if enclosed:
@@ -478,38 +1142,44 @@ class DbSqlStatement(DbSqlExpression):
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 class DbSqlSelectStatement(DbSqlStatement):
 
+    __slots__ = ('__limit_start', '__limit_duration', '__distinct', '__orderby')
+
     def __init__(self, table):
         super(DbSqlSelectStatement, self).__init__(table)
+        self.__limit_start = 0
+        self.__limit_duration = 0
+        self.__distinct = False
+        self.__orderby = ''
     
     # ------------------------------------------------------
     #   public properties 
     # ------------------------------------------------------
 
-    __limit_start = 0
     def _get_limit_start(self):
         return self.__limit_start
     def _set_limit_start(self, value):
+        self._invalidate()
         self.__limit_start = value
     limit_start = property(_get_limit_start, _set_limit_start)
 
-    __limit_duration = 0
     def _get_limit_duration(self):
         return self.__limit_duration
     def _set_limit_duration(self, value):
+        self._invalidate()
         self.__limit_duration = value
     limit_duration = property(_get_limit_duration, _set_limit_duration)
 
-    __distinct = False
     def _get_distinct(self):
         return self.__distinct
     def _set_distinct(self, value):
+        self._invalidate()
         self.__distinct = value
     distinct = property(_get_distinct, _set_distinct)
 
-    __orderby = ''
     def _get_orderby(self):
         return self.__orderby
     def _set_orderby(self, value):
+        self._invalidate()
         self.__orderby = value
     orderby = property(_get_orderby, _set_orderby)
 
@@ -517,21 +1187,33 @@ class DbSqlSelectStatement(DbSqlStatement):
     #   public methods 
     # ------------------------------------------------------
 
-    def render(self):
+    def copy(self):
+        statement = super(DbSqlSelectStatement, self).copy()
+        statement.limit_start = self.__limit_start
+        statement.limit_duration = self.__limit_duration
+        statement.distinct = self.__distinct
+        statement.orderby = self.__orderby
+        return statement
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
 
-        self.append("SELECT")
-        if self.distinct:
-            self.append("distinct")
-        self.appendFieldsDirect()
-        self.append("FROM")
-        self.appendTable()
-        self.appendRelations()
-        self.appendConditions()
-        if self.limit_duration > 0:
-            self.append("LIMIT " + str(self.limit_start) + ", " + str(self.limit_duration))
-        if self.orderby != '':
-            self.append('ORDER BY ' + self.orderby)
-        return super(DbSqlSelectStatement, self).render()
+    def _write(self, buffer):
+        buffer.append("SELECT distinct " if self.__distinct else "SELECT ")
+        self._writeFields(buffer)
+        buffer.append(" FROM ")
+        buffer.append(self.table)
+        self._writeRelations(buffer)
+        self._writeConditions(buffer)
+        if self.__orderby != '':
+            buffer.append(" ORDER BY ")
+            buffer.append(self.__orderby)
+        if self.__limit_duration > 0:
+            buffer.append(" LIMIT " + str(self.__limit_start) + ", " + str(self.__limit_duration))
+
+    def _shape(self):
+        return (self.__limit_start, self.__limit_duration, self.__orderby, self.__distinct)
 
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
@@ -541,6 +1223,8 @@ class DbSqlSelectStatement(DbSqlStatement):
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 class DbSqlInsertStatement(DbSqlStatement):
 
+    __slots__ = ()
+
     def __init__(self, table):
         super(DbSqlInsertStatement, self).__init__(table)
 
@@ -548,40 +1232,129 @@ class DbSqlInsertStatement(DbSqlStatement):
     #   public methods 
     # ------------------------------------------------------
 
-    def render(self):
+    # method: renderRows [string]
+    #   renders a multi-row insert for count rows, the values
+    #   are positional parameters in field order
+    def renderRows(self, count):
+        key = self.fingerprint + ('rows', count)
+        sql = sqlcache.get(key)
+        if sql is None:
+            buffer = []
+            self._writeRows(buffer, count)
+            sql = ''.join(buffer)
+            sqlcache.put(key, sql)
+        return sql
 
-        self.append("INSERT INTO")
-        self.appendTable()
-        self.appendFieldsDirect(True)
-        self.append("VALUES")
-        self.appendFieldsAsParameter(True)
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
 
-        return super(DbSqlInsertStatement, self).render()
+    def _write(self, buffer):
+        buffer.append("INSERT INTO ")
+        buffer.append(self.table)
+        buffer.append(" (")
+        self._writeFields(buffer)
+        buffer.append(") VALUES (")
+        self._writeParameters(buffer)
+        buffer.append(")")
+
+    def _writeRows(self, buffer, count):
+        values = "(" + ", ".join(["%s"] * self.fieldLength) + ")"
+        buffer.append("INSERT INTO ")
+        buffer.append(self.table)
+        buffer.append(" (")
+        self._writeFields(buffer)
+        buffer.append(") VALUES ")
+        buffer.append(", ".join([values] * count))
 
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
-# class DbSqlUpdateStatement
+# class DbSqlUpsertStatement
 #
 #
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
-class DbSqlUpdateStatement(DbSqlStatement):
+class DbSqlUpsertStatement(DbSqlInsertStatement):
+
+    __slots__ = ('__updatefields',)
 
     def __init__(self, table):
-        super(DbSqlUpdateStatement, self).__init__(table)
+        self.__updatefields = []
+        super(DbSqlUpsertStatement, self).__init__(table)
+    
+    # ------------------------------------------------------
+    #   public properties 
+    # ------------------------------------------------------
+
+    # property: updatefields [list] (readonly)
+    #   fields assigned on duplicate key, all registered
+    #   fields if empty
+    def _get_updatefields(self):
+        if len(self.__updatefields) == 0:
+            return self.fields
+        return self.__updatefields
+    updatefields = property(_get_updatefields)
 
     # ------------------------------------------------------
     #   public methods 
     # ------------------------------------------------------
 
-    def render(self):
+    def registerUpdateField(self, name):
+        self._invalidate()
+        self.__updatefields.append(name)
+
+    def copy(self):
+        statement = super(DbSqlUpsertStatement, self).copy()
+        statement.__updatefields.extend(self.__updatefields)
+        return statement
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    def _write(self, buffer):
+        super(DbSqlUpsertStatement, self)._write(buffer)
+        self._writeUpdate(buffer)
+
+    def _writeRows(self, buffer, count):
+        super(DbSqlUpsertStatement, self)._writeRows(buffer, count)
+        self._writeUpdate(buffer)
+
+    def _writeUpdate(self, buffer):
+        buffer.append(" ON DUPLICATE KEY UPDATE ")
+        for index, field in enumerate(self.updatefields):
+            if index > 0:
+                buffer.append(", ")
+            buffer.append(field)
+            buffer.append(" = VALUES(")
+            buffer.append(field)
+            buffer.append(")")
+
+    def _shape(self):
+        return (tuple(self.__updatefields),)
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# class DbSqlUpdateStatement
+#
+#
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class DbSqlUpdateStatement(DbSqlStatement):
 
-        self.append("UPDATE")
-        self.appendTable()
-        self.append("SET")
-        self.appendFieldsAsAssignment()
-        self.appendConditions()
+    __slots__ = ()
 
-        return super(DbSqlUpdateStatement, self).render()
+    def __init__(self, table):
+        super(DbSqlUpdateStatement, self).__init__(table)
+
+    # ------------------------------------------------------
+    #   private methods 
+    # ------------------------------------------------------
+
+    def _write(self, buffer):
+        buffer.append("UPDATE ")
+        buffer.append(self.table)
+        buffer.append(" SET ")
+        self._writeAssignments(buffer)
+        self._writeConditions(buffer)
 
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
@@ -591,19 +1364,18 @@ class DbSqlUpdateStatement(DbSqlStatement):
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 class DbSqlDeleteStatement(DbSqlStatement):
 
+    __slots__ = ()
+
     def __init__(self, table):
         super(DbSqlDeleteStatement, self).__init__(table)
 
     # ------------------------------------------------------
-    #   public methods 
+    #   private methods 
     # ------------------------------------------------------
 
-    def render(self):
-
-        self.append("DELETE")
-        self.append("FROM")
-        self.appendTable()
-        self.appendConditions()
+    def _write(self, buffer):
+        buffer.append("DELETE FROM ")
+        buffer.append(self.table)
+        self._writeConditions(buffer)
 
-        return super(DbSqlDeleteStatement, self).render()
 
@@ -10,6 +10,11 @@ from TEST_Utils import *
 from RIP_DbSqlCompiler import *
 from RIP_DbAccess import *
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 class TEST_DbConnection(unittest.TestCase):
 
     # test if inpit params are assigned to properties
@@ -91,6 +96,21 @@ class TEST_DbCommand(unittest.TestCase):
         self.assertEqual(rows[1]['TestName'], 'testdata2')
         self.assertEqual(rows[2]['TestName'], 'testdata3')
 
+    def test_dbcommand_03_select_testdata_iterate(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        cmd = db.createSelectCommand('UnitTests')
+        cmd.registerField('TestName')
+        rows = list(cmd.iterate(2))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['TestName'], 'testdata1')
+        self.assertEqual(rows[2]['TestName'], 'testdata3')
+        self.assertEqual(db.is_connected, False)
+        it = cmd.iterate(1)
+        self.assertEqual(next(it)['TestName'], 'testdata1')
+        self.assertEqual(db.is_connected, True)
+        it.close()
+        self.assertEqual(db.is_connected, False)
+
     def test_dbcommand_04_insert_testdata(self):
         db = DbConnection(RIP_Common.get_database_config())
         cmd = db.createInsertCommand('UnitTests')
@@ -166,3 +186,460 @@ class TEST_DbCommand(unittest.TestCase):
         cur.close()
         db.close()
         self.assertEqual(res[0], 0)
+
+
+class TEST_DbInsertCommandBulk(unittest.TestCase):
+
+    def setUp(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        db.connect()
+        cur = db.cursor(cursors.Cursor)
+        cur.execute('DROP TABLE IF EXISTS UnitTestsBulk;')
+        cur.execute('CREATE TABLE UnitTestsBulk (Id INT PRIMARY KEY AUTO_INCREMENT, TestName VARCHAR(25), TestValue INT);')
+        db.commit()
+        cur.close()
+        db.close()
+
+    def tearDown(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        db.connect()
+        cur = db.cursor(cursors.Cursor)
+        cur.execute('DROP TABLE IF EXISTS UnitTestsBulk;')
+        db.commit()
+        cur.close()
+        db.close()
+
+    def test_dbbulk_01_batchsize(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        cmd = db.createInsertCommand('UnitTestsBulk')
+        rows = [{'TestName': 'bulk' + str(i), 'TestValue': i} for i in range(25)]
+        lastrowid, affected = cmd.executeBulk(rows, 10)
+        self.assertEqual(lastrowid, 1)
+        self.assertEqual(affected, [10, 10, 5])
+        self.assertEqual(DbTableAdapter(db, 'UnitTestsBulk').count(), 25)
+
+    def test_dbbulk_02_maxpacket(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        cmd = db.createInsertCommand('UnitTestsBulk')
+        cmd.registerField('TestName')
+        cmd.registerField('TestValue')
+        rows = [{'TestName': 'x' * 25, 'TestValue': i} for i in range(100)]
+        lastrowid, affected = cmd.executeBulk(rows, 1000, 2048, False)
+        self.assertTrue(len(affected) > 1)
+        self.assertEqual(sum(affected), 100)
+        self.assertEqual(DbTableAdapter(db, 'UnitTestsBulk').count(), 100)
+
+
+    def test_dbbulk_03_upsert(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        cmd = db.createInsertCommand('UnitTestsBulk')
+        cmd.executeBulk([{'TestName': 'upsert', 'TestValue': i} for i in range(3)])
+        cmd = db.createUpsertCommand('UnitTestsBulk')
+        cmd.registerField('Id')
+        cmd.registerField('TestValue')
+        cmd.registerUpdateField('TestValue')
+        lastrowid, affected = cmd.executeBulk([{'Id': 3, 'TestValue': 30}, {'Id': 4, 'TestValue': 40}])
+        self.assertEqual(affected, [3])
+        cmd = db.createSelectCommand('UnitTestsBulk')
+        cmd.registerField('TestValue')
+        rows = cmd.execute()
+        self.assertEqual([row['TestValue'] for row in rows], [0, 1, 30, 40])
+
+    def test_dbbulk_04_failed_batch(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        cmd = db.createInsertCommand('UnitTestsBulk')
+        rows = [{'Id': i, 'TestName': 'fail'} for i in (1, 2, 3, 1)]
+        self.assertRaises(db.driver.Error, cmd.executeBulk, rows, 2, None, False)
+        self.assertEqual(DbTableAdapter(db, 'UnitTestsBulk').count(), 0)
+        cmd = db.createInsertCommand('UnitTestsBulk')
+        try:
+            cmd.executeBulk(rows, 2)
+            self.fail('duplicate key inserted')
+        except DbBulkInsertError as e:
+            self.assertTrue(isinstance(e.error, db.driver.Error))
+            self.assertEqual(e.rowsaffected, [2])
+            self.assertEqual(e.committed, 2)
+        self.assertEqual(DbTableAdapter(db, 'UnitTestsBulk').count(), 2)
+
+    def test_dbbulk_05_row_fields(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        cmd = db.createInsertCommand('UnitTestsBulk')
+        rows = [{'TestName': 'fields', 'TestValue': 1}, {'TestName': 'fields'}]
+        self.assertRaises(ValueError, cmd.executeBulk, rows, 1, None, False)
+        rows = [{'TestName': 'fields', 'TestValue': 1}, {'TestName': 'fields', 'Id': 5}]
+        self.assertRaises(ValueError, cmd.executeBulk, rows, 1, None, False)
+        self.assertEqual(DbTableAdapter(db, 'UnitTestsBulk').count(), 0)
+
+class TEST_DbSelectCommandPaginate(unittest.TestCase):
+
+    def setUp(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        db.connect()
+        cur = db.cursor(cursors.Cursor)
+        cur.execute('DROP TABLE IF EXISTS UnitTestsBulk;')
+        cur.execute('CREATE TABLE UnitTestsBulk (Id INT PRIMARY KEY AUTO_INCREMENT, TestName VARCHAR(25), TestValue INT);')
+        db.commit()
+        cur.close()
+        db.close()
+
+    def tearDown(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        db.connect()
+        cur = db.cursor(cursors.Cursor)
+        cur.execute('DROP TABLE IF EXISTS UnitTestsBulk;')
+        db.commit()
+        cur.close()
+        db.close()
+
+    def test_dbpaginate_01_keyset(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        cmd = db.createInsertCommand('UnitTestsBulk')
+        cmd.executeBulk([{'TestName': 'page' + str(i), 'TestValue': i % 2} for i in range(25)])
+        cmd = db.createSelectCommand('UnitTestsBulk')
+        cmd.registerField('TestName')
+        cmd.registerCondition('TestValue', 0)
+        rows = list(cmd.paginate('Id', 4))
+        self.assertEqual(len(rows), 13)
+        self.assertEqual([row['Id'] for row in rows], list(range(1, 26, 2)))
+
+    def test_dbpaginate_02_grouped(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        cmd = db.createInsertCommand('UnitTestsBulk')
+        cmd.executeBulk([{'TestName': 'page' + str(i), 'TestValue': i} for i in range(10)])
+        cmd = db.createSelectCommand('UnitTestsBulk')
+        cmd.registerField('TestName')
+        cmd.registerCondition('TestValue', 1)
+        cmd.registerCondition('TestValue', 8, 'OR')
+        self.assertEqual([row['Id'] for row in cmd.paginate('Id', 1)], [2, 9])
+        cmd.sql.orderby = 'TestName'
+        self.assertRaises(ValueError, list, cmd.paginate('Id', 1))
+
+class TEST_DbTableAdapterParallelScan(unittest.TestCase):
+
+    def setUp(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        db.connect()
+        cur = db.cursor(cursors.Cursor)
+        cur.execute('DROP TABLE IF EXISTS UnitTestsBulk;')
+        cur.execute('CREATE TABLE UnitTestsBulk (Id INT PRIMARY KEY AUTO_INCREMENT, TestName VARCHAR(25), TestValue INT);')
+        db.commit()
+        cur.close()
+        db.close()
+
+    def tearDown(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        db.connect()
+        cur = db.cursor(cursors.Cursor)
+        cur.execute('DROP TABLE IF EXISTS UnitTestsBulk;')
+        db.commit()
+        cur.close()
+        db.close()
+
+    def test_dbparallelscan_01_partitions(self):
+        factory = DbFactory(RIP_Common.get_database_config())
+        factory.enablePool(0, 3)
+        cmd = factory.createInsertCommand('UnitTestsBulk')
+        cmd.executeBulk([{'TestName': 'scan' + str(i), 'TestValue': i} for i in range(100)])
+        adapter = DbTableAdapter(factory.createConnection(), 'UnitTestsBulk')
+        rows = list(adapter.parallelScan(3, 7))
+        self.assertEqual(sorted([row['Id'] for row in rows]), list(range(1, 101)))
+        sums = adapter.parallelScan(3, 7, ['TestValue'], lambda rows: sum([row['TestValue'] for row in rows]))
+        self.assertEqual(sum(sums), sum(range(100)))
+        self.assertTrue(factory.pool.size <= 3)
+        factory.disablePool()
+
+class TEST_DbTransaction(unittest.TestCase):
+
+    def setUp(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        db.connect()
+        cur = db.cursor(cursors.Cursor)
+        cur.execute('DROP TABLE IF EXISTS UnitTestsTransaction;')
+        cur.execute('CREATE TABLE UnitTestsTransaction (Id INT PRIMARY KEY AUTO_INCREMENT, TestName VARCHAR(25)) ENGINE=InnoDB;')
+        db.commit()
+        cur.close()
+        db.close()
+
+    def tearDown(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        db.connect()
+        cur = db.cursor(cursors.Cursor)
+        cur.execute('DROP TABLE IF EXISTS UnitTestsTransaction;')
+        db.commit()
+        cur.close()
+        db.close()
+
+    def test_dbtransaction_01_commit(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        with db.transaction():
+            self.assertEqual(db.in_transaction, True)
+            for i in range(3):
+                cmd = db.createInsertCommand('UnitTestsTransaction')
+                cmd.registerField('TestName', 'transaction' + str(i))
+                cmd.execute()
+            with db.transaction():
+                cmd = db.createDeleteCommand('UnitTestsTransaction')
+                cmd.registerCondition('id', 1)
+                self.assertEqual(cmd.execute(), 1)
+        self.assertEqual(db.in_transaction, False)
+        self.assertEqual(db.is_connected, False)
+        self.assertEqual(DbTableAdapter(db, 'UnitTestsTransaction').count(), 2)
+
+    def test_dbtransaction_02_rollback(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        try:
+            with db.transaction():
+                cmd = db.createInsertCommand('UnitTestsTransaction')
+                cmd.registerField('TestName', 'rollback')
+                cmd.execute()
+                raise ValueError('rollback')
+        except ValueError:
+            pass
+        self.assertEqual(db.is_connected, False)
+        self.assertEqual(DbTableAdapter(db, 'UnitTestsTransaction').count(), 0)
+
+class TEST_DbConnectionPool(unittest.TestCase):
+
+    def test_dbpool_01_checkout_reuse(self):
+        pool = DbConnectionPool(RIP_Common.get_database_config(), 1, 2)
+        pool.fill()
+        self.assertEqual(pool.size, 1)
+        conn = pool.acquire()
+        pool.release(conn)
+        self.assertTrue(pool.acquire() is conn)
+        pool.release(conn)
+        pool.close()
+
+    def test_dbpool_02_maxsize_timeout(self):
+        pool = DbConnectionPool(RIP_Common.get_database_config(), 0, 2, 0.1)
+        c1 = pool.acquire()
+        c2 = pool.acquire()
+        self.assertEqual(pool.inuse, 2)
+        self.assertRaises(DbPoolError, pool.acquire)
+        pool.release(c1)
+        pool.release(c2)
+        self.assertEqual(pool.idle, 2)
+        pool.close()
+
+    def test_dbpool_03_idle_eviction(self):
+        pool = DbConnectionPool(RIP_Common.get_database_config(), 1, 3, idletimeout = 0)
+        conns = [pool.acquire() for i in range(3)]
+        for conn in conns:
+            pool.release(conn)
+        pool.release(pool.acquire())
+        self.assertEqual(pool.size, 1)
+        pool.close()
+
+    def test_dbpool_04_factory_commands_release(self):
+        factory = DbFactory(RIP_Common.get_database_config())
+        pool = factory.enablePool(1, 2)
+        cmd = factory.createCommand('SELECT VERSION()')
+        cmd.fetchone()
+        cmd = factory.createCommand('SELECT VERSION()')
+        cmd.fetchall()
+        self.assertEqual(pool.size, 1)
+        self.assertEqual(pool.idle, 1)
+        factory.disablePool()
+        self.assertTrue(factory.pool is None)
+
+    def test_dbpool_05_release_rollback(self):
+        releases = []
+        class RecordingPool(DbConnectionPool):
+            def release(self, conn, rollback = True):
+                releases.append(rollback)
+                super(RecordingPool, self).release(conn, rollback)
+        pool = RecordingPool(RIP_Common.get_database_config(), 0, 1)
+        db = DbConnection(RIP_Common.get_database_config(), pool)
+        db.connect()
+        db.close()
+        db.connect()
+        cur = db.cursor(cursors.Cursor)
+        cur.execute('SELECT 1')
+        cur.close()
+        db.close()
+        db.connect()
+        cur = db.cursor(cursors.Cursor)
+        cur.execute('SELECT 1')
+        cur.close()
+        db.commit()
+        db.close()
+        self.assertEqual(releases, [False, True, False])
+        self.assertEqual(pool.size, 1)
+        pool.close()
+
+
+class TEST_DbResultCache(unittest.TestCase):
+
+    def setUp(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        db.connect()
+        cur = db.cursor(cursors.Cursor)
+        cur.execute('DROP TABLE IF EXISTS UnitTestsBulk;')
+        cur.execute('CREATE TABLE UnitTestsBulk (Id INT PRIMARY KEY AUTO_INCREMENT, TestName VARCHAR(25), TestValue INT);')
+        db.commit()
+        cur.close()
+        db.close()
+
+    def tearDown(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        db.connect()
+        cur = db.cursor(cursors.Cursor)
+        cur.execute('DROP TABLE IF EXISTS UnitTestsBulk;')
+        db.commit()
+        cur.close()
+        db.close()
+
+    def test_dbresultcache_01_get_put(self):
+        cache = DbResultCache(60)
+        key = cache.createKey('SELECT 1', {'id': 1})
+        self.assertEqual(cache.get(key), None)
+        cache.put(key, ({'id': 1},), set(['table']))
+        self.assertEqual(cache.get(key), ({'id': 1},))
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+        self.assertNotEqual(key, cache.createKey('SELECT 1', {'id': 2}))
+
+    def test_dbresultcache_02_ttl(self):
+        cache = DbResultCache(0)
+        cache.put('key', ({'id': 1},), set(['table']))
+        self.assertEqual(cache.get('key'), None)
+        self.assertEqual(cache.bytes, 0)
+
+    def test_dbresultcache_03_maxbytes(self):
+        cache = DbResultCache(60, 2048)
+        for i in range(20):
+            cache.put(i, ({'id': i, 'name': 'x' * 100},), set(['table']))
+        self.assertTrue(cache.bytes <= 2048)
+        self.assertTrue(cache.count < 20)
+        self.assertNotEqual(cache.get(19), None)
+        self.assertEqual(cache.get(0), None)
+
+    def test_dbresultcache_04_invalidate(self):
+        cache = DbResultCache(60)
+        cache.put('a', ({'id': 1},), set(['table1']))
+        cache.put('b', ({'id': 1},), set(['table1', 'table2']))
+        cache.put('c', ({'id': 1},), set(['table3']))
+        cache.invalidate('table1')
+        self.assertEqual(cache.count, 1)
+        self.assertNotEqual(cache.get('c'), None)
+
+    def test_dbresultcache_06_generation(self):
+        cache = DbResultCache(60)
+        generation = cache.generation(set(['table1', 'table2']))
+        cache.invalidate('table2')
+        cache.put('a', ({'id': 1},), set(['table1', 'table2']), generation)
+        self.assertEqual(cache.count, 0)
+        generation = cache.generation(set(['table1', 'table2']))
+        cache.invalidate('table3')
+        cache.put('a', ({'id': 1},), set(['table1', 'table2']), generation)
+        self.assertEqual(cache.count, 1)
+
+    def test_dbresultcache_05_write_invalidates(self):
+        factory = DbFactory(RIP_Common.get_database_config())
+        cache = factory.enableResultCache(60)
+        cmd = factory.createSelectCommand('UnitTestsBulk')
+        cmd.registerField('COUNT(*)')
+        self.assertEqual(cmd.execute()[0]['COUNT(*)'], 0)
+        self.assertEqual(cmd.execute()[0]['COUNT(*)'], 0)
+        self.assertEqual(cache.hits, 1)
+        cmd = factory.createInsertCommand('UnitTestsBulk')
+        cmd.registerField('TestName', 'cached')
+        cmd.execute()
+        cmd = factory.createSelectCommand('UnitTestsBulk')
+        cmd.registerField('COUNT(*)')
+        self.assertEqual(cmd.execute()[0]['COUNT(*)'], 1)
+
+
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class TEST_DbColumnBuffer(unittest.TestCase):
+
+    def test_dbcolumn_01_numeric(self):
+        column = DbColumnBuffer(16)
+        column.append((1, 2, 3))
+        column.append((4, None))
+        values = column.result()
+        self.assertEqual(values.dtype, numpy.float64)
+        self.assertEqual(list(values[:4]), [1.0, 2.0, 3.0, 4.0])
+        self.assertTrue(numpy.isnan(values[4]))
+
+    def test_dbcolumn_02_category(self):
+        column = DbColumnBuffer(16)
+        column.append((None, None))
+        column.append(('a', 'b', 'a'))
+        values = column.result()
+        self.assertTrue(isinstance(values, DbEncodedColumn))
+        self.assertEqual(list(values.codes), [-1, -1, 0, 1, 0])
+        self.assertEqual(list(values.decode()), [None, None, 'a', 'b', 'a'])
+
+    def test_dbcolumn_03_category_overflow(self):
+        column = DbColumnBuffer(2)
+        column.append(('a', 'b'))
+        column.append(('c', 'a'))
+        values = column.result()
+        self.assertEqual(values.dtype, object)
+        self.assertEqual(list(values), ['a', 'b', 'c', 'a'])
+
+    def test_dbcolumn_04_unsigned(self):
+        column = DbColumnBuffer(16)
+        column.append((1, 2))
+        column.append((2 ** 64 - 1, 3))
+        values = column.result()
+        self.assertEqual(values.dtype, numpy.uint64)
+        self.assertEqual([int(value) for value in values], [1, 2, 2 ** 64 - 1, 3])
+        column = DbColumnBuffer(16)
+        column.append((-1, 2))
+        column.append((2 ** 63, 3))
+        values = column.result()
+        self.assertEqual(values.dtype, object)
+        self.assertEqual(list(values), [-1, 2, 2 ** 63, 3])
+
+    def test_dbcolumn_05_execute_columnar(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        cmd = db.createSelectCommand('INFORMATION_SCHEMA.TABLES')
+        cmd.registerField('TABLE_SCHEMA')
+        cmd.registerField('TABLE_ROWS')
+        columns = cmd.executeColumnar(7)
+        self.assertEqual(sorted(columns.keys()), ['TABLE_ROWS', 'TABLE_SCHEMA'])
+        self.assertTrue(isinstance(columns['TABLE_SCHEMA'], DbEncodedColumn))
+        self.assertEqual(len(columns['TABLE_SCHEMA']), len(columns['TABLE_ROWS']))
+
+
+class TEST_DbRow(unittest.TestCase):
+
+    def test_dbrow_01_access(self):
+        rowtype = createRowType(['Id', 'TestName', 'COUNT(*)'])
+        row = rowtype((1, 'test', 3))
+        self.assertEqual(row[0], 1)
+        self.assertEqual(row['TestName'], 'test')
+        self.assertEqual(row['COUNT(*)'], 3)
+        self.assertEqual(row.TestName, 'test')
+        self.assertEqual(row.get('missing', 0), 0)
+        self.assertEqual(row.asdict(), {'Id': 1, 'TestName': 'test', 'COUNT(*)': 3})
+        self.assertEqual(tuple(row), (1, 'test', 3))
+
+    def test_dbrow_02_type_cache(self):
+        self.assertTrue(createRowType(['a', 'b']) is createRowType(('a', 'b')))
+        self.assertFalse(createRowType(['a', 'b']) is createRowType(['b', 'a']))
+        self.assertFalse(hasattr(createRowType(['a'])((1,)), '__dict__'))
+        rowtype = createRowType(['a', 'b'])
+        for index in range(300):
+            createRowType(['c' + str(index)])
+        self.assertFalse(createRowType(['a', 'b']) is rowtype)
+        self.assertTrue(createRowType(['a', 'b']) is createRowType(['a', 'b']))
+
+    def test_dbrow_03_no_description(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        cmd = DbCommand(db, 'DO 1')
+        rows = ((1,),)
+        self.assertTrue(cmd._compactRows(rows) is rows)
+
+    def test_dbrow_04_command_rowmode(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        adapter = DbTableAdapter(db, 'INFORMATION_SCHEMA.TABLES')
+        adapter.rowmode = EN_ROWMODE.Compact
+        self.assertTrue(adapter.count() > 0)
+        cmd = adapter.createSelectCommand()
+        cmd.registerField('TABLE_NAME')
+        row = cmd.fetchone()
+        self.assertTrue(isinstance(row, DbRow))
+        self.assertEqual(row.TABLE_NAME, row[0])
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import shutil
+import asyncio
+import threading
+import unittest
+from RIP_DbAccess import *
+from RIP_DbAsyncAccess import *
+from RIP_DbFakeDriver import *
+
+class StubConfig(object):
+    host = 'localhost'
+    name = 'unittests'
+    user = 'unittests'
+    password = ''
+
+# blocking command standing in for a DbCommand, so the
+# executor paths run without a database server
+class StubCommand(object):
+
+    def __init__(self, rows = (), delay = 0.0):
+        self.rows = list(rows)
+        self.delay = delay
+        self.threads = []
+        self.closed = False
+
+    def fetchall(self):
+        self.threads.append(threading.current_thread())
+        time.sleep(self.delay)
+        return self.rows
+
+    def iterate(self, batch_size):
+        try:
+            for row in self.rows:
+                yield row
+        finally:
+            self.closed = True
+
+class TEST_AsyncDbCommand(unittest.TestCase):
+
+    def test_asyncdbcommand_01_concurrent(self):
+        async def run():
+            async with AsyncDbConnection(StubConfig(), 0, 4) as conn:
+                commands = [StubCommand([i], 0.1) for i in range(8)]
+                started = time.time()
+                results = await asyncio.gather(*[AsyncDbCommand(conn, cmd).fetchall() for cmd in commands])
+                elapsed = time.time() - started
+                self.assertEqual(results, [[i] for i in range(8)])
+                # 8 commands on 4 threads take two rounds of 0.1 seconds
+                self.assertTrue(0.2 <= elapsed < 0.6)
+                self.assertFalse(threading.main_thread() in [cmd.threads[0] for cmd in commands])
+        asyncio.run(run())
+
+    def test_asyncdbcommand_02_iterate(self):
+        async def run():
+            async with AsyncDbConnection(StubConfig(), 0, 2) as conn:
+                cmd = StubCommand(range(10))
+                rows = [row async for row in AsyncDbCommand(conn, cmd).iterate(3)]
+                self.assertEqual(rows, list(range(10)))
+                self.assertTrue(cmd.closed)
+                cmd = StubCommand(range(10))
+                rows = AsyncDbCommand(conn, cmd).iterate(3)
+                async for row in rows:
+                    break
+                await rows.aclose()
+                self.assertTrue(cmd.closed)
+        asyncio.run(run())
+
+    def test_asyncdbcommand_03_threads(self):
+        async def run():
+            async with AsyncDbConnection(StubConfig(), 0, 2, threads=8) as conn:
+                commands = [StubCommand([i], 0.1) for i in range(8)]
+                started = time.time()
+                await asyncio.gather(*[AsyncDbCommand(conn, cmd).fetchall() for cmd in commands])
+                # the executor is sized by threads, not by maxsize
+                self.assertTrue(time.time() - started < 0.2)
+        asyncio.run(run())
+
+class FakeConfig(object):
+    host = 'localhost'
+    name = 'unittests'
+    user = 'unittests'
+    password = ''
+
+class TEST_AsyncDbConnection(unittest.TestCase):
+
+    def setUp(self):
+        self.driver = DbFakeDriver()
+        factory = DbFactory(FakeConfig(), self.driver)
+        factory.createCommand('CREATE TABLE UnitTestsAsync (Id INT PRIMARY KEY AUTO_INCREMENT, TestName VARCHAR(25));').commit()
+
+    def tearDown(self):
+        shutil.rmtree(self.driver.path)
+
+    def test_asyncdb_01_concurrent_insert(self):
+        async def run():
+            async with AsyncDbConnection(FakeConfig(), 1, 4, driver=self.driver) as conn:
+                cmds = []
+                for i in range(20):
+                    cmd = conn.createInsertCommand('UnitTestsAsync')
+                    cmd.registerField('TestName', 'async' + str(i))
+                    cmds.append(cmd.execute())
+                ids = await asyncio.gather(*cmds)
+                self.assertEqual(sorted(ids), list(range(1, 21)))
+                self.assertTrue(conn.pool.size <= 4)
+                cmd = conn.createSelectCommand('UnitTestsAsync')
+                cmd.registerField('COUNT(*)')
+                row = await cmd.fetchone()
+                self.assertEqual(row['COUNT(*)'], 20)
+        asyncio.run(run())
+
+    def test_asyncdb_02_iterate(self):
+        async def run():
+            async with AsyncDbConnection(FakeConfig(), 1, 2, driver=self.driver) as conn:
+                cmd = conn.createInsertCommand('UnitTestsAsync')
+                await cmd.executeBulk([{'TestName': 'async' + str(i)} for i in range(10)])
+                cmd = conn.createSelectCommand('UnitTestsAsync')
+                cmd.registerField('TestName')
+                rows = [row async for row in cmd.iterate(3)]
+                self.assertEqual(len(rows), 10)
+                self.assertEqual(rows[9]['TestName'], 'async9')
+                self.assertEqual(conn.pool.inuse, 0)
+        asyncio.run(run())
+
+    def test_asyncdb_03_open(self):
+        conn = AsyncDbConnection(FakeConfig(), 2, 4, driver=self.driver)
+        self.assertEqual(conn.pool.size, 0)
+        async def run():
+            async with conn:
+                self.assertEqual(conn.pool.size, 2)
+        asyncio.run(run())
+
+    def test_asyncdb_04_transaction(self):
+        async def insert(tx, name):
+            cmd = tx.createInsertCommand('UnitTestsAsync')
+            cmd.registerField('TestName', name)
+            return await cmd.execute()
+        async def run():
+            async with AsyncDbConnection(FakeConfig(), 0, 2, driver=self.driver, threads=8) as conn:
+                async with conn.transaction() as tx:
+                    await asyncio.gather(*[insert(tx, 'commit' + str(i)) for i in range(5)])
+                    self.assertEqual(conn.pool.inuse, 1)
+                try:
+                    async with conn.transaction() as tx:
+                        await insert(tx, 'rollback')
+                        raise ValueError('rollback')
+                except ValueError:
+                    pass
+                self.assertEqual(conn.pool.inuse, 0)
+                cmd = conn.createSelectCommand('UnitTestsAsync')
+                cmd.registerField('TestName')
+                rows = await cmd.fetchall()
+                self.assertEqual(sorted(row['TestName'] for row in rows), ['commit' + str(i) for i in range(5)])
+        asyncio.run(run())
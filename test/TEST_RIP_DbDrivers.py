@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import importlib
+import unittest
+import MySQLdb as mysql
+import RIP_Common
+from RIP_Common import *
+from TEST_Utils import *
+from RIP_DbAccess import *
+
+def installed(module):
+    try:
+        importlib.import_module(module)
+        return True
+    except ImportError:
+        return False
+
+class TEST_DbDrivers(unittest.TestCase):
+
+    def test_dbdrivers_01_registry(self):
+        self.assertRaises(ValueError, getDriver, 'unknown')
+        driver = getDriver('mysqldb')
+        self.assertTrue(getDriver() is driver)
+        self.assertTrue(getDriver(driver) is driver)
+        self.assertTrue('mysqldb' in availableDrivers())
+        self.assertTrue(driver.OperationalError is mysql.OperationalError)
+        self.assertRaises(TypeError, DbDriver)
+
+    @unittest.skipIf(not installed('pymysql'), 'pymysql is not installed')
+    def test_dbdrivers_02_pymysql(self):
+        self.runDriver('pymysql')
+
+    @unittest.skipIf(not installed('mysql.connector'), 'mysql-connector is not installed')
+    def test_dbdrivers_03_mysqlconnector(self):
+        self.runDriver('mysqlconnector')
+
+    @unittest.skipIf(not installed('mysql.connector'), 'mysql-connector is not installed')
+    def test_dbdrivers_04_mysqlconnector_prepared(self):
+        self.runDriver('mysqlconnector', 16)
+
+    def test_dbdrivers_05_prepared_unsupported(self):
+        factory = DbFactory(RIP_Common.get_database_config(), 'mysqldb')
+        self.assertRaises(ValueError, factory.enablePrepared)
+        driver = factory.driver
+        self.assertRaises(driver.NotSupportedError, driver._prepare, None)
+        self.assertRaises(driver.NotSupportedError, driver.preparedCursor, None, cursors.Cursor, 16)
+        class UnpreparedDriver(DbMySQLdbDriver):
+            supports_prepared = True
+        driver = UnpreparedDriver()
+        self.assertRaises(driver.NotSupportedError, driver.preparedCursor, None, cursors.Cursor, 16)
+
+    def runDriver(self, name, prepared = 0):
+        factory = DbFactory(RIP_Common.get_database_config(), name)
+        if prepared > 0:
+            factory.enablePrepared(prepared)
+        self.assertEqual(factory.driver.name, name)
+        factory.createCommand('DROP TABLE IF EXISTS UnitTestsDrivers;').commit()
+        factory.createCommand('CREATE TABLE UnitTestsDrivers (Id INT PRIMARY KEY AUTO_INCREMENT, TestName VARCHAR(25));').commit()
+        try:
+            cmd = factory.createInsertCommand('UnitTestsDrivers')
+            cmd.registerField('TestName', name)
+            self.assertEqual(cmd.execute(), 1)
+
+            cmd = factory.createSelectCommand('UnitTestsDrivers')
+            cmd.registerField('Id')
+            cmd.registerField('TestName')
+            self.assertEqual(cmd.fetchall(), ({'Id': 1, 'TestName': name},))
+            self.assertEqual(list(cmd.iterate()), [{'Id': 1, 'TestName': name}])
+            cmd.rowmode = EN_ROWMODE.Compact
+            self.assertEqual(cmd.fetchone().TestName, name)
+
+            cmd = factory.createCommand('SELECT * FROM UnitTestsMissing')
+            self.assertRaises(factory.driver.ProgrammingError, cmd.fetchall)
+        finally:
+            factory.createCommand('DROP TABLE IF EXISTS UnitTestsDrivers;').commit()
@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import shutil
+import threading
+import unittest
+from TEST_Utils import *
+from RIP_DbAccess import *
+from RIP_DbFakeDriver import *
+
+class FakeConfig(object):
+    host = 'localhost'
+    name = 'unittests'
+    user = 'unittests'
+    password = ''
+
+class TEST_DbFakeDriver(unittest.TestCase):
+
+    def setUp(self):
+        self.driver = DbFakeDriver()
+        self.factory = DbFactory(FakeConfig(), self.driver)
+        self.factory.createCommand('CREATE TABLE UnitTestsFake (Id INT PRIMARY KEY AUTO_INCREMENT, TestName VARCHAR(25));').commit()
+
+    def tearDown(self):
+        self.factory.disablePool()
+        shutil.rmtree(self.driver.path)
+
+    def test_dbfakedriver_01_translate(self):
+        self.assertEqual(self.driver.translate('SELECT a FROM t WHERE b = %(b)s AND c = %s'), 'SELECT a FROM t WHERE b = :b AND c = ?')
+        self.assertEqual(self.driver.translate('INSERT INTO t (a) VALUES (%(a)s) ON DUPLICATE KEY UPDATE a = VALUES(a)'),
+                         'INSERT INTO t (a) VALUES (:a) ON CONFLICT DO UPDATE SET a = excluded.a')
+        self.assertEqual(self.driver.translate('SELECT @@max_allowed_packet'), 'SELECT ' + str(self.driver.maxpacket))
+
+    def test_dbfakedriver_02_commands(self):
+        cmd = self.factory.createInsertCommand('UnitTestsFake')
+        cmd.registerField('TestName', 'fake')
+        self.assertEqual(cmd.execute(), 1)
+        self.assertEqual(self.factory.createInsertCommand('UnitTestsFake').executeBulk([{'TestName': 'bulk'}] * 10, 4), (2, [4, 4, 2]))
+
+        cmd = self.factory.createSelectCommand('UnitTestsFake')
+        cmd.registerField('Id')
+        cmd.registerField('TestName')
+        cmd.registerCondition('Id', 1)
+        self.assertEqual(cmd.fetchone(), {'Id': 1, 'TestName': 'fake'})
+
+        cmd = self.factory.createSelectCommand('UnitTestsFake')
+        cmd.registerField('TestName')
+        self.assertEqual(len(cmd.fetchall()), 11)
+        self.assertEqual(len(list(cmd.iterate(3))), 11)
+
+        cmd = self.factory.createSelectCommand('UnitTestsMissing')
+        cmd.registerField('TestName')
+        self.assertRaises(self.driver.Error, cmd.fetchall)
+
+    def test_dbfakedriver_03_transaction(self):
+        conn = self.factory.createConnection()
+        try:
+            with conn.transaction():
+                cmd = conn.createInsertCommand('UnitTestsFake')
+                cmd.registerField('TestName', 'rollback')
+                cmd.execute()
+                raise ValueError()
+        except ValueError:
+            pass
+        cmd = self.factory.createSelectCommand('UnitTestsFake')
+        cmd.registerField('COUNT(*)')
+        self.assertEqual(cmd.fetchone()['COUNT(*)'], 0)
+
+        def nested():
+            with conn.transaction():
+                cmd = conn.createInsertCommand('UnitTestsFake')
+                cmd.registerField('TestName', 'outer')
+                cmd.execute()
+                try:
+                    with conn.transaction():
+                        raise ValueError()
+                except ValueError:
+                    pass
+        self.assertRaises(DbTransactionError, nested)
+        self.assertEqual(conn.in_transaction, False)
+        cmd = self.factory.createSelectCommand('UnitTestsFake')
+        cmd.registerField('COUNT(*)')
+        self.assertEqual(cmd.fetchone()['COUNT(*)'], 0)
+
+        class Observer(object):
+            events = []
+            def observe(self, event):
+                self.events.append(event)
+        observer = Observer()
+        monitor.register(observer)
+        try:
+            with conn.transaction():
+                cmd = conn.createInsertCommand('UnitTestsFake')
+                cmd.executeBulk([{'TestName': 'bulk'}] * 3)
+        finally:
+            monitor.unregister(observer)
+        self.assertTrue(observer.events[-1].command is cmd)
+        self.assertTrue('execute' in observer.events[-1].timings)
+
+        pool = self.factory.enablePool(0, 1)
+        conn = self.factory.createConnection()
+        def cursor(*args):
+            raise self.driver.Error('cursor')
+        self.driver.cursor = cursor
+        self.assertRaises(self.driver.Error, conn.begin)
+        self.assertEqual(conn.is_connected, False)
+        self.assertEqual(conn.in_transaction, False)
+        self.assertEqual(pool.inuse, 0)
+
+    def test_dbfakedriver_04_latency(self):
+        self.driver.connectlatency = 0.05
+        self.factory.enablePool(1, 4)
+        connects = self.driver.connects
+
+        def run():
+            for i in range(5):
+                cmd = self.factory.createSelectCommand('UnitTestsFake')
+                cmd.registerField('COUNT(*)')
+                cmd.fetchone()
+
+        started = time.time()
+        threads = [threading.Thread(target=run) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(self.driver.connects - connects <= 3)
+        self.assertTrue(time.time() - started < 20 * 0.05)
+
+    def test_dbfakedriver_05_prepared(self):
+        self.factory.enablePrepared(2)
+        self.factory.enablePool(1, 1)
+        self.factory.createInsertCommand('UnitTestsFake').executeBulk([{'TestName': 'prepared' + str(i)} for i in range(5)])
+        for i in range(3):
+            cmd = self.factory.createSelectCommand('UnitTestsFake')
+            cmd.registerField('Id')
+            cmd.registerField('TestName')
+            cmd.registerCondition('Id', i + 1)
+            self.assertEqual(cmd.fetchall(), ({'Id': i + 1, 'TestName': 'prepared' + str(i)},))
+        cmd = self.factory.createUpdateCommand('UnitTestsFake')
+        cmd.registerField('TestName', 'updated')
+        cmd.registerCondition('Id', 1)
+        self.assertEqual(cmd.execute(), 1)
+
+        conn = self.factory.pool.acquire()
+        cache = self.driver.preparedCache(conn, 2)
+        self.factory.pool.release(conn)
+        self.assertEqual(cache.count, 2)
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(cache.misses, 3)
+
+    def test_dbfakedriver_06_conditions(self):
+        self.factory.createCommand('CREATE TABLE UnitTestsTree (Id INT PRIMARY KEY AUTO_INCREMENT, TestName VARCHAR(25), Score INT);').commit()
+        rows = [{'TestName': 'tree' + str(i), 'Score': None if i % 3 == 0 else i} for i in range(1, 11)]
+        self.factory.createInsertCommand('UnitTestsTree').executeBulk(rows)
+
+        cmd = self.factory.createSelectCommand('UnitTestsTree')
+        cmd.registerField('Id')
+        cmd.registerConditionWithOperand('Id', '>', 1)
+        cmd.registerConditionWithOperand('Id', '<', 9)
+        cmd.registerInCondition('TestName', ['tree2', 'tree3', 'tree5', 'tree9'])
+        self.assertEqual([row['Id'] for row in cmd.fetchall()], [2, 3, 5])
+
+        cmd = self.factory.createSelectCommand('UnitTestsTree')
+        cmd.registerField('Id')
+        cmd.registerNullCondition('Score', False)
+        group = cmd.registerGroup()
+        cmd.registerBetweenCondition('Score', 2, 4, group=group)
+        cmd.registerCondition('TestName', 'tree10', 'OR', group)
+        self.assertEqual([row['Id'] for row in cmd.fetchall()], [2, 4, 10])
+
+        cmd = self.factory.createSelectCommand('UnitTestsTree')
+        cmd.registerField('COUNT(*)')
+        cmd.registerNullCondition('Score')
+        self.assertEqual(cmd.fetchone(), {'COUNT(*)': 3})
+
+        cmd = self.factory.createUpdateCommand('UnitTestsTree')
+        cmd.registerField('Score', 100)
+        cmd.registerCondition('Score', 2)
+        self.assertEqual(cmd.execute(), 1)
+        cmd = self.factory.createSelectCommand('UnitTestsTree')
+        cmd.registerField('Id')
+        cmd.registerCondition('Score', 100)
+        self.assertEqual(cmd.fetchall(), ({'Id': 2},))
+
+        cmd = self.factory.createUpdateCommand('UnitTestsTree')
+        cmd.registerCondition('Score', 100)
+        cmd.registerField('Score', 200)
+        self.assertEqual(cmd.parameters, {'Score': 200, 'Score_1': 100})
+        self.assertEqual(cmd.execute(), 1)
+        cmd = self.factory.createUpdateCommand('UnitTestsTree')
+        cmd.registerField('Score', 200)
+        cmd.registerCondition('Score', 200)
+        self.assertEqual(cmd.sql.render(), 'UPDATE UnitTestsTree SET Score = %(Score)s WHERE Score = %(Score)s')
+        self.assertEqual(cmd.execute(), 1)
+        cmd = self.factory.createSelectCommand('UnitTestsTree')
+        cmd.registerField('Id')
+        cmd.registerCondition('Score', 200)
+        self.assertEqual(cmd.fetchall(), ({'Id': 2},))
+
+    def test_dbfakedriver_07_iterate_probe(self):
+        class Observer(object):
+            events = []
+            def observe(self, event):
+                self.events.append(event)
+        self.factory.createInsertCommand('UnitTestsFake').executeBulk([{'TestName': 'probe'}] * 3)
+        observer = Observer()
+        monitor.register(observer)
+        try:
+            cmd = self.factory.createSelectCommand('UnitTestsFake')
+            cmd.registerField('TestName')
+            for rows in cmd.iterate(1):
+                time.sleep(0.1)
+            self.assertTrue(observer.events[-1].timings['fetch'] < 0.1)
+            self.assertTrue(observer.events[-1].duration >= 0.3)
+
+            def connect(*args):
+                raise self.driver.Error('connect')
+            self.driver.connect = connect
+            self.assertRaises(self.driver.Error, list, cmd.iterate(1))
+            self.assertTrue(isinstance(observer.events[-1].error, self.driver.Error))
+        finally:
+            monitor.unregister(observer)
+
+class TEST_DbReplicaRouting(unittest.TestCase):
+
+    def setUp(self):
+        self.driver = DbFakeDriver()
+        for name in ('primary', 'replica1', 'replica2'):
+            factory = DbFactory(self.createConfig(name), self.driver)
+            factory.createCommand('CREATE TABLE UnitTestsRouting (Id INT PRIMARY KEY AUTO_INCREMENT, Source VARCHAR(25));').commit()
+            cmd = factory.createInsertCommand('UnitTestsRouting')
+            cmd.registerField('Source', name)
+            cmd.execute()
+        self.factory = DbFactory(self.createConfig('primary'), self.driver, [self.createConfig('replica1'), (self.createConfig('replica2'), 3)])
+
+    def tearDown(self):
+        self.factory.disablePool()
+        shutil.rmtree(self.driver.path)
+
+    def createConfig(self, name):
+        config = FakeConfig()
+        config.name = name
+        return config
+
+    def read(self):
+        cmd = self.factory.createSelectCommand('UnitTestsRouting')
+        cmd.registerField('Source')
+        return cmd.fetchone()['Source']
+
+    def test_dbrouting_01_least_connections(self):
+        sources = [self.read() for i in range(10)]
+        self.assertEqual(sources.count('replica1'), 5)
+        self.assertEqual(sources.count('replica2'), 5)
+        self.assertEqual(self.factory.replicas[0].inuse, 0)
+
+    def test_dbrouting_02_weighted_round_robin(self):
+        self.factory.routing = EN_ROUTING.WeightedRoundRobin
+        sources = [self.read() for i in range(8)]
+        self.assertEqual(sources.count('replica1'), 2)
+        self.assertEqual(sources.count('replica2'), 6)
+
+    def test_dbrouting_03_lag(self):
+        self.factory.maxlag = 1.0
+        self.factory.lagcheck = 60.0
+        self.factory.replicas[0].lagprobe = lambda conn: 0.5
+        self.factory.replicas[1].lagprobe = lambda conn: 5.0
+        for replica in self.factory.replicas:
+            replica.measure()
+        self.assertEqual(set([self.read() for i in range(4)]), set(['replica1']))
+        self.factory.replicas[0].lagprobe = lambda conn: None
+        self.factory.replicas[0].measure()
+        self.assertEqual(self.read(), 'primary')
+
+    def test_dbrouting_04_lag_background(self):
+        self.factory.maxlag = 1.0
+        self.factory.lagcheck = 60.0
+        def lagprobe(conn):
+            time.sleep(0.3)
+            return 0.5
+        for replica in self.factory.replicas:
+            replica.lagprobe = lagprobe
+        started = time.time()
+        self.assertEqual(self.read(), 'primary')
+        self.assertTrue(time.time() - started < 0.3)
+        while any([replica.measuring for replica in self.factory.replicas]):
+            time.sleep(0.05)
+        self.assertNotEqual(self.read(), 'primary')
+
+    def test_dbrouting_05_resultcache(self):
+        cache = self.factory.enableResultCache()
+        cmd = self.factory.createSelectCommand('UnitTestsRouting')
+        cmd.registerField('Source')
+        self.assertNotEqual(cmd.fetchall()[0]['Source'], 'primary')
+        self.assertEqual(cache.count, 0)
+        self.factory.maxlag = 1.0
+        cmd = self.factory.createSelectCommand('UnitTestsRouting')
+        cmd.registerField('Source')
+        self.assertEqual(cmd.fetchall()[0]['Source'], 'primary')
+        self.assertEqual(cache.count, 1)
+        while any([replica.measuring for replica in self.factory.replicas]):
+            time.sleep(0.05)
+
+    def test_dbrouting_06_pin_after_write(self):
+        self.factory.enablePool(1, 2)
+        with self.factory.scope():
+            self.assertNotEqual(self.read(), 'primary')
+            cmd = self.factory.createInsertCommand('UnitTestsRouting')
+            cmd.registerField('Source', 'written')
+            cmd.execute()
+            self.assertEqual(self.read(), 'primary')
+        self.assertNotEqual(self.read(), 'primary')
+        self.factory.pinafterwrite = False
+        with self.factory.scope() as scope:
+            cmd = self.factory.createInsertCommand('UnitTestsRouting')
+            cmd.registerField('Source', 'written')
+            cmd.execute()
+            self.assertTrue(scope.written)
+            self.assertNotEqual(self.read(), 'primary')
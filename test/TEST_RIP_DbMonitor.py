@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import tempfile
+import unittest
+import RIP_Common
+from RIP_Common import *
+from TEST_Utils import *
+from RIP_DbAccess import *
+from RIP_DbMonitor import *
+
+class TEST_DbHistogram(unittest.TestCase):
+
+    def test_dbhistogram_01_observe(self):
+        histogram = DbHistogram((0.1, 1.0))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5.0)
+        self.assertEqual(histogram.counts, [1, 2])
+        self.assertEqual(histogram.count, 3)
+        self.assertAlmostEqual(histogram.sum, 5.55)
+
+class TEST_DbMetricsRegistry(unittest.TestCase):
+
+    def setUp(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        db.connect()
+        cur = db.cursor(cursors.Cursor)
+        cur.execute('DROP TABLE IF EXISTS UnitTestsMetrics;')
+        cur.execute('CREATE TABLE UnitTestsMetrics (Id INT PRIMARY KEY AUTO_INCREMENT, TestName VARCHAR(25));')
+        db.commit()
+        cur.close()
+        db.close()
+        self.registry = DbMetricsRegistry()
+        self.registry.enable()
+
+    def tearDown(self):
+        self.registry.disable()
+        db = DbConnection(RIP_Common.get_database_config())
+        db.connect()
+        cur = db.cursor(cursors.Cursor)
+        cur.execute('DROP TABLE IF EXISTS UnitTestsMetrics;')
+        db.commit()
+        cur.close()
+        db.close()
+
+    def test_dbmetrics_01_commands(self):
+        factory = DbFactory(RIP_Common.get_database_config())
+        for i in range(3):
+            cmd = factory.createInsertCommand('UnitTestsMetrics')
+            cmd.registerField('TestName', 'metrics' + str(i))
+            cmd.execute()
+        cmd = factory.createSelectCommand('UnitTestsMetrics')
+        cmd.registerField('TestName')
+        self.assertEqual(len(cmd.fetchall()), 3)
+
+        counters = self.registry.counters
+        self.assertEqual(counters[('commands', 'DbInsertCommand', 'UnitTestsMetrics')], 3)
+        self.assertEqual(counters[('rowsaffected', 'DbInsertCommand', 'UnitTestsMetrics')], 3)
+        self.assertEqual(counters[('rows', 'DbSelectCommand', 'UnitTestsMetrics')], 3)
+        histogram = self.registry.histograms[('DbSelectCommand', 'UnitTestsMetrics', 'total')]
+        self.assertEqual(histogram.count, 1)
+
+    def test_dbmetrics_02_errors(self):
+        factory = DbFactory(RIP_Common.get_database_config())
+        cmd = factory.createSelectCommand('UnitTestsMissing')
+        cmd.registerField('TestName')
+        self.assertRaises(factory.driver.Error, cmd.fetchall)
+        self.assertEqual(self.registry.counters[('errors', 'DbSelectCommand', 'UnitTestsMissing')], 1)
+
+    def test_dbmetrics_03_render(self):
+        factory = DbFactory(RIP_Common.get_database_config())
+        cmd = factory.createSelectCommand('UnitTestsMetrics')
+        cmd.registerField('COUNT(*)')
+        cmd.fetchone()
+        text = self.registry.render()
+        self.assertTrue('pydblayer_command_seconds_count{command="DbSelectCommand",table="UnitTestsMetrics",phase="total"} 1' in text)
+        self.assertTrue('pydblayer_commands_total{command="DbSelectCommand",table="UnitTestsMetrics"} 1' in text)
+
+        path = os.path.join(tempfile.mkdtemp(), 'pydblayer.prom')
+        DbPrometheusExporter(self.registry).write(path)
+        with open(path) as f:
+            self.assertEqual(f.read(), text)
+
+    def test_dbmetrics_04_disabled(self):
+        self.registry.disable()
+        self.assertTrue(monitor.probe() is nullprobe)
+
+    def test_dbmetrics_05_failing_observer(self):
+        class Failing(object):
+            def observe(self, event):
+                raise RuntimeError('observer')
+        failing = Failing()
+        monitor.register(failing)
+        try:
+            db = DbConnection(RIP_Common.get_database_config())
+            cmd = db.createSelectCommand('UnitTestsMetrics')
+            cmd.registerField('COUNT(*)')
+            with self.assertLogs('pydblayer.monitor') as logs:
+                self.assertEqual(len(cmd.fetchall()), 1)
+            self.assertEqual(len(logs.records), 1)
+            self.assertFalse(db.is_connected)
+            self.assertEqual(self.registry.counters[('commands', 'DbSelectCommand', 'UnitTestsMetrics')], 1)
+        finally:
+            monitor.unregister(failing)
+
+class TEST_DbSlowQueryLog(unittest.TestCase):
+
+    def setUp(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        db.connect()
+        cur = db.cursor(cursors.Cursor)
+        cur.execute('DROP TABLE IF EXISTS UnitTestsMetrics;')
+        cur.execute('CREATE TABLE UnitTestsMetrics (Id INT PRIMARY KEY AUTO_INCREMENT, TestName VARCHAR(25));')
+        db.commit()
+        cur.close()
+        db.close()
+        self.path = os.path.join(tempfile.mkdtemp(), 'slowquery.jsonl')
+
+    def tearDown(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        db.connect()
+        cur = db.cursor(cursors.Cursor)
+        cur.execute('DROP TABLE IF EXISTS UnitTestsMetrics;')
+        db.commit()
+        cur.close()
+        db.close()
+
+    def test_dbslowquery_01_explain(self):
+        log = DbSlowQueryLog(self.path, threshold=0.0, redact=True)
+        log.enable()
+        try:
+            factory = DbFactory(RIP_Common.get_database_config())
+            cmd = factory.createSelectCommand('UnitTestsMetrics')
+            cmd.registerField('Id')
+            cmd.registerCondition('Id')
+            cmd.parameters = {'Id': 1}
+            cmd.fetchall()
+        finally:
+            log.close()
+        with open(self.path) as f:
+            record = json.loads(f.readline())
+        self.assertEqual(record['command'], 'DbSelectCommand')
+        self.assertEqual(record['parameters'], {'Id': '?'})
+        self.assertTrue(len(record['plan']) > 0)
+        self.assertTrue('test_dbslowquery_01_explain' in record['callsite'])
+
+    def test_dbslowquery_02_threshold(self):
+        log = DbSlowQueryLog(self.path, threshold=60.0)
+        log.enable()
+        try:
+            factory = DbFactory(RIP_Common.get_database_config())
+            cmd = factory.createSelectCommand('UnitTestsMetrics')
+            cmd.registerField('COUNT(*)')
+            cmd.fetchone()
+        finally:
+            log.close()
+        self.assertEqual(os.path.getsize(self.path), 0)
+
+class TEST_DbQueryDigest(unittest.TestCase):
+
+    def setUp(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        db.connect()
+        cur = db.cursor(cursors.Cursor)
+        cur.execute('DROP TABLE IF EXISTS UnitTestsMetrics;')
+        cur.execute('CREATE TABLE UnitTestsMetrics (Id INT PRIMARY KEY AUTO_INCREMENT, TestName VARCHAR(25));')
+        db.commit()
+        cur.close()
+        db.close()
+
+    def tearDown(self):
+        db = DbConnection(RIP_Common.get_database_config())
+        db.connect()
+        cur = db.cursor(cursors.Cursor)
+        cur.execute('DROP TABLE IF EXISTS UnitTestsMetrics;')
+        db.commit()
+        cur.close()
+        db.close()
+
+    def test_dbdigest_01_fingerprint(self):
+        self.assertEqual(fingerprint("SELECT  a FROM t WHERE b = 'x' AND c IN (1, 2, 3)"), 'SELECT a FROM t WHERE b = ? AND c IN (?+)')
+        self.assertEqual(fingerprint('SELECT a FROM t WHERE b = %(b)s LIMIT 10'), 'SELECT a FROM t WHERE b = ? LIMIT ?')
+
+    def test_dbdigest_02_report(self):
+        digest = DbQueryDigest(explain=True)
+        digest.enable()
+        try:
+            factory = DbFactory(RIP_Common.get_database_config())
+            for i in range(5):
+                cmd = factory.createSelectCommand('UnitTestsMetrics')
+                cmd.registerField('TestName')
+                cmd.registerCondition('Id')
+                cmd.parameters = {'Id': i}
+                cmd.fetchall()
+            factory.createCommand("SELECT COUNT(*) FROM UnitTestsMetrics WHERE TestName = 'digest'").fetchone()
+        finally:
+            digest.disable()
+        entries = digest.report(10, 'count')
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0].statement, 'DbSqlSelectStatement')
+        self.assertEqual(entries[0].table, 'UnitTestsMetrics')
+        self.assertEqual(entries[0].count, 5)
+        self.assertTrue(entries[0].planrows is not None)
+        self.assertTrue(entries[0].p99 <= entries[0].max)
+
+        path = os.path.join(tempfile.mkdtemp(), 'digest.json')
+        digest.dump(path)
+        self.assertEqual(DbQueryDigest.load(path).format(10, 'count'), digest.format(10, 'count'))
+
+    def test_dbdigest_03_entry(self):
+        entry = DbDigestEntry('SELECT a FROM t', 'DbSqlSelectStatement', 't', 10)
+        entry.planrows = 4
+        entry.observe(0.5, 2, None)
+        entry.observe(1.5, 0, ValueError())
+        self.assertEqual((entry.count, entry.rows, entry.examined, entry.errors), (2, 2, 8, 1))
+        self.assertEqual(entry.mean, 1.0)
+        self.assertRaises(AttributeError, setattr, entry, 'count', 0)
+        self.assertEqual(DbDigestEntry.fromdict(entry.asdict(), 10).asdict(), entry.asdict())
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from TEST_Utils import *
+from RIP_DbMonitor import *
+from RIP_DbSharding import *
+from RIP_DbFakeDriver import *
+
+class ShardConfig(object):
+    host = 'localhost'
+    user = 'unittests'
+    password = ''
+
+    def __init__(self, name):
+        self.name = name
+
+class TEST_DbShardMap(unittest.TestCase):
+
+    def test_dbshardmap_01_hash(self):
+        shardmap = DbHashShardMap()
+        shards = [shardmap.shard(value, 4) for value in range(1000)]
+        self.assertEqual(shards, [shardmap.shard(value, 4) for value in range(1000)])
+        for index in range(4):
+            self.assertTrue(shards.count(index) > 150)
+        self.assertEqual(shardmap.shard(42, 4), shardmap.shard('42', 4))
+
+    def test_dbshardmap_02_range(self):
+        shardmap = DbRangeShardMap([1000, 2000])
+        self.assertEqual(shardmap.shard(0, 3), 0)
+        self.assertEqual(shardmap.shard(999, 3), 0)
+        self.assertEqual(shardmap.shard(1000, 3), 1)
+        self.assertEqual(shardmap.shard(1999, 3), 1)
+        self.assertEqual(shardmap.shard(5000, 3), 2)
+        self.assertRaises(ValueError, DbRangeShardMap, [2000, 1000])
+        self.assertRaises(TypeError, DbShardMap)
+
+class TEST_DbShardedFactory(unittest.TestCase):
+
+    def setUp(self):
+        self.driver = DbFakeDriver()
+        configs = [ShardConfig('shard' + str(index)) for index in range(3)]
+        self.factory = DbShardedFactory(configs, 'CustomerId', DbRangeShardMap([100, 200]), self.driver)
+        self.factory.fanout(lambda shard: shard.createCommand('CREATE TABLE UnitTestsShards (Id INT PRIMARY KEY AUTO_INCREMENT, CustomerId INT, Name VARCHAR(25));').commit())
+        rows = [{'CustomerId': customer, 'Name': 'name' + str(customer)} for customer in (5, 50, 150, 250, 260)]
+        self.factory.createInsertCommand('UnitTestsShards').executeBulk(rows)
+
+    def tearDown(self):
+        self.factory.close()
+        shutil.rmtree(self.driver.path)
+
+    def countShard(self, index):
+        cmd = self.factory.shards[index].createSelectCommand('UnitTestsShards')
+        cmd.registerField('COUNT(*)')
+        return cmd.fetchone()['COUNT(*)']
+
+    def test_dbsharded_01_routing(self):
+        self.assertEqual([self.countShard(index) for index in range(3)], [2, 1, 2])
+        self.assertEqual(self.factory.shardIndex(150), 1)
+        self.assertRaises(ValueError, DbShardedFactory([ShardConfig('a')], 'CustomerId', DbRangeShardMap([100]), self.driver).shardIndex, 150)
+
+        cmd = self.factory.createInsertCommand('UnitTestsShards')
+        cmd.registerField('CustomerId', 120)
+        cmd.registerField('Name', 'inserted')
+        self.assertEqual(cmd.execute(), 2)
+        self.assertEqual(self.countShard(1), 2)
+
+        cmd = self.factory.createInsertCommand('UnitTestsShards')
+        cmd.registerField('Name', 'nokey')
+        self.assertRaises(ValueError, cmd.execute)
+
+        cmd = self.factory.createSelectCommand('UnitTestsShards')
+        cmd.registerField('Name')
+        cmd.registerCondition('CustomerId', 120)
+        self.assertEqual(self.factory._targets(cmd.sql, cmd.parameters), [1])
+        self.assertEqual(cmd.fetchall(), ({'Name': 'inserted'},))
+        cmd.registerConditionWithOperand('Name', 'LIKE', 'x')
+        cmd.sql.conditions[-1].operator = 'OR'
+        self.assertEqual(self.factory._targets(cmd.sql, cmd.parameters), [0, 1, 2])
+
+        cmd = self.factory.createSelectCommand('UnitTestsShards', 250)
+        cmd.registerField('Name')
+        self.assertEqual(len(cmd.fetchall()), 2)
+
+    def test_dbsharded_02_fanout(self):
+        cmd = self.factory.createSelectCommand('UnitTestsShards')
+        cmd.registerField('CustomerId')
+        cmd.sql.orderby = 'CustomerId DESC'
+        self.assertEqual([row['CustomerId'] for row in cmd.fetchall()], [260, 250, 150, 50, 5])
+        self.assertEqual(cmd.fetchone(), {'CustomerId': 260})
+        cmd.sql.limit_start = 1
+        cmd.sql.limit_duration = 2
+        self.assertEqual([row['CustomerId'] for row in cmd.fetchall()], [250, 150])
+        self.assertEqual(cmd.fetchone(), {'CustomerId': 250})
+        cmd.sql.limit_start = 5
+        self.assertEqual(cmd.fetchone(), None)
+        cmd.sql.limit_start = 1
+        self.assertEqual([row['CustomerId'] for row in cmd.iterate(1)], [5, 150])
+
+        cmd = self.factory.createSelectCommand('UnitTestsShards')
+        cmd.registerField('CustomerId')
+        cmd.rowmode = EN_ROWMODE.Compact
+        self.assertEqual([row.CustomerId for row in cmd.paginate('CustomerId', 1)], [5, 50, 150, 250, 260])
+
+        cmd = self.factory.createUpdateCommand('UnitTestsShards')
+        cmd.registerField('Name', 'updated')
+        cmd.registerConditionWithOperand('CustomerId', '>', 10)
+        self.assertEqual(cmd.execute(), 4)
+
+        cmd = self.factory.createDeleteCommand('UnitTestsShards')
+        cmd.registerCondition('CustomerId', 5)
+        self.assertEqual(cmd.execute(), 1)
+        self.assertEqual(self.countShard(0), 1)
+
+    def test_dbsharded_03_aggregates(self):
+        adapter = DbShardedTableAdapter(self.factory, 'UnitTestsShards')
+        self.assertEqual(adapter.count(), 5)
+        self.assertEqual(adapter.maxid(), 2)
+        self.assertEqual(adapter.minid(), 1)
+        self.assertEqual(len(list(adapter.parallelScan(2, 1))), 5)
+        self.factory.fanout(lambda shard: shard.createCommand('DELETE FROM UnitTestsShards').commit())
+        self.assertEqual(adapter.count(), 0)
+        self.assertEqual(adapter.maxid(), 0)
+
+    def test_dbsharded_04_latency(self):
+        self.factory.enablePool(1, 2)
+        adapter = DbShardedTableAdapter(self.factory, 'UnitTestsShards')
+        adapter.count()
+        self.driver.roundtriplatency = 0.1
+        started = time.time()
+        self.assertEqual(adapter.count(), 5)
+        # ping and query on each shard, 0.6 seconds one shard after the other
+        self.assertTrue(time.time() - started < 4 * 0.1)
+
+    def test_dbsharded_05_merge_checks(self):
+        cmd = self.factory.createSelectCommand('UnitTestsShards')
+        cmd.registerField('COUNT(*)')
+        self.assertRaises(ValueError, cmd.fetchall)
+        self.assertRaises(ValueError, cmd.fetchone)
+        self.assertRaises(ValueError, list, cmd.iterate())
+        cmd.registerCondition('CustomerId', 50)
+        self.assertEqual(cmd.fetchone(), {'COUNT(*)': 1})
+
+        cmd = self.factory.createSelectCommand('UnitTestsShards')
+        cmd.registerField('Name')
+        cmd.sql.orderby = 'CustomerId'
+        self.assertRaises(ValueError, cmd.fetchall)
+        cmd.sql.orderby = 'LENGTH(Name)'
+        self.assertRaises(ValueError, cmd.fetchall)
+        cmd.registerField('UnitTestsShards.CustomerId')
+        cmd.sql.orderby = 'UnitTestsShards.CustomerId ASC, Name'
+        self.assertEqual([row['CustomerId'] for row in cmd.fetchall()], [5, 50, 150, 250, 260])
+
+    def test_dbsharded_06_parallel_scan(self):
+        adapter = DbShardedTableAdapter(self.factory, 'UnitTestsShards')
+        self.driver.roundtriplatency = 0.1
+        started = time.time()
+        rows = list(adapter.parallelScan(2, 1, ['CustomerId']))
+        elapsed = time.time() - started
+        self.assertEqual(sorted(row['CustomerId'] for row in rows), [5, 50, 150, 250, 260])
+        # bounds and two ranges per shard, 0.9 seconds one shard after the other
+        self.assertTrue(elapsed < 0.6)
+
+        factory = DbShardedFactory(self.factory.shards, 'CustomerId', DbRangeShardMap([100, 200]), workers=2)
+        def count(shard):
+            cmd = factory.createSelectCommand('UnitTestsShards')
+            cmd.registerField('CustomerId')
+            return len(cmd.fetchall())
+        results = []
+        thread = threading.Thread(target=lambda: results.append(factory.fanout(count)), daemon=True)
+        thread.start()
+        thread.join(10)
+        # nested fan-outs run inline instead of waiting for the threads of their callers
+        self.assertEqual(results, [[5, 5, 5]])
+        factory.close()
+
+    def test_dbsharded_07_callsite(self):
+        path = os.path.join(tempfile.mkdtemp(), 'slowquery.jsonl')
+        log = DbSlowQueryLog(path, threshold=0.0, explain=False)
+        log.enable()
+        try:
+            cmd = self.factory.createSelectCommand('UnitTestsShards')
+            cmd.registerField('Name')
+            cmd.registerCondition('CustomerId', 50)
+            cmd.fetchall()
+        finally:
+            log.close()
+        with open(path) as f:
+            record = json.loads(f.readline())
+        shutil.rmtree(os.path.dirname(path))
+        self.assertTrue('test_dbsharded_07_callsite' in record['callsite'])
@@ -1,7 +1,10 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import os
+import json
 import random
+import tempfile
 import unittest
 from TEST_Utils import *
 from RIP_DbSqlCompiler import *
@@ -184,6 +187,33 @@ class TEST_DbSqlSelectStatement(unittest.TestCase):
 		s.registerField("field2")
 		self.assertEqual("SELECT distinct field1, field2 FROM table", s.render())
 
+	def test_sqlselect_orderby_limit(self):
+		s = DbSqlSelectStatement('table')
+		s.registerField("field1")
+		s.orderby = "field1"
+		s.limit_start = 20
+		s.limit_duration = 10
+		self.assertEqual("SELECT field1 FROM table ORDER BY field1 LIMIT 20, 10", s.render())
+
+	def test_sqlselect_condition_parameter(self):
+		s = DbSqlSelectStatement('table')
+		s.registerField("field1")
+		s.registerCondition("id", ">=")
+		s.registerCondition("id", "<", "AND", False, "id_upper")
+		self.assertEqual("SELECT field1 FROM table WHERE id >= %(id)s AND id < %(id_upper)s", s.render())
+
+	def test_sqlselect_copy(self):
+		s = DbSqlSelectStatement('table1')
+		s.registerField("field1")
+		s.registerRelation('pk', 'table2', 'fk')
+		s.registerCondition("id")
+		s.distinct = True
+		c = s.copy()
+		self.assertEqual(s.render(), c.render())
+		c.registerField("field2")
+		self.assertEqual(1, s.fieldLength)
+		self.assertEqual(2, c.fieldLength)
+
 class TEST_DbSqlSelectInnerJoinStatement(unittest.TestCase):
 
 	def setUp(self):
@@ -220,6 +250,38 @@ class TEST_DbSqlInsertStatement(unittest.TestCase):
 		s.registerField("field2")
 		self.assertEqual("INSERT INTO table (field1, field2) VALUES (%(field1)s, %(field2)s)", s.render())
 
+	def test_sqlinsert_rows(self):
+		s = DbSqlInsertStatement('table')
+		s.registerField("field1")
+		s.registerField("field2")
+		self.assertEqual("INSERT INTO table (field1, field2) VALUES (%s, %s)", s.renderRows(1))
+		self.assertEqual("INSERT INTO table (field1, field2) VALUES (%s, %s), (%s, %s), (%s, %s)", s.renderRows(3))
+
+class TEST_DbSqlUpsertStatement(unittest.TestCase):
+
+	def setUp(self):
+		pass
+
+	def test_sqlupsert_allfields(self):
+		s = DbSqlUpsertStatement('table')
+		s.registerField("id")
+		s.registerField("field1")
+		self.assertEqual("INSERT INTO table (id, field1) VALUES (%(id)s, %(field1)s) ON DUPLICATE KEY UPDATE id = VALUES(id), field1 = VALUES(field1)", s.render())
+
+	def test_sqlupsert_updatefields(self):
+		s = DbSqlUpsertStatement('table')
+		s.registerField("id")
+		s.registerField("field1")
+		s.registerUpdateField("field1")
+		self.assertEqual("INSERT INTO table (id, field1) VALUES (%(id)s, %(field1)s) ON DUPLICATE KEY UPDATE field1 = VALUES(field1)", s.render())
+
+	def test_sqlupsert_rows(self):
+		s = DbSqlUpsertStatement('table')
+		s.registerField("id")
+		s.registerField("field1")
+		s.registerUpdateField("field1")
+		self.assertEqual("INSERT INTO table (id, field1) VALUES (%s, %s), (%s, %s) ON DUPLICATE KEY UPDATE field1 = VALUES(field1)", s.renderRows(2))
+
 class TEST_DbSqlUpdateStatement(unittest.TestCase):
 
 	def setUp(self):
@@ -245,6 +307,243 @@ class TEST_DbSqlDeleteStatement(unittest.TestCase):
 		s = DbSqlDeleteStatement('table')
 		self.assertEqual("DELETE FROM table", s.render())
 
+class TEST_DbSqlRenderCache(unittest.TestCase):
+
+	def setUp(self):
+		sqlcache.clear()
+
+	def test_sqlcache_lru_eviction(self):
+		c = DbSqlRenderCache(2)
+		c.put('a', 'A')
+		c.put('b', 'B')
+		self.assertEqual('A', c.get('a'))
+		c.put('c', 'C')
+		self.assertEqual(None, c.get('b'))
+		self.assertEqual(2, c.count)
+		self.assertEqual(1, c.hits)
+		self.assertEqual(1, c.misses)
+
+	def test_sqlcache_fingerprint_equal_shape(self):
+		s1 = DbSqlSelectStatement('table')
+		s1.registerField('field1')
+		s1.registerCondition('id')
+		s2 = DbSqlSelectStatement('table')
+		s2.registerField('field1')
+		s2.registerCondition('id')
+		self.assertEqual(s1.fingerprint, s2.fingerprint)
+		s2.limit_duration = 10
+		self.assertNotEqual(s1.fingerprint, s2.fingerprint)
+
+	def test_sqlcache_fingerprint_statement_type(self):
+		s1 = DbSqlUpdateStatement('table')
+		s1.registerField('field1')
+		s2 = DbSqlInsertStatement('table')
+		s2.registerField('field1')
+		self.assertNotEqual(s1.fingerprint, s2.fingerprint)
+
+	def test_sqlcache_compile(self):
+		for i in range(3):
+			s = DbSqlSelectStatement('table')
+			s.registerField('field1')
+			s.registerCondition('field2', 'LIKE')
+			self.assertEqual("SELECT field1 FROM table WHERE field2 LIKE %(field2)s", s.compile())
+		self.assertEqual(1, sqlcache.misses)
+		self.assertEqual(2, sqlcache.hits)
+
+	def test_sqlcache_precompile_save_load(self):
+		s1 = DbSqlSelectStatement('table')
+		s1.registerField('field1')
+		s2 = DbSqlSelectStatement('table')
+		s2.registerField('field2')
+		s2.append('FOR UPDATE')
+		c = DbSqlRenderCache()
+		self.assertEqual(1, c.precompile([s1, s2]))
+		path = os.path.join(tempfile.mkdtemp(), 'templates.json')
+		c.save(path)
+		c = DbSqlRenderCache()
+		self.assertEqual(1, c.load(path))
+		self.assertEqual("SELECT field1 FROM table", c.get(s1.fingerprint))
+		with open(path, 'w') as f:
+			json.dump({'version': SQLCACHE_VERSION + 1, 'entries': [[list(s1.fingerprint), 'stale']]}, f)
+		c = DbSqlRenderCache()
+		self.assertEqual(0, c.load(path))
+		self.assertEqual(0, c.count)
+
+class TEST_DbSqlRender(unittest.TestCase):
+
+	def setUp(self):
+		sqlcache.clear()
+
+	def test_sqlrender_tokenizer_repeated(self):
+		s = DbSqlTokenizer("-")
+		s.append(1)
+		s.append(2)
+		self.assertEqual("1-2", s.render())
+		self.assertEqual("1-2", s.render())
+
+	def test_sqlrender_condition_repeated(self):
+		s = DbSqlCondition('f1', 'LIKE', 'WHERE')
+		s.enclosement = EN_ENCLOSEMENT.Round
+		self.assertEqual("WHERE (f1 LIKE %(f1)s)", s.render())
+		self.assertEqual("WHERE (f1 LIKE %(f1)s)", s.render())
+
+	def test_sqlrender_join_repeated(self):
+		s = DbSqlInnerJoin('table1', 'pk', 'table2', 'fk')
+		self.assertEqual("INNER JOIN table2 ON table1.pk = table2.fk", s.render())
+		self.assertEqual("INNER JOIN table2 ON table1.pk = table2.fk", s.render())
+
+	def test_sqlrender_statement_repeated(self):
+		s = DbSqlUpdateStatement('table')
+		s.registerField("field1")
+		s.registerCondition("id")
+		self.assertEqual("UPDATE table SET field1 = %(field1)s WHERE id = %(id)s", s.render())
+		self.assertEqual("UPDATE table SET field1 = %(field1)s WHERE id = %(id)s", s.render())
+		self.assertEqual(0, s.count)
+
+	def test_sqlrender_statement_invalidated(self):
+		s = DbSqlSelectStatement('table')
+		s.registerField("field1")
+		self.assertEqual("SELECT field1 FROM table", s.compile())
+		s.registerField("field2")
+		self.assertEqual("SELECT field1, field2 FROM table", s.compile())
+		s.distinct = True
+		self.assertEqual("SELECT distinct field1, field2 FROM table", s.render())
+
+	def test_sqlrender_statement_memoized(self):
+		s = DbSqlSelectStatement('table')
+		s.registerField("field1")
+		s.compile()
+		s.compile()
+		s.compile()
+		self.assertEqual(1, sqlcache.misses)
+		self.assertEqual(0, sqlcache.hits)
+
+	def test_sqlrender_nodes_slotted(self):
+		nodes = [DbSqlCondition('f1'), DbSqlInnerJoin('table1', 'pk', 'table2', 'fk'), DbSqlTableDefinition('table').registerField('f1'),
+			DbSqlInCondition('f1', ['p1']), DbSqlBetweenCondition('f1', 'low', 'high'), DbSqlNullCondition('f1'),
+			DbSqlSelectStatement('table'), DbSqlInsertStatement('table'), DbSqlUpsertStatement('table'),
+			DbSqlUpdateStatement('table'), DbSqlDeleteStatement('table')]
+		for node in nodes:
+			self.assertFalse(hasattr(node, '__dict__'))
+		self.assertEqual(0, nodes[0].count)
+
+	def test_sqlrender_join_shape_enclosement(self):
+		join = DbSqlInnerJoin('table1', 'pk', 'table2', 'fk')
+		shape = join.shape
+		join.enclosement = EN_ENCLOSEMENT.Round
+		self.assertNotEqual(shape, join.shape)
+
+	def test_sqlrender_statement_write(self):
+		s = DbSqlSelectStatement('table1')
+		s.registerField("field1")
+		s.registerRelation('pk', 'table2', 'fk')
+		s.registerCondition("id")
+		buffer = ['-- ']
+		s.write(buffer)
+		self.assertEqual("-- SELECT field1 FROM table1 INNER JOIN table2 ON table1.pk = table2.fk WHERE id = %(id)s", ''.join(buffer))
+		s.appendTable()
+		self.assertEqual("table1 SELECT field1 FROM table1 INNER JOIN table2 ON table1.pk = table2.fk WHERE id = %(id)s", s.render())
+
+class TEST_DbSqlConditionTree(unittest.TestCase):
+
+	def setUp(self):
+		sqlcache.clear()
+
+	def test_sqlconditiontree_in(self):
+		s = DbSqlSelectStatement('table')
+		s.registerField("field1")
+		c = s.registerInCondition("id", 3)
+		self.assertEqual(('id', 'id_1', 'id_2'), c.parameters)
+		self.assertEqual("SELECT field1 FROM table WHERE id IN (%(id)s, %(id_1)s, %(id_2)s)", s.render())
+		s.registerInCondition("state", 1, 'AND', True)
+		self.assertEqual("SELECT field1 FROM table WHERE id IN (%(id)s, %(id_1)s, %(id_2)s) AND state NOT IN (%(state)s)", s.render())
+		self.assertRaises(ValueError, s.registerInCondition, "state", 0)
+
+	def test_sqlconditiontree_between_null(self):
+		s = DbSqlDeleteStatement('table')
+		c = s.registerBetweenCondition("created")
+		s.registerNullCondition("deleted")
+		s.registerNullCondition("name", False, 'OR')
+		self.assertEqual(('created', 'created_1'), c.parameters)
+		self.assertEqual("DELETE FROM table WHERE created BETWEEN %(created)s AND %(created_1)s AND deleted IS NULL OR name IS NOT NULL", s.render())
+
+	def test_sqlconditiontree_unique_parameters(self):
+		s = DbSqlSelectStatement('table')
+		s.registerField("field1")
+		s.registerCondition("id", '>')
+		s.registerCondition("id", '<')
+		s.registerCondition("id", '<>', 'AND', False, 'other')
+		self.assertEqual(['id', 'id_1', 'other'], [c.parameter for c in s.conditions])
+		self.assertEqual("SELECT field1 FROM table WHERE id > %(id)s AND id < %(id_1)s AND id <> %(other)s", s.render())
+		s = s.copy()
+		s.registerCondition("id")
+		self.assertEqual("id_2", s.conditions[-1].parameter)
+
+	def test_sqlconditiontree_groups(self):
+		s = DbSqlSelectStatement('table')
+		s.registerField("field1")
+		s.registerCondition("a")
+		g = s.registerGroup()
+		g.registerCondition("b")
+		h = g.registerGroup('OR')
+		h.registerNullCondition("c")
+		h.registerCondition("a", 'LIKE')
+		self.assertEqual("SELECT field1 FROM table WHERE a = %(a)s AND (b = %(b)s OR (c IS NULL AND a LIKE %(a_1)s))", s.render())
+		g.registerCondition("d", '=', 'OR')
+		self.assertEqual("SELECT field1 FROM table WHERE a = %(a)s AND (b = %(b)s OR (c IS NULL AND a LIKE %(a_1)s) OR d = %(d)s)", s.render())
+		self.assertEqual(('b', 'a_1', 'd'), g.parameters)
+		s.registerGroup()
+		self.assertRaises(ValueError, s.render)
+
+	def test_sqlconditiontree_field_parameters(self):
+		s = DbSqlUpdateStatement('table')
+		s.registerField("Status")
+		c = s.registerCondition("Status")
+		self.assertEqual('Status', c.parameter)
+		self.assertEqual("UPDATE table SET Status = %(Status)s WHERE Status = %(Status)s", s.render())
+		self.assertEqual('Status_1', s.renameParameter("Status"))
+		self.assertEqual("UPDATE table SET Status = %(Status)s WHERE Status = %(Status_1)s", s.render())
+		self.assertEqual(None, s.renameParameter("Status"))
+
+	def test_sqlconditiontree_rename_parameter(self):
+		s = DbSqlUpdateStatement('table')
+		s.registerField("id")
+		s.registerInCondition("id", 2)
+		g = s.registerGroup()
+		g.registerBetweenCondition("id", 'OR')
+		g.registerNullCondition("id")
+		self.assertEqual('id_4', s.renameParameter("id"))
+		self.assertEqual("UPDATE table SET id = %(id)s WHERE id IN (%(id_4)s, %(id_1)s) AND (id BETWEEN %(id_2)s AND %(id_3)s AND id IS NULL)", s.render())
+
+	def test_sqlconditiontree_copy(self):
+		s = DbSqlSelectStatement('table')
+		s.registerField("field1")
+		g = s.registerGroup()
+		g.registerCondition("a")
+		self.assertEqual("SELECT field1 FROM table WHERE (a = %(a)s)", s.render())
+		c = s.copy()
+		c.conditions[0].registerCondition("b", '=', 'OR')
+		self.assertEqual("SELECT field1 FROM table WHERE (a = %(a)s OR b = %(b)s)", c.render())
+		self.assertEqual("SELECT field1 FROM table WHERE (a = %(a)s)", s.render())
+		c.conditions[0].conditions[0].comparsion = '<'
+		self.assertEqual('=', g.conditions[0].comparsion)
+		self.assertEqual('b_1', c.conditions[0].registerCondition("b").parameter)
+		self.assertEqual('b', s.registerCondition("b").parameter)
+
+	def test_sqlconditiontree_fingerprint(self):
+		s1 = DbSqlSelectStatement('table')
+		s1.registerInCondition("id", 2)
+		s2 = DbSqlSelectStatement('table')
+		s2.registerInCondition("id", 3)
+		self.assertNotEqual(s1.fingerprint, s2.fingerprint)
+		s1 = DbSqlSelectStatement('table')
+		s1.registerGroup().registerNullCondition("id")
+		s2 = DbSqlSelectStatement('table')
+		s2.registerGroup().registerNullCondition("id", False)
+		self.assertNotEqual(s1.fingerprint, s2.fingerprint)
+		self.assertEqual("SELECT  FROM table WHERE (id IS NULL)", s1.compile())
+		self.assertEqual("SELECT  FROM table WHERE (id IS NOT NULL)", s2.compile())
+
 class DbSqlCompilerSuiteAdapter(TestSuiteAdapter):
 	
 	def registerAll(self):
@@ -257,8 +556,12 @@ class DbSqlCompilerSuiteAdapter(TestSuiteAdapter):
 		self.registerCase(TEST_DbSqlSelectStatement)
 		self.registerCase(TEST_DbSqlSelectInnerJoinStatement)
 		self.registerCase(TEST_DbSqlInsertStatement)
+		self.registerCase(TEST_DbSqlUpsertStatement)
 		self.registerCase(TEST_DbSqlUpdateStatement)
 		self.registerCase(TEST_DbSqlDeleteStatement)
+		self.registerCase(TEST_DbSqlRenderCache)
+		self.registerCase(TEST_DbSqlRender)
+		self.registerCase(TEST_DbSqlConditionTree)
 
 if __name__ == "__main__":
 	adapter = DbSqlCompilerSuiteAdapter(2)